@@ -8,6 +8,7 @@ from sqlmodel import SQLModel
 
 # noinspection PyUnusedImports
 from vsm_restaurant.db import * # Necessary for automigrations
+from models import Model
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -30,7 +31,7 @@ if not has_basic_config_been_invoked() and config.config_file_name is not None:
 # for 'autogenerate' support
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
-target_metadata = SQLModel.metadata
+target_metadata = [SQLModel.metadata, Model.metadata]
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
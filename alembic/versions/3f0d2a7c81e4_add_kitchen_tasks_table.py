@@ -0,0 +1,47 @@
+"""Add kitchen tasks table
+
+Revision ID: 3f0d2a7c81e4
+Revises: 9c5364b6bf11
+Create Date: 2026-10-17 18:06:08.824700
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '3f0d2a7c81e4'
+down_revision: Union[str, Sequence[str], None] = '9c5364b6bf11'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('kitchen_tasks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('order_item_id', sa.Integer(), nullable=False),
+    sa.Column('menu_item_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('order_created_at', sa.DateTime(), nullable=False),
+    sa.Column('cooking_time', sa.Integer(), nullable=True),
+    sa.Column('assignee', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['menu_item_id'], ['menu_items.id'], ),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['order_item_id'], ['order_items.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('kitchen_tasks_order_id_idx', 'kitchen_tasks', ['order_id'], unique=False)
+    op.create_index('kitchen_tasks_status_order_created_at_idx', 'kitchen_tasks', ['status', 'order_created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('kitchen_tasks_status_order_created_at_idx', table_name='kitchen_tasks')
+    op.drop_index('kitchen_tasks_order_id_idx', table_name='kitchen_tasks')
+    op.drop_table('kitchen_tasks')
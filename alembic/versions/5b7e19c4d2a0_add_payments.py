@@ -0,0 +1,53 @@
+"""Add payments
+
+Revision ID: 5b7e19c4d2a0
+Revises: 3f0d2a7c81e4
+Create Date: 2026-10-17 18:30:40.098730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e19c4d2a0'
+down_revision: Union[str, Sequence[str], None] = '3f0d2a7c81e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('orders', sa.Column('payment_method', sa.String(length=20), server_default='cash', nullable=False))
+    op.add_column('orders', sa.Column('payment_status', sa.String(length=20), server_default='not_required', nullable=False))
+    op.add_column('orders', sa.Column('payment_id', sa.String(length=64), nullable=True))
+    op.create_table('payment_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.String(length=64), nullable=False),
+    sa.Column('event_type', sa.String(length=40), nullable=False),
+    sa.Column('payment_id', sa.String(length=64), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.Column('result', sa.String(length=40), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_id')
+    )
+    op.create_index(
+        'payment_events_pending_idx', 'payment_events', ['id'], unique=False,
+        postgresql_where=sa.text('processed_at IS NULL'),
+        sqlite_where=sa.text('processed_at IS NULL')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('payment_events_pending_idx', table_name='payment_events')
+    op.drop_table('payment_events')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('payment_id')
+        batch_op.drop_column('payment_status')
+        batch_op.drop_column('payment_method')
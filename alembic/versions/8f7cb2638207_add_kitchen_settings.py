@@ -0,0 +1,46 @@
+"""Add kitchen settings
+
+Revision ID: 8f7cb2638207
+Revises: f3b8d0a6c527
+Create Date: 2026-10-18 00:36:12.281907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '8f7cb2638207'
+down_revision: Union[str, Sequence[str], None] = 'f3b8d0a6c527'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('kitchen_settings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('stations', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Число станций, заданное в одном процессе, остальные подтягивают по LISTEN state_changes
+    # (функция notify_state_change из c41e7b9d2f05); в SQLite - перечитыванием по таймеру
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("""
+        CREATE TRIGGER kitchen_settings_state_change AFTER INSERT OR DELETE ON kitchen_settings
+        FOR EACH ROW EXECUTE FUNCTION notify_state_change()
+    """)
+    op.execute("""
+        CREATE TRIGGER kitchen_settings_state_update AFTER UPDATE ON kitchen_settings
+        FOR EACH ROW WHEN (OLD.stations IS DISTINCT FROM NEW.stations) EXECUTE FUNCTION notify_state_change()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Триггеры удаляются вместе с таблицей
+    op.drop_table('kitchen_settings')
@@ -0,0 +1,47 @@
+"""Add sales rollup tables
+
+Revision ID: 9c5364b6bf11
+Revises: be962117de52
+Create Date: 2026-10-17 17:59:24.055345
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '9c5364b6bf11'
+down_revision: Union[str, Sequence[str], None] = 'be962117de52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('order_rollup_hourly',
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket_start', 'status')
+    )
+    op.create_table('sales_rollup_hourly',
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('menu_item_id', sa.Integer(), nullable=False),
+    sa.Column('ordered_quantity', sa.Integer(), nullable=False),
+    sa.Column('ordered_revenue', sa.Float(), nullable=False),
+    sa.Column('completed_quantity', sa.Integer(), nullable=False),
+    sa.Column('completed_revenue', sa.Float(), nullable=False),
+    sa.Column('cancelled_quantity', sa.Integer(), nullable=False),
+    sa.Column('cancelled_revenue', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['menu_item_id'], ['menu_items.id'], ),
+    sa.PrimaryKeyConstraint('bucket_start', 'menu_item_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('sales_rollup_hourly')
+    op.drop_table('order_rollup_hourly')
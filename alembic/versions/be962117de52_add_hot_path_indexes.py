@@ -0,0 +1,55 @@
+"""Add hot path indexes
+
+Revision ID: be962117de52
+Revises: a100754ea0a3
+Create Date: 2026-10-17 17:57:03.245610
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = 'be962117de52'
+down_revision: Union[str, Sequence[str], None] = 'a100754ea0a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('orders_created_at_id_idx', 'orders', ['created_at', 'id'], unique=False, if_not_exists=True)
+    op.create_index('orders_status_created_at_idx', 'orders', ['status', 'created_at'], unique=False, if_not_exists=True)
+    op.create_index('orders_table_number_created_at_idx', 'orders', ['table_number', 'created_at'], unique=False, if_not_exists=True)
+    op.create_index('order_items_order_id_idx', 'order_items', ['order_id'], unique=False, if_not_exists=True)
+    op.create_index('order_items_menu_item_id_idx', 'order_items', ['menu_item_id'], unique=False, if_not_exists=True)
+    op.create_index('product_supplies_supply_date_idx', 'product_supplies', ['supply_date'], unique=False, if_not_exists=True)
+    op.create_index('product_supplies_supplier_name_supply_date_idx', 'product_supplies', ['supplier_name', 'supply_date'], unique=False, if_not_exists=True)
+    op.create_index('product_supplies_product_id_idx', 'product_supplies', ['product_id'], unique=False, if_not_exists=True)
+    op.create_index('menu_item_ingredients_menu_item_id_product_id_idx', 'menu_item_ingredients', ['menu_item_id', 'product_id'], unique=False, if_not_exists=True)
+    op.create_index('menu_item_ingredients_product_id_idx', 'menu_item_ingredients', ['product_id'], unique=False, if_not_exists=True)
+    op.create_index('menu_items_category_id_idx', 'menu_items', ['category_id'], unique=False, if_not_exists=True)
+    # Partial index: only low-stock rows are indexed, so it stays tiny
+    op.create_index(
+        'products_low_stock_idx', 'products', ['id'], unique=False, if_not_exists=True,
+        postgresql_where=sa.text('current_stock <= min_stock'),
+        sqlite_where=sa.text('current_stock <= min_stock')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('products_low_stock_idx', table_name='products')
+    op.drop_index('menu_items_category_id_idx', table_name='menu_items')
+    op.drop_index('menu_item_ingredients_product_id_idx', table_name='menu_item_ingredients')
+    op.drop_index('menu_item_ingredients_menu_item_id_product_id_idx', table_name='menu_item_ingredients')
+    op.drop_index('product_supplies_product_id_idx', table_name='product_supplies')
+    op.drop_index('product_supplies_supplier_name_supply_date_idx', table_name='product_supplies')
+    op.drop_index('product_supplies_supply_date_idx', table_name='product_supplies')
+    op.drop_index('order_items_menu_item_id_idx', table_name='order_items')
+    op.drop_index('order_items_order_id_idx', table_name='order_items')
+    op.drop_index('orders_table_number_created_at_idx', table_name='orders')
+    op.drop_index('orders_status_created_at_idx', table_name='orders')
+    op.drop_index('orders_created_at_id_idx', table_name='orders')
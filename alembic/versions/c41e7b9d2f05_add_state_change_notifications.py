@@ -0,0 +1,65 @@
+"""Add state change notifications
+
+Revision ID: c41e7b9d2f05
+Revises: 8d3c5e1f6a92
+Create Date: 2026-10-17 21:40:08.512734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e7b9d2f05'
+down_revision: Union[str, Sequence[str], None] = '8d3c5e1f6a92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблица -> условие для UPDATE: изменения, которых индексы в памяти не видят, не объявляются
+TABLES = {
+    'products': '(OLD.name, OLD.unit, OLD.current_stock, OLD.cost_per_unit)'
+                ' IS DISTINCT FROM (NEW.name, NEW.unit, NEW.current_stock, NEW.cost_per_unit)',
+    'menu_item_ingredients': 'OLD IS DISTINCT FROM NEW',
+    'kitchen_tasks': "OLD.status IS DISTINCT FROM NEW.status"
+                     " AND (OLD.status IN ('queued', 'cooking') OR NEW.status IN ('queued', 'cooking'))",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Процессы приложения держат индексы в памяти и подтягивают чужие изменения
+    # по LISTEN state_changes; в SQLite их перечитывают целиком по таймеру
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("""
+        CREATE FUNCTION notify_state_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'state_changes',
+                TG_TABLE_NAME || ':' || CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END
+            );
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table, changed in TABLES.items():
+        op.execute(f"""
+            CREATE TRIGGER {table}_state_change AFTER INSERT OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION notify_state_change()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_state_update AFTER UPDATE ON {table}
+            FOR EACH ROW WHEN ({changed}) EXECUTE FUNCTION notify_state_change()
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_state_update ON {table}')
+        op.execute(f'DROP TRIGGER {table}_state_change ON {table}')
+    op.execute('DROP FUNCTION notify_state_change()')
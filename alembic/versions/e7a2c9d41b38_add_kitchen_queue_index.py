@@ -0,0 +1,38 @@
+"""Add kitchen queue index
+
+Revision ID: e7a2c9d41b38
+Revises: c41e7b9d2f05
+Create Date: 2026-10-17 23:12:45.208391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a2c9d41b38'
+down_revision: Union[str, Sequence[str], None] = 'c41e7b9d2f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Порядок очереди включает cooking_time, без него задачи внутри заказа досортировывались
+    op.create_index(
+        'kitchen_tasks_status_queue_idx', 'kitchen_tasks',
+        ['status', 'order_created_at', sa.text('coalesce(cooking_time, 0) DESC'), 'id'],
+        unique=False
+    )
+    op.drop_index('kitchen_tasks_status_order_created_at_idx', table_name='kitchen_tasks')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        'kitchen_tasks_status_order_created_at_idx', 'kitchen_tasks',
+        ['status', 'order_created_at', 'id'], unique=False
+    )
+    op.drop_index('kitchen_tasks_status_queue_idx', table_name='kitchen_tasks')
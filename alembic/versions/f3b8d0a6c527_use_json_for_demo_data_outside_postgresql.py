@@ -0,0 +1,47 @@
+"""Use JSON for demo data outside PostgreSQL
+
+Revision ID: f3b8d0a6c527
+Revises: e7a2c9d41b38
+Create Date: 2026-10-17 23:48:31.604172
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d0a6c527'
+down_revision: Union[str, Sequence[str], None] = 'e7a2c9d41b38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # demo.json_data - JSONDocument: JSONB только в PostgreSQL, в остальных базах
+    # колонка объявлена как JSON. Данные не меняются, меняется имя типа
+    if op.get_bind().dialect.name == 'postgresql':
+        return
+    with op.batch_alter_table('demo') as batch_op:
+        batch_op.alter_column(
+            'json_data',
+            existing_type=postgresql.JSONB(astext_type=sa.Text()),
+            type_=sa.JSON(),
+            existing_nullable=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        return
+    with op.batch_alter_table('demo') as batch_op:
+        batch_op.alter_column(
+            'json_data',
+            existing_type=sa.JSON(),
+            type_=postgresql.JSONB(astext_type=sa.Text()),
+            existing_nullable=True
+        )
@@ -0,0 +1,8 @@
+"""Local stand-in for the acquirer service.
+
+    python -m fake_acquirer [--port 8090] [--secret dev-secret]
+
+Creates payments, "pays" them on request and delivers signed webhooks the way
+a real acquirer does: at least once, retried on failure and not necessarily
+in order. Everything is kept in memory.
+"""
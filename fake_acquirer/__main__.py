@@ -0,0 +1,20 @@
+import argparse
+
+import uvicorn
+
+from fake_acquirer import __doc__ as usage
+from fake_acquirer.app import create_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=usage.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--secret", default="dev-secret")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.secret), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
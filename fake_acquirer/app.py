@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, Header, HTTPException, Request
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_ATTEMPTS = 5
+RETRY_DELAY = 0.5
+
+
+class PaymentCreate(BaseModel):
+    order_id: int
+    amount: float
+    webhook_url: str
+
+
+class RefundCreate(BaseModel):
+    amount: float
+
+
+def sign(secret: str, body: bytes) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def webhook(event_type: str, payment: dict) -> dict:
+    return {
+        "id": uuid.uuid4().hex,
+        "type": event_type,
+        "payment_id": payment["payment_id"],
+        "order_id": payment["order_id"],
+        "amount": payment["amount"],
+    }
+
+
+def create_app(secret: str) -> FastAPI:
+    payments = {}
+    # Idempotency-Key -> response of the first refund request with it
+    refunds = {}
+    deliveries = set()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.client = httpx.AsyncClient(timeout=5)
+        yield
+        for task in deliveries:
+            task.cancel()
+        await app.state.client.aclose()
+
+    app = FastAPI(lifespan=lifespan)
+
+    async def deliver(url: str, event: dict):
+        """POST a signed webhook, retrying like a real acquirer until it gets a 2xx."""
+        body = json.dumps(event).encode()
+        headers = {"Content-Type": "application/json", "X-Signature": sign(secret, body)}
+        for attempt in range(1, DELIVERY_ATTEMPTS + 1):
+            try:
+                response = await app.state.client.post(url, content=body, headers=headers)
+                if response.is_success:
+                    return
+                logger.warning("Webhook %s got %d", event["id"], response.status_code)
+            except httpx.HTTPError as e:
+                logger.warning("Webhook %s failed: %s", event["id"], e)
+            await asyncio.sleep(RETRY_DELAY * attempt)
+        logger.error("Webhook %s dropped after %d attempts", event["id"], DELIVERY_ATTEMPTS)
+
+    def send(url: str, event: dict):
+        task = asyncio.create_task(deliver(url, event))
+        deliveries.add(task)
+        task.add_done_callback(deliveries.discard)
+
+    @app.post("/payments")
+    async def create_payment(data: PaymentCreate, request: Request):
+        payment_id = f"pay_{uuid.uuid4().hex[:24]}"
+        payments[payment_id] = {**data.model_dump(), "payment_id": payment_id, "status": "pending"}
+        return {"payment_id": payment_id, "payment_url": str(request.url_for("pay", payment_id=payment_id))}
+
+    @app.get("/payments/{payment_id}")
+    async def get_payment(payment_id: str):
+        if payment_id not in payments:
+            raise HTTPException(404, "Payment not found")
+        return payments[payment_id]
+
+    @app.post("/pay/{payment_id}", name="pay")
+    async def pay(payment_id: str, outcome: str = "succeeded", deliver: bool = True):
+        """What the passenger's bank does; a test hook rather than a real acquirer endpoint.
+
+        With deliver=false the signed webhook is returned instead of sent, for the replay benchmark.
+        """
+        payment = payments.get(payment_id)
+        if payment is None:
+            raise HTTPException(404, "Payment not found")
+        if outcome not in ("succeeded", "failed"):
+            raise HTTPException(400, "Outcome must be succeeded or failed")
+        if payment["status"] != "pending":
+            raise HTTPException(409, f"Payment is {payment['status']}")
+
+        payment["status"] = outcome
+        event = webhook(f"payment.{outcome}", payment)
+        if deliver:
+            send(payment["webhook_url"], event)
+        return {**payment, "event": event}
+
+    @app.post("/payments/{payment_id}/refunds")
+    async def refund(payment_id: str, data: RefundCreate, idempotency_key: str = Header()):
+        if idempotency_key in refunds:
+            return refunds[idempotency_key]
+        payment = payments.get(payment_id)
+        if payment is None:
+            raise HTTPException(404, "Payment not found")
+        if payment["status"] != "succeeded":
+            raise HTTPException(409, f"Payment is {payment['status']}")
+
+        payment["status"] = "refunded"
+        refunds[idempotency_key] = {"refund_id": f"re_{uuid.uuid4().hex[:24]}", "amount": data.amount}
+        send(payment["webhook_url"], webhook("refund.succeeded", payment))
+        return refunds[idempotency_key]
+
+    return app
@@ -0,0 +1,132 @@
+"""Webhook replay benchmark.
+
+    python -m fake_acquirer.replay [--orders 200] [--copies 3] [--concurrency 50]
+
+Needs the app and the fake acquirer running. Creates prepaid orders and
+payments for them, lets some passengers switch to cash or cancel before
+paying, then fires every payment webhook several times, shuffled and
+interleaved with stale failure events, straight at the webhook endpoint.
+Reports how fast the webhooks were acknowledged and how long it took until
+every order reached the payment status it should end up in.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import httpx
+
+from fake_acquirer.app import sign
+from tools.scratch import percentile
+
+# Scenario -> payment status the order must end up in
+SCENARIOS = {
+    "paid": "paid",
+    "failed": "failed",
+    "switched_to_cash": "refunded",
+    "cancelled": "refunded",
+}
+
+
+async def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default="http://127.0.0.1:8000")
+    parser.add_argument("--acquirer", default="http://127.0.0.1:8090")
+    parser.add_argument("--secret", default="dev-secret")
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--copies", type=int, default=3, help="deliveries of every webhook")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for convergence")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with (httpx.AsyncClient(base_url=args.app, timeout=30, limits=limits) as app,
+                httpx.AsyncClient(base_url=args.acquirer, timeout=30, limits=limits) as acquirer):
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def call(client, method, url, **kwargs):
+            async with semaphore:
+                response = await client.request(method, url, **kwargs)
+            response.raise_for_status()
+            return response.json()
+
+        menu = [item for item in (await app.get("/api/menu")).json() if item["is_available"]]
+        if not menu:
+            print("No dishes available to order")
+            return 1
+        scenarios = [list(SCENARIOS)[number % len(SCENARIOS)] for number in range(args.orders)]
+
+        async def prepare(number, scenario):
+            """A prepaid order, its payment and the webhook the acquirer would send for it."""
+            order = await call(app, "POST", "/api/orders", json={
+                "table_number": number % 30 + 1,
+                "items": [{"menu_item_id": rng.choice(menu)["id"], "quantity": 1}],
+                "payment_method": "card_online",
+            })
+            order_id = order["order_id"]
+            payment = await call(app, "POST", f"/api/orders/{order_id}/payment")
+            if scenario == "switched_to_cash":
+                await call(app, "PUT", f"/api/orders/{order_id}/payment-method", json={"payment_method": "cash"})
+            elif scenario == "cancelled":
+                await call(app, "DELETE", f"/api/orders/{order_id}")
+
+            outcome = "failed" if scenario == "failed" else "succeeded"
+            paid = await call(acquirer, "POST", f"/pay/{payment['payment_id']}",
+                              params={"outcome": outcome, "deliver": "false"})
+            events = [paid["event"]]
+            if outcome == "succeeded":
+                # A failed attempt reported after the successful one must not undo it
+                events.append({**paid["event"], "id": f"stale-{paid['event']['id']}", "type": "payment.failed"})
+            return order_id, events
+
+        started = time.perf_counter()
+        prepared = await asyncio.gather(*(prepare(number, s) for number, s in enumerate(scenarios)))
+        print(f"Prepared {len(prepared)} orders in {time.perf_counter() - started:.1f} s")
+
+        deliveries = [event for _, events in prepared for event in events for _ in range(args.copies)]
+        rng.shuffle(deliveries)
+        acks, latencies = {}, []
+
+        async def deliver(event):
+            body = json.dumps(event).encode()
+            headers = {"Content-Type": "application/json", "X-Signature": sign(args.secret, body)}
+            async with semaphore:
+                sent = time.perf_counter()
+                response = await app.post("/api/payments/webhook", content=body, headers=headers)
+                latencies.append(time.perf_counter() - sent)
+            status = response.json().get("status") if response.is_success else f"http_{response.status_code}"
+            acks[status] = acks.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(deliver(event) for event in deliveries))
+        replayed = time.perf_counter() - started
+        print(f"Webhooks: {len(deliveries)} in {replayed:.2f} s, {len(deliveries) / replayed:.0f}/s, "
+              f"p50={percentile(latencies, 0.5) * 1000:.1f} ms p99={percentile(latencies, 0.99) * 1000:.1f} ms")
+        print("Acks: " + ", ".join(f"{status}={count}" for status, count in sorted(acks.items())))
+
+        # Refunds go through the acquirer and come back as refund.succeeded webhooks
+        expected = {order_id: SCENARIOS[s] for (order_id, _), s in zip(prepared, scenarios)}
+        pending = dict(expected)
+        while pending and time.perf_counter() - started < args.timeout:
+            await asyncio.sleep(0.2)
+            orders = await asyncio.gather(*(call(app, "GET", f"/api/orders/{order_id}") for order_id in pending))
+            for order in orders:
+                if order["payment_status"] == pending[order["id"]]:
+                    del pending[order["id"]]
+        converged = time.perf_counter() - started
+
+    if pending:
+        print(f"{len(pending)} orders did not reach their payment status within {args.timeout:.0f} s:")
+        for order_id, status in list(pending.items())[:20]:
+            print(f"  order {order_id}: expected {status}")
+        return 1
+    print(f"All {len(expected)} orders converged {converged:.2f} s after the replay started")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
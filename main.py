@@ -1,29 +1,66 @@
-from flask import Flask
+import click
+from flask import Flask, jsonify
 from models import db
+from routes.kitchen import kitchen_bp
 from routes.menu import menu_bp
 from routes.orders import orders_bp
 from routes.products import products_bp
 from routes.supplier import supplier_bp
+from services import rollups
+from services.availability import availability_index
+from services.errors import ServiceError
+from services.kitchen import load_stations
+from services.scheduler import kitchen_scheduler
+from vsm_restaurant.db.migrations import schema_is_current
+from vsm_restaurant.instrumentation import configure_slow_query_log, instrument_flask
+from vsm_restaurant.db.pooling import configure_engine, engine_options
+from vsm_restaurant.settings import Settings
 
 def create_app():
     app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///restaurant.db'
+    settings = Settings()
+    # Та же база и те же настройки пула, что и у FastAPI-приложения (DB_URL в config.env)
+    app.config['SQLALCHEMY_DATABASE_URI'] = settings.db_url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(settings)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
     db.init_app(app)
+    # Число запросов к БД и время в заголовке Server-Timing, гистограммы на /metrics
+    instrument_flask(app)
+    configure_slow_query_log(settings.slow_query_threshold, settings.slow_query_log_path)
     
     # Регистрация blueprint'ов
     app.register_blueprint(menu_bp, url_prefix='/api')
     app.register_blueprint(orders_bp, url_prefix='/api')
     app.register_blueprint(products_bp, url_prefix='/api')
     app.register_blueprint(supplier_bp, url_prefix='/api')
+    app.register_blueprint(kitchen_bp, url_prefix='/api')
+    
+    @app.errorhandler(ServiceError)
+    def handle_service_error(error):
+        db.session.rollback()
+        return jsonify(error.to_dict()), error.status_code
+    
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups():
+        """Пересчитать почасовые роллапы продаж по всей истории заказов"""
+        order_rows, sales_rows = rollups.rebuild(db.session)
+        db.session.commit()
+        click.echo(f'Rebuilt {order_rows} order rollup rows and {sales_rows} sales rollup rows')
     
     @app.route('/')
     def hello():
         return 'VSM Restaurant API is running!'
     
     with app.app_context():
-        db.create_all()
+        configure_engine(db.engine, settings, 'flask')
+        # База, поднятая миграциями до последней ревизии, уже содержит все таблицы
+        if not schema_is_current(db.engine):
+            db.create_all()
+        availability_index.build(db.session)
+        # Число станций, заданное через PUT /kitchen/stations, иначе из настроек
+        kitchen_scheduler.set_stations(load_stations(db.session) or settings.kitchen_stations)
+        kitchen_scheduler.build(db.session)
     
     return app
 
@@ -1,68 +1,119 @@
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 
-db = SQLAlchemy()
+import sqlalchemy as sa
+from sqlalchemy import orm
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateIndex
 
-class Product(db.Model):
+# Обычная декларативная база: FastAPI-приложению и сервисам Flask не нужен.
+# Flask-SQLAlchemy подключается к ней лениво, при первом обращении к models.db
+Model = orm.declarative_base()
+
+
+@compiles(CreateIndex, 'postgresql')
+@compiles(CreateIndex, 'sqlite')
+def _create_partial_index(create, compiler, **kw):
+    """Условие частичного индекса из Index.info['where'].
+
+    Не postgresql_where/sqlite_where: такие аргументы проверяются при объявлении
+    индекса и импортируют оба диалекта вместе с models, даже если один из них не нужен.
+    """
+    sql = compiler.visit_create_index(create, **kw)
+    where = create.element.info.get('where')
+    if where is None:
+        return sql
+    return f'{sql} WHERE {compiler.sql_compiler.process(sa.text(where), include_table=False, literal_binds=True)}'
+
+
+def __getattr__(name):
+    if name == 'db':
+        from flask_sqlalchemy import SQLAlchemy
+
+        global db
+        db = SQLAlchemy(model_class=Model)
+        return db
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+class Product(Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # Частичный индекс под выборку продуктов с низким запасом
+        sa.Index(
+            'products_low_stock_idx',
+            'id',
+            info={'where': 'current_stock <= min_stock'}
+        ),
+    )
     
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    unit = db.Column(db.String(20), nullable=False)  # кг, шт, л и т.д.
-    current_stock = db.Column(db.Float, default=0)
-    min_stock = db.Column(db.Float, default=0)
-    cost_per_unit = db.Column(db.Float, default=0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.String(100), nullable=False)
+    unit = sa.Column(sa.String(20), nullable=False)  # кг, шт, л и т.д.
+    current_stock = sa.Column(sa.Float, default=0)
+    min_stock = sa.Column(sa.Float, default=0)
+    cost_per_unit = sa.Column(sa.Float, default=0)
+    created_at = sa.Column(sa.DateTime, default=datetime.utcnow)
+    updated_at = sa.Column(sa.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Связь с составом блюд
-    menu_item_ingredients = db.relationship('MenuItemIngredient', back_populates='product', cascade='all, delete-orphan')
+    menu_item_ingredients = orm.relationship('MenuItemIngredient', back_populates='product', cascade='all, delete-orphan')
     # История поставок
-    supplies = db.relationship('ProductSupply', back_populates='product', cascade='all, delete-orphan')
+    supplies = orm.relationship('ProductSupply', back_populates='product', cascade='all, delete-orphan')
 
-class MenuItemIngredient(db.Model):
+class MenuItemIngredient(Model):
     __tablename__ = 'menu_item_ingredients'
+    __table_args__ = (
+        sa.Index('menu_item_ingredients_menu_item_id_product_id_idx', 'menu_item_id', 'product_id'),
+        sa.Index('menu_item_ingredients_product_id_idx', 'product_id'),
+    )
     
-    id = db.Column(db.Integer, primary_key=True)
-    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
-    quantity_required = db.Column(db.Float, nullable=False)
+    id = sa.Column(sa.Integer, primary_key=True)
+    menu_item_id = sa.Column(sa.Integer, sa.ForeignKey('menu_items.id'), nullable=False)
+    product_id = sa.Column(sa.Integer, sa.ForeignKey('products.id'), nullable=False)
+    quantity_required = sa.Column(sa.Float, nullable=False)
     
     # Связи
-    menu_item = db.relationship('MenuItem', back_populates='ingredients')
-    product = db.relationship('Product', back_populates='menu_item_ingredients')
+    menu_item = orm.relationship('MenuItem', back_populates='ingredients')
+    product = orm.relationship('Product', back_populates='menu_item_ingredients')
 
-class ProductSupply(db.Model):
+class ProductSupply(Model):
     __tablename__ = 'product_supplies'
+    __table_args__ = (
+        sa.Index('product_supplies_supply_date_idx', 'supply_date'),
+        sa.Index('product_supplies_supplier_name_supply_date_idx', 'supplier_name', 'supply_date'),
+        sa.Index('product_supplies_product_id_idx', 'product_id'),
+    )
     
-    id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
-    quantity = db.Column(db.Float, nullable=False)
-    supply_date = db.Column(db.DateTime, default=datetime.utcnow)
-    supplier_name = db.Column(db.String(200))
-    cost = db.Column(db.Float)
-    batch_number = db.Column(db.String(100))
+    id = sa.Column(sa.Integer, primary_key=True)
+    product_id = sa.Column(sa.Integer, sa.ForeignKey('products.id'), nullable=False)
+    quantity = sa.Column(sa.Float, nullable=False)
+    supply_date = sa.Column(sa.DateTime, default=datetime.utcnow)
+    supplier_name = sa.Column(sa.String(200))
+    cost = sa.Column(sa.Float)
+    batch_number = sa.Column(sa.String(100))
     
     # Связи
-    product = db.relationship('Product', back_populates='supplies')
+    product = orm.relationship('Product', back_populates='supplies')
 
 # Обновляем модель MenuItem
-class MenuItem(db.Model):
+class MenuItem(Model):
     __tablename__ = 'menu_items'
+    __table_args__ = (
+        sa.Index('menu_items_category_id_idx', 'category_id'),
+    )
     
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    description = db.Column(db.Text)
-    price = db.Column(db.Float, nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
-    is_available = db.Column(db.Boolean, default=True)
-    image_url = db.Column(db.String(255))
-    cooking_time = db.Column(db.Integer)  # время приготовления в минутах
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.String(100), nullable=False)
+    description = sa.Column(sa.Text)
+    price = sa.Column(sa.Float, nullable=False)
+    category_id = sa.Column(sa.Integer, sa.ForeignKey('categories.id'))
+    is_available = sa.Column(sa.Boolean, default=True)
+    image_url = sa.Column(sa.String(255))
+    cooking_time = sa.Column(sa.Integer)  # время приготовления в минутах
     
     # Связи
-    category = db.relationship('Category', back_populates='menu_items')
-    ingredients = db.relationship('MenuItemIngredient', back_populates='menu_item', cascade='all, delete-orphan')
-    order_items = db.relationship('OrderItem', back_populates='menu_item')
+    category = orm.relationship('Category', back_populates='menu_items')
+    ingredients = orm.relationship('MenuItemIngredient', back_populates='menu_item', cascade='all, delete-orphan')
+    order_items = orm.relationship('OrderItem', back_populates='menu_item')
     
     @property
     def is_available_calculated(self):
@@ -85,34 +136,141 @@ class MenuItem(db.Model):
                 })
         return missing
 
-class Category(db.Model):
+class Category(Model):
     __tablename__ = 'categories'
     
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), nullable=False)
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.String(50), nullable=False)
     
-    menu_items = db.relationship('MenuItem', back_populates='category')
+    menu_items = orm.relationship('MenuItem', back_populates='category')
 
-class Order(db.Model):
+class Order(Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        sa.Index('orders_created_at_id_idx', 'created_at', 'id'),
+        sa.Index('orders_status_created_at_idx', 'status', 'created_at'),
+        sa.Index('orders_table_number_created_at_idx', 'table_number', 'created_at'),
+    )
     
-    id = db.Column(db.Integer, primary_key=True)
-    table_number = db.Column(db.Integer, nullable=False)
-    status = db.Column(db.String(20), default='pending')  # pending, in_progress, completed, cancelled
-    total_amount = db.Column(db.Float, default=0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    id = sa.Column(sa.Integer, primary_key=True)
+    table_number = sa.Column(sa.Integer, nullable=False)
+    status = sa.Column(sa.String(20), default='pending')  # pending, in_progress, completed, cancelled
+    total_amount = sa.Column(sa.Float, default=0)
+    # card_online (предоплата), card_terminal или cash (постоплата у проводника)
+    payment_method = sa.Column(sa.String(20), nullable=False, default='cash', server_default='cash')
+    # not_required, awaiting, failed, paid, refund_pending, refund_requested, refunded
+    payment_status = sa.Column(sa.String(20), nullable=False, default='not_required', server_default='not_required')
+    payment_id = sa.Column(sa.String(64))  # платеж на стороне эквайера
+    created_at = sa.Column(sa.DateTime, default=datetime.utcnow)
+    updated_at = sa.Column(sa.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    order_items = db.relationship('OrderItem', back_populates='order', cascade='all, delete-orphan')
+    order_items = orm.relationship('OrderItem', back_populates='order', cascade='all, delete-orphan')
 
-class OrderItem(db.Model):
+class OrderItem(Model):
     __tablename__ = 'order_items'
+    __table_args__ = (
+        sa.Index('order_items_order_id_idx', 'order_id'),
+        sa.Index('order_items_menu_item_id_idx', 'menu_item_id'),
+    )
+    
+    id = sa.Column(sa.Integer, primary_key=True)
+    order_id = sa.Column(sa.Integer, sa.ForeignKey('orders.id'), nullable=False)
+    menu_item_id = sa.Column(sa.Integer, sa.ForeignKey('menu_items.id'), nullable=False)
+    quantity = sa.Column(sa.Integer, nullable=False)
+    price = sa.Column(sa.Float, nullable=False)
+    
+    order = orm.relationship('Order', back_populates='order_items')
+    menu_item = orm.relationship('MenuItem', back_populates='order_items')
+
+class OrderRollup(Model):
+    """Почасовые счетчики заказов по статусам"""
+    __tablename__ = 'order_rollup_hourly'
+    
+    bucket_start = sa.Column(sa.DateTime, primary_key=True)
+    status = sa.Column(sa.String(20), primary_key=True)
+    order_count = sa.Column(sa.Integer, nullable=False, default=0)
+    revenue = sa.Column(sa.Float, nullable=False, default=0)
+
+class SalesRollup(Model):
+    """Почасовые счетчики продаж по блюдам"""
+    __tablename__ = 'sales_rollup_hourly'
+    
+    bucket_start = sa.Column(sa.DateTime, primary_key=True)
+    menu_item_id = sa.Column(sa.Integer, sa.ForeignKey('menu_items.id'), primary_key=True)
+    ordered_quantity = sa.Column(sa.Integer, nullable=False, default=0)
+    ordered_revenue = sa.Column(sa.Float, nullable=False, default=0)
+    completed_quantity = sa.Column(sa.Integer, nullable=False, default=0)
+    completed_revenue = sa.Column(sa.Float, nullable=False, default=0)
+    cancelled_quantity = sa.Column(sa.Integer, nullable=False, default=0)
+    cancelled_revenue = sa.Column(sa.Float, nullable=False, default=0)
+
+class KitchenTask(Model):
+    """Задача на готовку: одна порция блюда из заказа"""
+    __tablename__ = 'kitchen_tasks'
+    __table_args__ = (
+        # Выборка следующих задач очереди в порядке services.kitchen.queue_order
+        sa.Index(
+            'kitchen_tasks_status_queue_idx',
+            'status', 'order_created_at', sa.text('coalesce(cooking_time, 0) DESC'), 'id'
+        ),
+        sa.Index('kitchen_tasks_order_id_idx', 'order_id'),
+    )
     
-    id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
-    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'), nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    id = sa.Column(sa.Integer, primary_key=True)
+    order_id = sa.Column(sa.Integer, sa.ForeignKey('orders.id'), nullable=False)
+    order_item_id = sa.Column(sa.Integer, sa.ForeignKey('order_items.id'), nullable=False)
+    menu_item_id = sa.Column(sa.Integer, sa.ForeignKey('menu_items.id'), nullable=False)
+    status = sa.Column(sa.String(20), nullable=False, default='queued')  # queued, cooking, ready, delivering, delivered, cancelled
+    # Копии полей заказа и блюда, чтобы сортировать очередь без JOIN
+    order_created_at = sa.Column(sa.DateTime, nullable=False)
+    cooking_time = sa.Column(sa.Integer)
+    assignee = sa.Column(sa.String(100))  # повар или официант, взявший задачу
+    created_at = sa.Column(sa.DateTime, default=datetime.utcnow)
+    updated_at = sa.Column(sa.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class KitchenSettings(Model):
+    """Настройки кухни, общие для всех процессов приложения; одна строка с id = 1"""
+    __tablename__ = 'kitchen_settings'
     
-    order = db.relationship('Order', back_populates='order_items')
-    menu_item = db.relationship('MenuItem', back_populates='order_items')
\ No newline at end of file
+    id = sa.Column(sa.Integer, primary_key=True)
+    # Число работающих станций для прогноза готовности; без строки - настройка kitchen_stations
+    stations = sa.Column(sa.Integer, nullable=False)
+    updated_at = sa.Column(sa.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PaymentEvent(Model):
+    """Вебхук эквайера; event_id - ключ идемпотентности"""
+    __tablename__ = 'payment_events'
+    __table_args__ = (
+        # Очередь еще не примененных событий
+        sa.Index(
+            'payment_events_pending_idx',
+            'id',
+            info={'where': 'processed_at IS NULL'}
+        ),
+    )
+    
+    id = sa.Column(sa.Integer, primary_key=True)
+    event_id = sa.Column(sa.String(64), nullable=False, unique=True)
+    event_type = sa.Column(sa.String(40), nullable=False)  # payment.succeeded, payment.failed, refund.succeeded
+    payment_id = sa.Column(sa.String(64), nullable=False)
+    # Без внешнего ключа: событие по неизвестному заказу тоже сохраняется и помечается как пропущенное
+    order_id = sa.Column(sa.Integer, nullable=False)
+    amount = sa.Column(sa.Float)
+    received_at = sa.Column(sa.DateTime, default=datetime.utcnow)
+    processed_at = sa.Column(sa.DateTime)
+    result = sa.Column(sa.String(40))  # что сделал обработчик
+
+
+class JournalReplay(Model):
+    """Запись локального журнала, уже перенесенная в базу; key - ключ идемпотентности"""
+    __tablename__ = 'journal_replays'
+
+    key = sa.Column(sa.String(64), primary_key=True)
+    kind = sa.Column(sa.String(20), nullable=False)  # order или supplies
+    recorded_at = sa.Column(sa.DateTime, nullable=False)  # когда запись попала в журнал
+    replayed_at = sa.Column(sa.DateTime, default=datetime.utcnow)
+    outcome = sa.Column(sa.String(20), nullable=False)  # applied или rejected
+    order_id = sa.Column(sa.Integer, sa.ForeignKey('orders.id'))
+    detail = sa.Column(sa.JSON)  # причина отказа или отчет о загрузке поставок
@@ -0,0 +1,78 @@
+from flask import Blueprint, request, jsonify
+from models import db
+from services import kitchen
+from services.scheduler import kitchen_scheduler
+
+kitchen_bp = Blueprint('kitchen', __name__)
+
+MAX_CLAIM = 20
+
+@kitchen_bp.route('/kitchen/tasks', methods=['GET'])
+def get_tasks():
+    """Получить задачи в статусе status в порядке очереди"""
+    status = request.args.get('status', 'queued')
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+
+    if status not in kitchen.TASK_FLOW + ('cancelled',):
+        return jsonify({'error': f'Invalid status. Must be one of: {", ".join(kitchen.TASK_FLOW)}'}), 400
+
+    return jsonify([_serialize_task(task) for task in kitchen.list_tasks(db.session, status, limit)])
+
+@kitchen_bp.route('/kitchen/tasks/claim', methods=['POST'])
+def claim_tasks():
+    """Взять следующие задачи: повару - на готовку, официанту - на доставку"""
+    data = request.get_json()
+
+    worker = data.get('worker')
+    if not worker:
+        return jsonify({'error': 'worker is required'}), 400
+    limit = min(max(int(data.get('limit', 1)), 1), MAX_CLAIM)
+
+    tasks = kitchen.claim_tasks(db.session, worker, data.get('stage', 'cooking'), limit)
+    db.session.commit()
+
+    return jsonify([_serialize_task(task) for task in tasks])
+
+@kitchen_bp.route('/kitchen/tasks/<int:task_id>/complete', methods=['POST'])
+def complete_task(task_id):
+    """Завершить этап задачи: приготовлено или доставлено"""
+    data = request.get_json()
+
+    status = kitchen.complete_task(db.session, task_id, data.get('worker'))
+    db.session.commit()
+
+    return jsonify({'id': task_id, 'status': status})
+
+@kitchen_bp.route('/kitchen/queue', methods=['GET'])
+def get_queue_summary():
+    """Получить число задач по статусам и загрузку кухни"""
+    return jsonify({
+        'tasks': kitchen.queue_summary(db.session),
+        'stations': kitchen_scheduler.stations,
+        'backlog_minutes': kitchen_scheduler.backlog().total_seconds() / 60
+    })
+
+@kitchen_bp.route('/kitchen/stations', methods=['PUT'])
+def set_stations():
+    """Задать число работающих станций (для прогноза готовности заказов)"""
+    data = request.get_json()
+    
+    stations = data.get('stations')
+    if not isinstance(stations, int) or stations < 1:
+        return jsonify({'error': 'stations must be a positive integer'}), 400
+    
+    kitchen.set_stations(db.session, stations)
+    db.session.commit()
+    return jsonify({'stations': stations})
+
+def _serialize_task(task):
+    return {
+        'id': task.id,
+        'order_id': task.order_id,
+        'order_item_id': task.order_item_id,
+        'menu_item_id': task.menu_item_id,
+        'status': task.status,
+        'order_created_at': task.order_created_at.isoformat(),
+        'cooking_time': task.cooking_time,
+        'assignee': task.assignee
+    }
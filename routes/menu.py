@@ -1,5 +1,9 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
+from sqlalchemy.orm import joinedload
 from models import db, MenuItem, Category, MenuItemIngredient, Product
+from services.availability import availability_index
+from services.menu_cache import menu_cache
+from services.transaction import on_commit
 
 menu_bp = Blueprint('menu', __name__)
 
@@ -8,13 +12,25 @@ def get_menu():
     """Получить меню с информацией о доступности"""
     category_id = request.args.get('category_id')
     
-    query = MenuItem.query
+    # Доступность и состав берем из индекса, без запросов по ингредиентам
+    availability_index.ensure_loaded(db.session)
+    
+    # Готовый JSON берем из кэша; пересобирается он только после изменений меню
+    body, etag = menu_cache.get(category_id, lambda: current_app.json.dumps(_serialize_menu(category_id)).encode())
+    
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def _serialize_menu(category_id):
+    query = MenuItem.query.options(joinedload(MenuItem.category))
     if category_id:
         query = query.filter_by(category_id=category_id)
     
     menu_items = query.all()
     
-    return jsonify([{
+    return [{
         'id': item.id,
         'name': item.name,
         'description': item.description,
@@ -23,16 +39,10 @@ def get_menu():
         'category_name': item.category.name if item.category else None,
         'image_url': item.image_url,
         'cooking_time': item.cooking_time,
-        'is_available': item.is_available and item.is_available_calculated,
-        'ingredients': [{
-            'id': ing.id,
-            'product_id': ing.product_id,
-            'product_name': ing.product.name,
-            'quantity_required': ing.quantity_required,
-            'unit': ing.product.unit
-        } for ing in item.ingredients],
-        'missing_ingredients': item.get_missing_ingredients() if not item.is_available_calculated else []
-    } for item in menu_items])
+        'is_available': item.is_available and availability_index.is_available(item.id),
+        'ingredients': availability_index.get_ingredients(item.id),
+        'missing_ingredients': availability_index.get_missing_ingredients(item.id)
+    } for item in menu_items]
 
 @menu_bp.route('/menu/<int:item_id>/ingredients', methods=['POST'])
 def add_ingredient_to_item(item_id):
@@ -47,6 +57,9 @@ def add_ingredient_to_item(item_id):
     )
     
     db.session.add(ingredient)
+    db.session.flush()
+    on_commit(db.session, availability_index.add_ingredient,
+              ingredient.id, item_id, ingredient.product_id, ingredient.quantity_required)
     db.session.commit()
     
     return jsonify({'message': 'Ingredient added'}), 201
@@ -59,6 +72,7 @@ def remove_ingredient_from_item(item_id, ingredient_id):
         menu_item_id=item_id
     ).first_or_404()
     
+    on_commit(db.session, availability_index.remove_ingredient, ingredient.id)
     db.session.delete(ingredient)
     db.session.commit()
     
@@ -68,10 +82,11 @@ def remove_ingredient_from_item(item_id, ingredient_id):
 def check_availability(item_id):
     """Проверить доступность блюда и показать недостающие ингредиенты"""
     menu_item = MenuItem.query.get_or_404(item_id)
+    availability_index.ensure_loaded(db.session)
     
     return jsonify({
         'item_id': menu_item.id,
         'item_name': menu_item.name,
-        'is_available': menu_item.is_available_calculated,
-        'missing_ingredients': menu_item.get_missing_ingredients()
+        'is_available': availability_index.is_available(menu_item.id),
+        'missing_ingredients': availability_index.get_missing_ingredients(menu_item.id)
     })
\ No newline at end of file
@@ -1,21 +1,30 @@
-from flask import Blueprint, request, jsonify
+import base64
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import selectinload
 from models import db, Order, OrderItem, MenuItem, Product, MenuItemIngredient
+from services import rollups
+from services.errors import ServiceError
+from services.orders import cancel_order as cancel_order_service, place_order, set_order_status
+from services.scheduler import kitchen_scheduler
+from services.stats import BUCKETS, naive_utc, order_stats
 from datetime import datetime
 
 orders_bp = Blueprint('orders', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
 @orders_bp.route('/orders', methods=['GET'])
 def get_orders():
-    """Получить список всех заказов"""
+    """Получить список заказов (постранично, от новых к старым)"""
     status = request.args.get('status')
     
     query = Order.query
     if status:
         query = query.filter_by(status=status)
     
-    orders = query.order_by(Order.created_at.desc()).all()
-    
-    return jsonify([{
+    return _paginated_orders(query, lambda order: {
         'id': order.id,
         'table_number': order.table_number,
         'status': order.status,
@@ -29,67 +38,20 @@ def get_orders():
             'quantity': item.quantity,
             'price': item.price
         } for item in order.order_items]
-    } for order in orders])
+    })
 
 @orders_bp.route('/orders', methods=['POST'])
 def create_order():
     """Создать новый заказ"""
     data = request.get_json()
     
-    # Проверяем доступность всех блюд в заказе
-    for item in data['items']:
-        menu_item = MenuItem.query.get(item['menu_item_id'])
-        if not menu_item:
-            return jsonify({'error': f'Menu item {item["menu_item_id"]} not found'}), 404
-        
-        if not menu_item.is_available:
-            return jsonify({'error': f'Menu item {menu_item.name} is not available'}), 400
-        
-        # Проверяем наличие ингредиентов
-        if not menu_item.is_available_calculated:
-            missing = menu_item.get_missing_ingredients()
-            return jsonify({
-                'error': f'Not enough ingredients for {menu_item.name}',
-                'missing_ingredients': missing
-            }), 400
-    
-    # Создаем заказ
-    order = Order(
-        table_number=data['table_number'],
-        status='pending',
-        total_amount=0
-    )
-    
-    db.session.add(order)
-    db.session.flush()  # Получаем ID заказа
-    
-    # Добавляем позиции заказа и списываем ингредиенты
-    total_amount = 0
-    for item_data in data['items']:
-        menu_item = MenuItem.query.get(item_data['menu_item_id'])
-        
-        order_item = OrderItem(
-            order_id=order.id,
-            menu_item_id=item_data['menu_item_id'],
-            quantity=item_data['quantity'],
-            price=menu_item.price
-        )
-        
-        total_amount += menu_item.price * item_data['quantity']
-        
-        # Списываем ингредиенты
-        for ingredient in menu_item.ingredients:
-            ingredient.product.current_stock -= ingredient.quantity_required * item_data['quantity']
-            ingredient.product.updated_at = datetime.utcnow()
-        
-        db.session.add(order_item)
-    
-    order.total_amount = total_amount
+    order = place_order(db.session, data['table_number'], data['items'])
+    order_id, total_amount = order.id, order.total_amount
     db.session.commit()
     
     return jsonify({
         'message': 'Order created successfully',
-        'order_id': order.id,
+        'order_id': order_id,
         'total_amount': total_amount
     }), 201
 
@@ -97,6 +59,7 @@ def create_order():
 def get_order(order_id):
     """Получить информацию о конкретном заказе"""
     order = Order.query.get_or_404(order_id)
+    eta = kitchen_scheduler.order_eta(order.id)
     
     return jsonify({
         'id': order.id,
@@ -105,6 +68,7 @@ def get_order(order_id):
         'total_amount': order.total_amount,
         'created_at': order.created_at.isoformat(),
         'updated_at': order.updated_at.isoformat(),
+        'estimated_ready_at': eta.isoformat() if eta else None,
         'items': [{
             'id': item.id,
             'menu_item_id': item.menu_item_id,
@@ -127,16 +91,11 @@ def update_order_status(order_id):
     if new_status not in valid_statuses:
         return jsonify({'error': f'Invalid status. Must be one of: {", ".join(valid_statuses)}'}), 400
     
-    order.status = new_status
-    order.updated_at = datetime.utcnow()
-    
     # Если заказ отменен, возвращаем ингредиенты на склад
-    if new_status == 'cancelled' and order.status != 'cancelled':
-        for order_item in order.order_items:
-            menu_item = order_item.menu_item
-            for ingredient in menu_item.ingredients:
-                ingredient.product.current_stock += ingredient.quantity_required * order_item.quantity
-                ingredient.product.updated_at = datetime.utcnow()
+    if new_status == 'cancelled':
+        cancel_order_service(db.session, order.id)
+    else:
+        set_order_status(db.session, order.id, new_status)
     
     db.session.commit()
     
@@ -148,14 +107,8 @@ def cancel_order(order_id):
     order = Order.query.get_or_404(order_id)
     
     # Возвращаем ингредиенты на склад
-    for order_item in order.order_items:
-        menu_item = order_item.menu_item
-        for ingredient in menu_item.ingredients:
-            ingredient.product.current_stock += ingredient.quantity_required * order_item.quantity
-            ingredient.product.updated_at = datetime.utcnow()
-    
-    order.status = 'cancelled'
-    order.updated_at = datetime.utcnow()
+    if not cancel_order_service(db.session, order.id):
+        return jsonify({'error': 'Order is already cancelled'}), 400
     
     db.session.commit()
     
@@ -164,11 +117,9 @@ def cancel_order(order_id):
 @orders_bp.route('/orders/table/<int:table_number>', methods=['GET'])
 def get_orders_by_table(table_number):
     """Получить заказы для конкретного стола"""
-    orders = Order.query.filter_by(table_number=table_number)\
-        .order_by(Order.created_at.desc())\
-        .all()
+    query = Order.query.filter_by(table_number=table_number)
     
-    return jsonify([{
+    return _paginated_orders(query, lambda order: {
         'id': order.id,
         'table_number': order.table_number,
         'status': order.status,
@@ -179,45 +130,89 @@ def get_orders_by_table(table_number):
             'quantity': item.quantity,
             'price': item.price
         } for item in order.order_items]
-    } for order in orders])
+    })
 
 @orders_bp.route('/orders/stats', methods=['GET'])
 def get_order_stats():
-    """Получить статистику по заказам"""
-    # Статистика за сегодня
-    today = datetime.utcnow().date()
-    today_start = datetime(today.year, today.month, today.day)
-    
-    today_orders = Order.query.filter(Order.created_at >= today_start).all()
-    completed_orders = [o for o in today_orders if o.status == 'completed']
-    
-    total_revenue = sum(order.total_amount for order in completed_orders)
-    avg_order_value = total_revenue / len(completed_orders) if completed_orders else 0
-    
-    # Самые популярные блюда
-    from sqlalchemy import func
-    popular_items = db.session.query(
-        OrderItem.menu_item_id,
-        MenuItem.name,
-        func.sum(OrderItem.quantity).label('total_quantity')
-    ).join(MenuItem).filter(
-        Order.order_id == OrderItem.order_id,
-        Order.status == 'completed',
-        Order.created_at >= today_start
-    ).group_by(OrderItem.menu_item_id)\
-     .order_by(func.sum(OrderItem.quantity).desc())\
-     .limit(5).all()
+    """Получить статистику по заказам за окно времени (по умолчанию - за сегодня)"""
+    now = datetime.utcnow()
+    today_start = datetime(now.year, now.month, now.day)
+    
+    start = _parse_datetime_arg('from', today_start)
+    end = _parse_datetime_arg('to', now)
+    bucket = request.args.get('bucket', 'hour')
+    top = min(max(request.args.get('top', 5, type=int), 1), 50)
+    
+    if bucket not in BUCKETS:
+        return jsonify({'error': f'Invalid bucket. Must be one of: {", ".join(BUCKETS)}'}), 400
+    if start >= end:
+        return jsonify({'error': "'from' must be earlier than 'to'"}), 400
+    
+    # Окна, выровненные по часам, считаем по роллапам, остальные - по заказам
+    if rollups.covers(start, end, BUCKETS[bucket]):
+        stats = rollups.order_stats(db.session, start, end, BUCKETS[bucket], top)
+    else:
+        stats = order_stats(db.session, start, end, BUCKETS[bucket], top)
     
     return jsonify({
-        'today': {
-            'total_orders': len(today_orders),
-            'completed_orders': len(completed_orders),
-            'total_revenue': total_revenue,
-            'average_order_value': avg_order_value
-        },
-        'popular_items': [{
-            'menu_item_id': item.menu_item_id,
-            'name': item.name,
-            'total_quantity': item.total_quantity
-        } for item in popular_items]
-    })
\ No newline at end of file
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'bucket': bucket,
+        **stats
+    })
+
+def _encode_cursor(order):
+    raw = f'{order.created_at.isoformat()}|{order.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(order_id)
+    except ValueError:
+        raise ServiceError('Invalid cursor')
+
+def _parse_datetime_arg(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return naive_utc(datetime.fromisoformat(value))
+    except ValueError:
+        raise ServiceError(f"Invalid '{name}' datetime: {value}")
+
+def _paginated_orders(query, serialize):
+    """Страница заказов по курсору (created_at, id) в виде потокового JSON-массива.
+
+    Заказы, их позиции и названия блюд загружаются ровно двумя запросами.
+    Курсор следующей страницы отдается в заголовке X-Next-Cursor.
+    """
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+    
+    if cursor:
+        created_at, order_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            Order.created_at < created_at,
+            and_(Order.created_at == created_at, Order.id < order_id)
+        ))
+    
+    orders = query.options(
+        selectinload(Order.order_items).joinedload(OrderItem.menu_item).load_only(MenuItem.name)
+    ).order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    
+    def generate():
+        yield '['
+        for i, order in enumerate(orders):
+            if i:
+                yield ','
+            yield current_app.json.dumps(serialize(order))
+        yield ']'
+    
+    response = Response(stream_with_context(generate()), mimetype='application/json')
+    if has_more:
+        response.headers['X-Next-Cursor'] = _encode_cursor(orders[-1])
+    return response
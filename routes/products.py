@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from models import db, Product, ProductSupply, MenuItem
+from services.availability import availability_index
+from services.stock import apply_stock_delta
+from services.transaction import on_commit
 from datetime import datetime
 
 products_bp = Blueprint('products', __name__)
@@ -33,6 +36,9 @@ def create_product():
     )
     
     db.session.add(product)
+    db.session.flush()
+    on_commit(db.session, availability_index.set_product,
+              product.id, product.name, product.unit, product.current_stock)
     db.session.commit()
     
     return jsonify({'message': 'Product created', 'id': product.id}), 201
@@ -71,6 +77,8 @@ def update_product(product_id):
     product.min_stock = data.get('min_stock', product.min_stock)
     product.cost_per_unit = data.get('cost_per_unit', product.cost_per_unit)
     product.updated_at = datetime.utcnow()
+    on_commit(db.session, availability_index.set_product,
+              product.id, product.name, product.unit, product.current_stock)
     
     db.session.commit()
     
@@ -85,6 +93,7 @@ def delete_product(product_id):
     if product.menu_item_ingredients:
         return jsonify({'error': 'Cannot delete product that is used in menu items'}), 400
     
+    on_commit(db.session, availability_index.remove_product, product.id)
     db.session.delete(product)
     db.session.commit()
     
@@ -105,15 +114,15 @@ def add_product_supply(product_id):
         batch_number=data.get('batch_number'),
         supply_date=datetime.utcnow()
     )
-    
-    # Обновляем текущий запас
-    product.current_stock += quantity
-    product.updated_at = datetime.utcnow()
-    
     db.session.add(supply)
+    
+    # Атомарно прибавляем к запасу в UPDATE, а не читаем-меняем-пишем загруженную строку:
+    # иначе параллельная поставка или заказ затрут друг друга
+    new_stock = apply_stock_delta(db.session, {product_id: quantity})
+    on_commit(db.session, availability_index.update_stock, new_stock)
     db.session.commit()
     
-    return jsonify({'message': 'Supply added', 'new_stock': product.current_stock})
+    return jsonify({'message': 'Supply added', 'new_stock': new_stock.get(product_id, product.current_stock)})
 
 @products_bp.route('/products/low-stock', methods=['GET'])
 def get_low_stock_products():
@@ -1,9 +1,21 @@
-from flask import Blueprint, request, jsonify
+import codecs
+import csv
+import io
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from models import db, ProductSupply, Product
+from services.errors import ServiceError
+from services.supplier_report import month_start, next_month_start, supplier_product_breakdown, supplier_totals
+from services.supplies import ingest_supplies, parse_csv, parse_ndjson
 from datetime import datetime, timedelta
 
 supplier_bp = Blueprint('supplier', __name__)
 
+TOTALS_CSV_FIELDS = ['supplier_name', 'total_quantity', 'total_cost', 'supply_count', 'products']
+BREAKDOWN_CSV_FIELDS = [
+    'supplier_name', 'product_id', 'product_name', 'unit',
+    'total_quantity', 'total_cost', 'supply_count'
+]
+
 @supplier_bp.route('/supplier/supplies', methods=['GET'])
 def get_supplies():
     """Получить историю поставок (для поставщиков)"""
@@ -38,40 +50,35 @@ def create_supply_bulk():
     data = request.get_json()
     supplies_data = data['supplies']
     
-    created_supplies = []
-    
-    for supply_data in supplies_data:
-        product = Product.query.get(supply_data['product_id'])
-        if not product:
-            continue
-            
-        supply = ProductSupply(
-            product_id=supply_data['product_id'],
-            quantity=supply_data['quantity'],
-            supplier_name=supply_data.get('supplier_name'),
-            cost=supply_data.get('cost'),
-            batch_number=supply_data.get('batch_number'),
-            supply_date=datetime.utcnow()
-        )
-        
-        # Обновляем запас
-        product.current_stock += supply_data['quantity']
-        product.updated_at = datetime.utcnow()
-        
-        db.session.add(supply)
-        created_supplies.append({
-            'product_id': supply.product_id,
-            'product_name': product.name,
-            'quantity': supply.quantity
-        })
-    
+    report = ingest_supplies(
+        db.session,
+        enumerate(supplies_data, start=1),
+        keep_accepted=True
+    )
     db.session.commit()
     
     return jsonify({
-        'message': f'{len(created_supplies)} supplies added',
-        'supplies': created_supplies
+        'message': f'{report["accepted"]} supplies added',
+        'supplies': report['supplies'],
+        'rejected': report['errors']
     }), 201
 
+@supplier_bp.route('/supplier/supplies/import', methods=['POST'])
+def import_supplies():
+    """Потоковая загрузка накладной поставщика (CSV или JSON Lines)"""
+    if request.mimetype == 'text/csv':
+        parse = parse_csv
+    elif request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        parse = parse_ndjson
+    else:
+        return jsonify({'error': 'Content-Type must be text/csv or application/x-ndjson'}), 415
+    
+    lines = codecs.iterdecode(request.stream, 'utf-8-sig')
+    report = ingest_supplies(db.session, parse(lines))
+    db.session.commit()
+    
+    return jsonify(report), 201
+
 @supplier_bp.route('/supplier/products-to-order', methods=['GET'])
 def get_products_to_order():
     """Получить список продуктов для заказа у поставщиков"""
@@ -93,7 +100,7 @@ def get_products_to_order():
 
 @supplier_bp.route('/supplier/monthly-report', methods=['GET'])
 def get_monthly_supplier_report():
-    """Получить месячный отчет по поставкам"""
+    """Получить отчет по поставкам за месяц или диапазон месяцев (from/to в формате YYYY-MM)"""
     month = request.args.get('month', type=int)
     year = request.args.get('year', type=int)
     
@@ -103,42 +110,71 @@ def get_monthly_supplier_report():
         month = now.month
         year = now.year
     
-    start_date = datetime(year, month, 1)
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1)
-    else:
-        end_date = datetime(year, month + 1, 1)
+    from_year, from_month = _parse_month_arg('from', (year, month))
+    to_year, to_month = _parse_month_arg('to', (from_year, from_month))
     
-    supplies = ProductSupply.query.filter(
-        ProductSupply.supply_date >= start_date,
-        ProductSupply.supply_date < end_date
-    ).all()
+    start_date = month_start(from_year, from_month)
+    end_date = next_month_start(to_year, to_month)
+    if start_date >= end_date:
+        return jsonify({'error': "'from' must not be later than 'to'"}), 400
+    
+    breakdown = request.args.get('breakdown') == 'product'
+    
+    if request.args.get('format') == 'csv':
+        if breakdown:
+            rows = supplier_product_breakdown(db.session, start_date, end_date)
+            fieldnames = BREAKDOWN_CSV_FIELDS
+        else:
+            rows = supplier_totals(db.session, start_date, end_date)
+            fieldnames = TOTALS_CSV_FIELDS
+        filename = f'supplies_{from_year}-{from_month:02d}_{to_year}-{to_month:02d}.csv'
+        return _csv_response(rows, fieldnames, filename)
     
-    # Группировка по поставщикам
-    supplier_stats = {}
-    for supply in supplies:
-        supplier = supply.supplier_name or 'Unknown'
-        if supplier not in supplier_stats:
-            supplier_stats[supplier] = {
-                'supplier_name': supplier,
-                'total_quantity': 0,
-                'total_cost': 0,
-                'supply_count': 0,
-                'products': set()
-            }
-        
-        supplier_stats[supplier]['total_quantity'] += supply.quantity
-        supplier_stats[supplier]['total_cost'] += (supply.cost or 0) * supply.quantity
-        supplier_stats[supplier]['supply_count'] += 1
-        supplier_stats[supplier]['products'].add(supply.product.name)
-    
-    # Преобразуем sets в lists
-    for stat in supplier_stats.values():
-        stat['products'] = list(stat['products'])
+    supplier_stats = list(supplier_totals(db.session, start_date, end_date))
+    
+    if breakdown:
+        by_supplier = {}
+        for row in supplier_product_breakdown(db.session, start_date, end_date):
+            by_supplier.setdefault(row.pop('supplier_name'), []).append(row)
+        for stat in supplier_stats:
+            stat['products_breakdown'] = by_supplier.get(stat['supplier_name'], [])
     
     return jsonify({
-        'month': month,
-        'year': year,
-        'total_supplies': len(supplies),
-        'supplier_stats': list(supplier_stats.values())
-    })
\ No newline at end of file
+        'month': from_month,
+        'year': from_year,
+        'from': f'{from_year}-{from_month:02d}',
+        'to': f'{to_year}-{to_month:02d}',
+        'total_supplies': sum(stat['supply_count'] for stat in supplier_stats),
+        'supplier_stats': supplier_stats
+    })
+
+def _parse_month_arg(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        parsed = datetime.strptime(value, '%Y-%m')
+    except ValueError:
+        raise ServiceError(f"Invalid '{name}' month, expected YYYY-MM: {value}")
+    return parsed.year, parsed.month
+
+def _csv_response(rows, fieldnames, filename):
+    """Отдать строки отчета CSV-файлом, построчно"""
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in rows:
+            if isinstance(row.get('products'), list):
+                row['products'] = '; '.join(row['products'])
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
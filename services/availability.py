@@ -0,0 +1,228 @@
+import threading
+
+from sqlalchemy import select
+
+from models import MenuItemIngredient, Product
+
+
+class AvailabilityIndex:
+    """Индекс доступности блюд по остаткам продуктов.
+
+    Строится один раз при старте приложения и дальше обновляется
+    инкрементально при каждом изменении остатков или состава блюд,
+    так что меню отвечает на вопрос о доступности без запросов в БД.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        # Растет при каждом изменении, видимом в меню (состав, названия, доступность)
+        self.version = 0
+        # product_id -> {'name', 'unit', 'stock'}
+        self.products = {}
+        # ingredient_id -> {'id', 'menu_item_id', 'product_id', 'quantity_required'}
+        self.ingredients = {}
+        # menu_item_id -> [ingredient_id, ...]
+        self.recipes = {}
+        # product_id -> {ingredient_id, ...}
+        self.dependents = {}
+        # menu_item_id -> число ингредиентов, которых не хватает
+        self.shortfalls = {}
+        # Подписчики на изменения доступности: callback(deltas)
+        self.listeners = []
+
+    def build(self, session):
+        """Построить индекс с нуля (два запроса)"""
+        products = session.execute(
+            select(Product.id, Product.name, Product.unit, Product.current_stock)
+        ).all()
+        ingredients = session.execute(
+            select(
+                MenuItemIngredient.id,
+                MenuItemIngredient.menu_item_id,
+                MenuItemIngredient.product_id,
+                MenuItemIngredient.quantity_required
+            )
+        ).all()
+
+        with self._lock:
+            # Повторная сборка подтягивает изменения других процессов: версию
+            # поднимаем и подписчиков уведомляем только если что-то поменялось
+            old_products, old_ingredients = self.products, self.ingredients
+            before = {m_id: self.delta(m_id) for m_id in self.recipes} if self.listeners else {}
+
+            self.products = {}
+            self.ingredients = {}
+            self.recipes = {}
+            self.dependents = {}
+            self.shortfalls = {}
+            for p in products:
+                self.products[p.id] = {'name': p.name, 'unit': p.unit, 'stock': p.current_stock or 0}
+            for ing in ingredients:
+                self._add_ingredient(ing.id, ing.menu_item_id, ing.product_id, ing.quantity_required)
+
+            if not self.loaded or (self.products, self.ingredients) != (old_products, old_ingredients):
+                self.version += 1
+            self.loaded = True
+            changed = {
+                m_id for m_id in before.keys() | self.recipes.keys()
+                if before.get(m_id) != self.delta(m_id)
+            } if self.listeners else set()
+        self._notify(changed)
+
+    def ensure_loaded(self, session):
+        if not self.loaded:
+            self.build(session)
+
+    # --- Чтение ---
+
+    def is_available(self, menu_item_id):
+        return self.shortfalls.get(menu_item_id, 0) == 0
+
+    def stock(self, product_id):
+        product = self.products.get(product_id)
+        return product['stock'] if product else 0
+
+    def get_ingredients(self, menu_item_id):
+        """Состав блюда в формате ответа /api/menu"""
+        with self._lock:
+            result = []
+            for ingredient_id in self.recipes.get(menu_item_id, []):
+                ing = self.ingredients[ingredient_id]
+                product = self.products.get(ing['product_id'], {})
+                result.append({
+                    'id': ing['id'],
+                    'product_id': ing['product_id'],
+                    'product_name': product.get('name'),
+                    'quantity_required': ing['quantity_required'],
+                    'unit': product.get('unit')
+                })
+            return result
+
+    def get_missing_ingredients(self, menu_item_id):
+        """То же, что MenuItem.get_missing_ingredients, но без обращения к БД"""
+        with self._lock:
+            if self.shortfalls.get(menu_item_id, 0) == 0:
+                return []
+            missing = []
+            for ingredient_id in self.recipes.get(menu_item_id, []):
+                ing = self.ingredients[ingredient_id]
+                product = self.products.get(ing['product_id'], {})
+                stock = product.get('stock', 0)
+                if stock < ing['quantity_required']:
+                    missing.append({
+                        'product_name': product.get('name'),
+                        'required': ing['quantity_required'],
+                        'available': stock,
+                        'unit': product.get('unit')
+                    })
+            return missing
+
+    def delta(self, menu_item_id):
+        """Текущее состояние блюда в формате push-уведомления"""
+        return {
+            'menu_item_id': menu_item_id,
+            'available': self.is_available(menu_item_id),
+            'missing_ingredients': self.get_missing_ingredients(menu_item_id)
+        }
+
+    # --- Инкрементальные обновления ---
+
+    def add_listener(self, callback):
+        """Подписаться на изменения: callback получает список delta() затронутых блюд"""
+        self.listeners.append(callback)
+
+    def update_stock(self, stocks):
+        """Применить новые остатки {product_id: current_stock}"""
+        changed = set()
+        with self._lock:
+            for product_id, stock in stocks.items():
+                product = self.products.get(product_id)
+                if product is None:
+                    continue
+                old_stock = product['stock']
+                new_stock = stock or 0
+                product['stock'] = new_stock
+                for ingredient_id in self.dependents.get(product_id, ()):
+                    ing = self.ingredients[ingredient_id]
+                    # Остаток виден в меню только у недостающих ингредиентов
+                    if self._shift_shortfall(ing, old_stock, new_stock) and old_stock != new_stock:
+                        changed.add(ing['menu_item_id'])
+            if changed:
+                self.version += 1
+        self._notify(changed)
+
+    def set_product(self, product_id, name, unit, stock):
+        """Добавить продукт или обновить его описание и остаток"""
+        with self._lock:
+            if product_id in self.products:
+                self.products[product_id].update(name=name, unit=unit)
+                self.update_stock({product_id: stock})
+            else:
+                self.products[product_id] = {'name': name, 'unit': unit, 'stock': stock or 0}
+            self.version += 1
+
+    def remove_product(self, product_id):
+        with self._lock:
+            for ingredient_id in list(self.dependents.get(product_id, ())):
+                self.remove_ingredient(ingredient_id)
+            self.products.pop(product_id, None)
+            self.dependents.pop(product_id, None)
+            self.version += 1
+
+    def add_ingredient(self, ingredient_id, menu_item_id, product_id, quantity_required):
+        with self._lock:
+            self._add_ingredient(ingredient_id, menu_item_id, product_id, quantity_required)
+            self.version += 1
+        self._notify({menu_item_id})
+
+    def remove_ingredient(self, ingredient_id):
+        with self._lock:
+            ing = self.ingredients.pop(ingredient_id, None)
+            if ing is None:
+                return
+            self.recipes[ing['menu_item_id']].remove(ingredient_id)
+            self.dependents[ing['product_id']].discard(ingredient_id)
+            if self._is_short(ing):
+                self.shortfalls[ing['menu_item_id']] -= 1
+            self.version += 1
+        self._notify({ing['menu_item_id']})
+
+    def _notify(self, menu_item_ids):
+        if not menu_item_ids or not self.listeners:
+            return
+        deltas = [self.delta(menu_item_id) for menu_item_id in sorted(menu_item_ids)]
+        for callback in self.listeners:
+            callback(deltas)
+
+    def _add_ingredient(self, ingredient_id, menu_item_id, product_id, quantity_required):
+        ing = {
+            'id': ingredient_id,
+            'menu_item_id': menu_item_id,
+            'product_id': product_id,
+            'quantity_required': quantity_required
+        }
+        self.ingredients[ingredient_id] = ing
+        self.recipes.setdefault(menu_item_id, []).append(ingredient_id)
+        self.dependents.setdefault(product_id, set()).add(ingredient_id)
+        self.shortfalls.setdefault(menu_item_id, 0)
+        if self._is_short(ing):
+            self.shortfalls[menu_item_id] += 1
+
+    def _is_short(self, ing):
+        product = self.products.get(ing['product_id'])
+        stock = product['stock'] if product else 0
+        return stock < ing['quantity_required']
+
+    def _shift_shortfall(self, ing, old_stock, new_stock):
+        """Пересчитать нехватку по ингредиенту; True, если он недостающий до или после"""
+        was_short = old_stock < ing['quantity_required']
+        is_short = new_stock < ing['quantity_required']
+        if was_short and not is_short:
+            self.shortfalls[ing['menu_item_id']] -= 1
+        elif is_short and not was_short:
+            self.shortfalls[ing['menu_item_id']] += 1
+        return was_short or is_short
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,17 @@
+class ServiceError(Exception):
+    """Ошибка бизнес-логики, которую роут отдает клиенту как JSON"""
+    status_code = 400
+
+    def __init__(self, message, status_code=None, **details):
+        super().__init__(message)
+        self.message = message
+        if status_code is not None:
+            self.status_code = status_code
+        self.details = details
+
+    def to_dict(self):
+        return {'error': self.message, **self.details}
+
+
+class NotFound(ServiceError):
+    status_code = 404
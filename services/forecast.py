@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+
+from models import MenuItemIngredient, Product, SalesRollup
+from services.errors import ServiceError
+from services.stats import bucket_expr
+
+DAY_SECONDS = 86400
+# Квантиль нормального распределения для страхового запаса: закрывает спрос в 95% дней поставки
+SERVICE_LEVEL_Z = 1.65
+
+
+def daily_sales(session, start, days):
+    """Продажи блюд по дням за days дней с start из почасовых роллапов.
+
+    Возвращает (menu_item_ids, sales), где sales[day, i] - порции блюда
+    menu_item_ids[i] за день. Отмененные порции не считаются: их продукты
+    вернулись на склад.
+    """
+    dialect_name = session.get_bind().dialect.name
+    day = bucket_expr(SalesRollup.bucket_start, DAY_SECONDS, dialect_name).label('day')
+    rows = session.execute(
+        select(
+            day,
+            SalesRollup.menu_item_id,
+            func.sum(SalesRollup.ordered_quantity - SalesRollup.cancelled_quantity).label('quantity')
+        )
+        .where(SalesRollup.bucket_start >= start, SalesRollup.bucket_start < start + timedelta(days=days))
+        .group_by(day, SalesRollup.menu_item_id)
+    ).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.zeros((days, 0))
+
+    day_starts, menu_item_ids, quantities = zip(*rows)
+    day_index = np.array(day_starts, dtype='datetime64[D]') - np.datetime64(start.date(), 'D')
+    menu_item_ids, dish_index = np.unique(np.array(menu_item_ids, dtype=np.int64), return_inverse=True)
+    sales = sales_matrix(day_index.astype(np.int64), dish_index, np.array(quantities, dtype=float), days, len(menu_item_ids))
+    return menu_item_ids, sales
+
+
+def sales_matrix(day_index, dish_index, quantities, days, dishes):
+    """Собрать матрицу дни × блюда из троек (день, блюдо, порции)"""
+    sales = np.zeros((days, dishes))
+    np.add.at(sales, (day_index, dish_index), quantities)
+    return sales
+
+
+def recipe_matrix(session, menu_item_ids, product_ids):
+    """Матрица рецептов блюда × продукты: сколько продукта уходит на порцию"""
+    rows = session.execute(
+        select(MenuItemIngredient.menu_item_id, MenuItemIngredient.product_id, MenuItemIngredient.quantity_required)
+        .where(MenuItemIngredient.menu_item_id.in_(menu_item_ids.tolist()))
+    ).all()
+    if not rows:
+        return np.zeros((len(menu_item_ids), len(product_ids)))
+    return build_recipe_matrix(menu_item_ids, product_ids, *(np.array(column) for column in zip(*rows)))
+
+
+def build_recipe_matrix(menu_item_ids, product_ids, dish_ids, ingredient_ids, quantities):
+    """Матрица рецептов из строк menu_item_ingredients; оба списка id отсортированы"""
+    recipes = np.zeros((len(menu_item_ids), len(product_ids)))
+    # Продукт мог появиться после выборки product_ids
+    known = np.isin(ingredient_ids, product_ids)
+    np.add.at(
+        recipes,
+        (np.searchsorted(menu_item_ids, dish_ids[known]), np.searchsorted(product_ids, ingredient_ids[known])),
+        quantities[known].astype(float)
+    )
+    return recipes
+
+
+def forecast(usage, stock, min_stock, lead_time, cover_days, half_life):
+    """Прогноз по всем продуктам сразу; usage - расход дни × продукты, последний день - вчера.
+
+    Дневной расход - экспоненциально взвешенное среднее с полураспадом
+    half_life дней, страховой запас покрывает его разброс за время поставки.
+    Заказ нужен, когда остаток опустился до точки заказа, и доводит запас до
+    расхода на lead_time + cover_days дней сверх страхового и минимального.
+    """
+    days = usage.shape[0]
+    weights = 0.5 ** (np.arange(days - 1, -1, -1) / half_life)
+    weights /= weights.sum()
+    rate = weights @ usage
+    deviation = np.sqrt(weights @ (usage - rate) ** 2)
+
+    safety_stock = SERVICE_LEVEL_Z * deviation * np.sqrt(lead_time)
+    reorder_point = rate * lead_time + safety_stock + min_stock
+    target_stock = rate * (lead_time + cover_days) + safety_stock + min_stock
+    with np.errstate(divide='ignore'):
+        days_left = np.where(rate > 0, np.maximum(stock, 0) / rate, np.inf)
+
+    return {
+        'daily_usage': rate,
+        'days_left': days_left,
+        'safety_stock': safety_stock,
+        'reorder_point': reorder_point,
+        'quantity_to_order': np.where(stock <= reorder_point, np.maximum(target_stock - stock, 0), 0),
+    }
+
+
+def depletion_forecast(session, history_days=56, lead_time=3, cover_days=7, half_life=14, now=None):
+    """Когда закончится каждый продукт и сколько его заказать, по истории продаж за history_days дней"""
+    if history_days < 1:
+        raise ServiceError('history_days must be positive')
+    if lead_time < 0 or cover_days < 0:
+        raise ServiceError('lead_time and cover_days must not be negative')
+    if half_life <= 0:
+        raise ServiceError('half_life must be positive')
+
+    now = now or datetime.utcnow()
+    # Сегодняшний день еще не закончился и занизил бы расход
+    start = datetime.combine(now.date(), datetime.min.time()) - timedelta(days=history_days)
+
+    products = session.execute(
+        select(Product.id, Product.name, Product.unit, Product.current_stock, Product.min_stock, Product.cost_per_unit)
+        .order_by(Product.id)
+    ).all()
+    if not products:
+        return []
+    product_ids, names, units, stock, min_stock, cost = zip(*products)
+    product_ids = np.array(product_ids, dtype=np.int64)
+    # NULL из базы становится NaN, а для остатков и цен это ноль
+    stock, min_stock, cost = (np.nan_to_num(np.array(column, dtype=float)) for column in (stock, min_stock, cost))
+
+    menu_item_ids, sales = daily_sales(session, start, history_days)
+    usage = sales @ recipe_matrix(session, menu_item_ids, product_ids)
+    result = forecast(usage, stock, min_stock, lead_time, cover_days, half_life)
+    result['estimated_cost'] = result['quantity_to_order'] * cost
+
+    # Первыми идут продукты, которые закончатся раньше
+    order = np.argsort(result['days_left'], kind='stable')
+    days_left = result['days_left'][order].round(1)
+    columns = {name: values[order].round(3).tolist() for name, values in result.items() if name != 'days_left'}
+    days_left = np.where(np.isinf(days_left), None, days_left).tolist()
+
+    return [{
+        'product_id': product_ids[i].item(),
+        'product_name': names[i],
+        'unit': units[i],
+        'current_stock': stock[i].item(),
+        'min_stock': min_stock[i].item(),
+        'daily_usage': columns['daily_usage'][n],
+        'days_left': days_left[n],
+        'safety_stock': columns['safety_stock'][n],
+        'reorder_point': columns['reorder_point'][n],
+        'quantity_to_order': columns['quantity_to_order'][n],
+        'cost_per_unit': cost[i].item(),
+        'estimated_cost': columns['estimated_cost'][n]
+    } for n, i in enumerate(order.tolist())]
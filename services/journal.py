@@ -0,0 +1,83 @@
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DataError, IntegrityError
+
+from models import JournalReplay
+from services.errors import ServiceError
+from services.orders import place_order
+from services.supplies import ingest_supplies
+from services.transaction import savepoint
+
+# Виды записей локального журнала
+KINDS = ('order', 'supplies')
+
+
+def replay_records(session, records):
+    """Перенести в базу пачку записей журнала, принятых без связи с базой.
+
+    Каждая запись применяется в своем SAVEPOINT: конфликт (блюдо сняли с
+    продажи, не хватило продуктов) или битые данные отклоняют только ее,
+    причина сохраняется в journal_replays. Записи, уже перенесенные раньше (повтор после сбоя
+    между коммитом и сдвигом позиции в журнале), пропускаются по ключу.
+    Временные ошибки базы не отклоняют запись, а пробрасываются: пачку
+    откатывают и повторяют целиком. Возвращает {исход: число записей}.
+    """
+    keys = [record['key'] for record in records]
+    done = set(session.scalars(select(JournalReplay.key).where(JournalReplay.key.in_(keys))))
+
+    results = {}
+    for record in records:
+        if record['key'] in done:
+            outcome = 'duplicate'
+        else:
+            outcome = _replay(session, record)
+            done.add(record['key'])
+        results[outcome] = results.get(outcome, 0) + 1
+    return results
+
+
+def replay_status(session, key):
+    """Что стало с записью журнала после переноса в базу; None, если она еще не перенесена"""
+    return session.get(JournalReplay, key)
+
+
+def _replay(session, record):
+    recorded_at = datetime.fromisoformat(record['recorded_at'])
+    payload = record['payload']
+    order_id = None
+    try:
+        with savepoint(session):
+            if record['kind'] == 'order':
+                order = place_order(
+                    session, payload['table_number'], payload['items'],
+                    payload.get('payment_method', 'cash'), created_at=recorded_at
+                )
+                order_id, detail = order.id, None
+            elif record['kind'] == 'supplies':
+                report = ingest_supplies(
+                    session, enumerate(payload['supplies'], start=1), supply_date=recorded_at
+                )
+                detail = report
+            else:
+                raise ServiceError(f'Unknown journal record kind: {record["kind"]}')
+        outcome = 'applied'
+    except ServiceError as e:
+        outcome, detail = 'rejected', e.to_dict()
+    except (IntegrityError, DataError, KeyError, TypeError, ValueError) as e:
+        # Битые данные отклоняют только эту запись, иначе пачка повторялась бы бесконечно.
+        # Остальные ошибки базы (потеря соединения, взаимоблокировка, таймаут, занятый
+        # файл SQLite) уходят наверх: пачка откатывается и повторяется при следующем проходе
+        order_id = None
+        outcome, detail = 'rejected', {'error': f'{type(e).__name__}: {getattr(e, "orig", None) or e}'}
+
+    session.execute(insert(JournalReplay).values(
+        key=record['key'],
+        kind=record['kind'],
+        recorded_at=recorded_at,
+        replayed_at=datetime.utcnow(),
+        outcome=outcome,
+        order_id=order_id,
+        detail=detail
+    ))
+    return outcome
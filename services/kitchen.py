@@ -0,0 +1,211 @@
+from datetime import datetime
+
+from sqlalchemy import func, insert, literal_column, select, update
+
+from models import KitchenSettings, KitchenTask
+from services.errors import NotFound, ServiceError
+from services.scheduler import kitchen_scheduler
+from services.transaction import on_commit
+
+# Жизненный цикл задачи
+TASK_FLOW = ('queued', 'cooking', 'ready', 'delivering', 'delivered')
+
+# Задача еще не доставлена
+ACTIVE_STATUSES = TASK_FLOW[:-1]
+
+# Этап, на который задачу забирают -> статус, из которого ее забирают
+CLAIM_STAGES = {
+    'cooking': 'queued',
+    'delivering': 'ready',
+}
+
+# Этап -> статус после его завершения
+COMPLETE_STAGES = {
+    'cooking': 'ready',
+    'delivering': 'delivered',
+}
+
+tasks_table = KitchenTask.__table__
+
+TASK_COLUMNS = (
+    tasks_table.c.id,
+    tasks_table.c.order_id,
+    tasks_table.c.order_item_id,
+    tasks_table.c.menu_item_id,
+    tasks_table.c.status,
+    tasks_table.c.order_created_at,
+    tasks_table.c.cooking_time,
+    tasks_table.c.assignee,
+)
+
+
+def queue_order():
+    """Приоритет очереди: сначала старые заказы, внутри заказа - долгие блюда.
+
+    Выражения те же, что в индексе kitchen_tasks_status_queue_idx, поэтому
+    выборка идет по индексу без сортировки (0 - литерал, а не параметр,
+    иначе выражение не совпадет с индексным). Блюда без cooking_time считаются
+    самыми быстрыми, как и в планировщике.
+    """
+    return (
+        tasks_table.c.order_created_at,
+        func.coalesce(tasks_table.c.cooking_time, literal_column('0')).desc(),
+        tasks_table.c.id,
+    )
+
+
+def create_tasks(session, order, order_items, cooking_times):
+    """Поставить в очередь по задаче на каждую порцию; order_items - [(id, menu_item_id, quantity), ...]"""
+    create_order_tasks(session, [(order, order_items)], cooking_times)
+
+
+def create_order_tasks(session, orders, cooking_times):
+    """То же для нескольких заказов одним INSERT; orders - [(order, order_items), ...]"""
+    rows = [{
+        'order_id': order.id,
+        'order_item_id': order_item_id,
+        'menu_item_id': menu_item_id,
+        'status': 'queued',
+        'order_created_at': order.created_at,
+        'cooking_time': cooking_times.get(menu_item_id)
+    } for order, order_items in orders
+        for order_item_id, menu_item_id, quantity in order_items for _ in range(quantity)]
+    if not rows:
+        return
+    tasks = session.execute(
+        insert(tasks_table).returning(
+            tasks_table.c.id,
+            tasks_table.c.order_id,
+            tasks_table.c.order_created_at,
+            tasks_table.c.cooking_time
+        ),
+        rows
+    ).all()
+    on_commit(session, kitchen_scheduler.add_tasks, tasks)
+
+
+def claim_tasks(session, worker, stage='cooking', limit=1):
+    """Атомарно забрать до limit следующих задач на этап stage.
+
+    Выбор и захват делаются одним UPDATE ... WHERE id IN (SELECT ... LIMIT).
+    В PostgreSQL подзапрос берет FOR UPDATE SKIP LOCKED, поэтому параллельные
+    воркеры пропускают чужие строки, а не ждут их. SQLite и так выполняет
+    записи по одной, так что одну задачу дважды не заберут и там.
+    """
+    if stage not in CLAIM_STAGES:
+        raise ServiceError(f'Invalid stage. Must be one of: {", ".join(CLAIM_STAGES)}')
+    source = CLAIM_STAGES[stage]
+    now = datetime.utcnow()
+
+    # MATERIALIZED: иначе PostgreSQL может пересчитать подзапрос для строк
+    # UPDATE и со SKIP LOCKED захватить больше limit задач
+    candidates = (
+        select(tasks_table.c.id)
+        .where(tasks_table.c.status == source)
+        .order_by(*queue_order())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .cte('candidates')
+        .prefix_with('MATERIALIZED', dialect='postgresql')
+    )
+    rows = session.execute(
+        update(tasks_table)
+        .where(tasks_table.c.id.in_(select(candidates.c.id)), tasks_table.c.status == source)
+        .values(status=stage, assignee=worker, updated_at=now)
+        .returning(*TASK_COLUMNS)
+    ).all()
+    if stage == 'cooking' and rows:
+        on_commit(session, kitchen_scheduler.start_tasks, [row.id for row in rows], now)
+
+    # RETURNING не гарантирует порядок строк
+    return sorted(rows, key=lambda row: (row.order_created_at, -(row.cooking_time or 0), row.id))
+
+
+def complete_task(session, task_id, worker):
+    """Завершить текущий этап задачи, взятой worker; вернуть новый статус"""
+    row = session.execute(
+        select(tasks_table.c.status, tasks_table.c.assignee).where(tasks_table.c.id == task_id)
+    ).one_or_none()
+    if row is None:
+        raise NotFound(f'Task {task_id} not found')
+    if row.status not in COMPLETE_STAGES:
+        raise ServiceError(f'Task {task_id} is {row.status}, nothing to complete', status_code=409)
+    if row.assignee != worker:
+        raise ServiceError(f'Task {task_id} is assigned to another worker', status_code=409)
+
+    new_status = COMPLETE_STAGES[row.status]
+    result = session.execute(
+        update(tasks_table)
+        .where(
+            tasks_table.c.id == task_id,
+            tasks_table.c.status == row.status,
+            tasks_table.c.assignee == worker
+        )
+        .values(status=new_status, updated_at=datetime.utcnow())
+    )
+    if not result.rowcount:
+        raise ServiceError(f'Task {task_id} was changed concurrently', status_code=409)
+    if row.status == 'cooking':
+        on_commit(session, kitchen_scheduler.finish_task, task_id)
+    return new_status
+
+
+def cancel_tasks(session, order_id):
+    """Снять с очереди все недоставленные задачи заказа"""
+    session.execute(
+        update(tasks_table)
+        .where(tasks_table.c.order_id == order_id, tasks_table.c.status.notin_(('delivered', 'cancelled')))
+        .values(status='cancelled', updated_at=datetime.utcnow())
+    )
+    on_commit(session, kitchen_scheduler.remove_order, order_id)
+
+
+def list_tasks(session, status='queued', limit=50):
+    """Задачи в статусе status в порядке очереди"""
+    return session.execute(
+        select(*TASK_COLUMNS)
+        .where(tasks_table.c.status == status)
+        .order_by(*queue_order())
+        .limit(limit)
+    ).all()
+
+
+def queue_summary(session):
+    """Число задач по статусам, которые еще в работе.
+
+    Доставленные и отмененные задачи копятся без конца, их подсчет читал бы
+    всю таблицу, а с фильтром по статусу хватает индекса очереди.
+    """
+    rows = session.execute(
+        select(tasks_table.c.status, func.count())
+        .where(tasks_table.c.status.in_(ACTIVE_STATUSES))
+        .group_by(tasks_table.c.status)
+    ).all()
+    return {status: count for status, count in rows}
+
+
+def set_stations(session, stations):
+    """Задать число работающих станций для всех процессов приложения.
+
+    Строка настроек одна, конкурентные правки перезаписывают друг друга.
+    Свой планировщик обновляется после коммита, остальные процессы
+    подтягивают значение вместе с прочими изменениями состояния.
+    """
+    table = KitchenSettings.__table__
+    if session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+
+    now = datetime.utcnow()
+    stmt = upsert(table).values(id=1, stations=stations, updated_at=now)
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={'stations': stmt.excluded.stations, 'updated_at': now}
+    ))
+    on_commit(session, kitchen_scheduler.set_stations, stations)
+
+
+def load_stations(session):
+    """Число станций из настроек кухни; None, если его еще не задавали"""
+    return session.scalar(select(KitchenSettings.stations).where(KitchenSettings.id == 1))
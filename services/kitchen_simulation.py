@@ -0,0 +1,93 @@
+import heapq
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from services.scheduler import KitchenScheduler
+
+COOKING_TIMES = (5, 8, 12, 20)
+
+
+def simulate_rush(orders=200, stations=4, orders_per_minute=0.5, max_portions=4, seed=1):
+    """Прогнать синтетический наплыв заказов через планировщик без БД.
+
+    Заказы приходят пуассоновским потоком, свободные станции сразу забирают
+    следующую задачу из очереди планировщика. ETA каждого заказа запоминается
+    в момент оформления и сравнивается с фактическим временем готовности.
+    """
+    rng = random.Random(seed)
+    scheduler = KitchenScheduler(stations)
+    sequence = itertools.count()
+    task_ids = itertools.count(1)
+
+    first_arrival = moment = datetime(2000, 1, 1)
+    events = []
+    for order_id in range(1, orders + 1):
+        moment += timedelta(minutes=rng.expovariate(orders_per_minute))
+        heapq.heappush(events, (moment, next(sequence), 'order', order_id))
+
+    arrived = {}
+    predicted = {}
+    ready = {}
+    remaining = {}
+    task_orders = {}
+    waits = []
+    idle = stations
+    cpu_time = 0.0
+    scheduler_events = 0
+
+    def timed(func, *args):
+        nonlocal cpu_time, scheduler_events
+        started = time.process_time()
+        result = func(*args)
+        cpu_time += time.process_time() - started
+        scheduler_events += 1
+        return result
+
+    while events:
+        now, _, kind, payload = heapq.heappop(events)
+        if kind == 'order':
+            rows = [SimpleNamespace(
+                id=next(task_ids),
+                order_id=payload,
+                order_created_at=now,
+                cooking_time=rng.choice(COOKING_TIMES)
+            ) for _ in range(rng.randint(1, max_portions))]
+            arrived[payload] = now
+            remaining[payload] = len(rows)
+            task_orders.update((row.id, payload) for row in rows)
+            timed(scheduler.add_tasks, rows)
+            predicted[payload] = timed(scheduler.order_eta, payload, now)
+        else:
+            timed(scheduler.finish_task, payload)
+            idle += 1
+            order_id = task_orders[payload]
+            remaining[order_id] -= 1
+            if not remaining[order_id]:
+                ready[order_id] = now
+
+        while idle:
+            task_id = timed(scheduler.next_task)
+            if task_id is None:
+                break
+            duration = scheduler.tasks[task_id]['duration']
+            timed(scheduler.start_tasks, [task_id], now)
+            idle -= 1
+            waits.append(now - arrived[task_orders[task_id]])
+            heapq.heappush(events, (now + duration, next(sequence), 'finish', task_id))
+
+    minutes = timedelta(minutes=1)
+    return {
+        'orders': orders,
+        'tasks': len(task_orders),
+        'stations': stations,
+        'makespan_minutes': round((max(ready.values()) - first_arrival) / minutes, 1),
+        'mean_wait_minutes': round(sum(waits, timedelta()) / len(waits) / minutes, 2),
+        'mean_eta_error_minutes': round(
+            sum((abs(ready[o] - predicted[o]) for o in ready), timedelta()) / len(ready) / minutes, 2
+        ),
+        'scheduler_events': scheduler_events,
+        'cpu_us_per_event': round(cpu_time / scheduler_events * 1e6, 2) if scheduler_events else 0,
+    }
@@ -0,0 +1,59 @@
+import asyncio
+import hashlib
+import threading
+
+from services.availability import availability_index
+
+
+class MenuSnapshotCache:
+    """Кэш сериализованного меню по фильтру категории.
+
+    Снимок актуален, пока не изменилась версия индекса доступности: её
+    поднимают правки состава блюд, продуктов и смена доступности.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._async_lock = asyncio.Lock()
+        self._entries = {}
+
+    def get(self, category_id, build):
+        """Вернуть (body, etag); build() -> bytes вызывается только для устаревшего снимка"""
+        entry = self._entries.get(category_id)
+        if entry is not None and entry[0] == availability_index.version:
+            return entry[1], entry[2]
+
+        # Под блокировкой: сотня одновременных запросов дает одну пересборку
+        with self._lock:
+            entry = self._entries.get(category_id)
+            version = availability_index.version
+            if entry is not None and entry[0] == version:
+                return entry[1], entry[2]
+
+            return self._store(category_id, version, build())
+
+    async def aget(self, category_id, build):
+        """То же для async-кода: build() - корутина.
+
+        Блокировка asyncio, а не потоковая: пока один запрос ждет БД внутри
+        пересборки, остальные корутины того же цикла не должны блокировать поток.
+        """
+        entry = self._entries.get(category_id)
+        if entry is not None and entry[0] == availability_index.version:
+            return entry[1], entry[2]
+
+        async with self._async_lock:
+            entry = self._entries.get(category_id)
+            version = availability_index.version
+            if entry is not None and entry[0] == version:
+                return entry[1], entry[2]
+
+            return self._store(category_id, version, await build())
+
+    def _store(self, category_id, version, body):
+        etag = hashlib.sha256(body).hexdigest()
+        self._entries[category_id] = (version, body, etag)
+        return body, etag
+
+
+menu_cache = MenuSnapshotCache()
@@ -0,0 +1,257 @@
+from datetime import datetime
+
+from sqlalchemy import insert, select, update
+
+from models import MenuItem, MenuItemIngredient, Order, OrderItem, Product
+from services import kitchen, payments, rollups
+from services.availability import availability_index
+from services.errors import NotFound, ServiceError
+from services.stock import InsufficientStock, current_stock, order_demand, release_stock, reserve_stock
+from services.transaction import on_commit, savepoint
+
+
+def load_recipes(session, menu_item_ids):
+    """Составы блюд вместе с продуктами одним запросом: {menu_item_id: [row, ...]}"""
+    rows = session.execute(
+        select(
+            MenuItemIngredient.menu_item_id,
+            MenuItemIngredient.product_id,
+            MenuItemIngredient.quantity_required,
+            Product.name.label('product_name'),
+            Product.unit
+        )
+        .join(Product, Product.id == MenuItemIngredient.product_id)
+        .where(MenuItemIngredient.menu_item_id.in_(menu_item_ids))
+    ).all()
+
+    recipes = {}
+    for row in rows:
+        recipes.setdefault(row.menu_item_id, []).append(row)
+    return recipes
+
+
+def ingredient_demand(recipes, quantities):
+    """Суммарная потребность в продуктах {product_id: quantity} для {menu_item_id: portions}"""
+    demand = {}
+    for menu_item_id, portions in quantities.items():
+        for row in recipes.get(menu_item_id, []):
+            demand[row.product_id] = demand.get(row.product_id, 0) + row.quantity_required * portions
+    return demand
+
+
+def place_order(session, table_number, items, payment_method='cash', created_at=None):
+    """Оформить заказ и списать продукты за фиксированное число запросов.
+
+    Заказ с предоплатой уходит на кухню только после вебхука об оплате.
+    created_at задается для заказов, принятых в офлайне и перенесенных из журнала.
+    """
+    result, = place_orders(session, [(table_number, items, payment_method)], created_at)
+    if isinstance(result, ServiceError):
+        raise result
+    return result
+
+
+def place_orders(session, orders, created_at=None):
+    """Оформить пачку заказов [(table_number, items, payment_method), ...] в одной транзакции.
+
+    Меню, рецепты и остатки читаются одним запросом на всю пачку, позиции,
+    задачи кухни и роллапы пишутся одним INSERT/UPSERT. Заказы проверяются
+    по остаткам в порядке поступления: заказ, которому не хватило продуктов,
+    отклоняется, не затрагивая остальные. Возвращает по каждому заказу
+    Order или ServiceError.
+    """
+    results = [None] * len(orders)
+    quantities = []
+    for index, (_, items, payment_method) in enumerate(orders):
+        try:
+            payments.check_payment_method(payment_method)
+            _check_quantities(items)
+        except ServiceError as e:
+            results[index] = e
+            quantities.append({})
+            continue
+        order_quantities = {}
+        for item in items:
+            order_quantities[item['menu_item_id']] = order_quantities.get(item['menu_item_id'], 0) + item['quantity']
+        quantities.append(order_quantities)
+
+    menu_item_ids = {m_id for order_quantities in quantities for m_id in order_quantities}
+    menu_items = {
+        m.id: m for m in session.scalars(select(MenuItem).where(MenuItem.id.in_(menu_item_ids)))
+    }
+
+    # Проверяем доступность всех блюд в каждом заказе
+    for index, (_, items, _) in enumerate(orders):
+        for item in items:
+            if results[index] is not None:
+                break
+            menu_item = menu_items.get(item['menu_item_id'])
+            if menu_item is None:
+                results[index] = NotFound(f'Menu item {item["menu_item_id"]} not found')
+            elif not menu_item.is_available:
+                results[index] = ServiceError(f'Menu item {menu_item.name} is not available')
+
+    recipes = load_recipes(session, menu_item_ids)
+    demands = [ingredient_demand(recipes, order_quantities) for order_quantities in quantities]
+    product_ids = {p_id for demand in demands for p_id in demand}
+
+    while True:
+        # Решаем по остаткам без блокировки, а списываем их условным UPDATE в конце,
+        # как и при одиночном заказе: строки products заблокированы как можно меньше.
+        # Роллапы пишутся еще позже, после точки сохранения: строка текущего часа
+        # общая для всех заказов. Отмена заказа берет блокировки в том же порядке
+        stock = current_stock(session, product_ids)
+        rejected = {}
+        taken = {}
+        for index, demand in enumerate(demands):
+            if results[index] is not None:
+                continue
+            short = {p_id for p_id, q in demand.items() if stock.get(p_id, 0) < taken.get(p_id, 0) + q}
+            if short:
+                _, items, _ = orders[index]
+                rejected[index] = _not_enough_ingredients(
+                    menu_items, recipes, items, short, demand,
+                    {p_id: stock.get(p_id, 0) - taken.get(p_id, 0) for p_id in short}
+                )
+                continue
+            for p_id, q in demand.items():
+                taken[p_id] = taken.get(p_id, 0) + q
+
+        accepted = [index for index in range(len(orders)) if results[index] is None and index not in rejected]
+        try:
+            with savepoint(session):
+                placed, lines = _insert_orders(session, [orders[index] for index in accepted], menu_items, created_at)
+                new_stock = reserve_stock(session, taken)
+        except InsufficientStock:
+            # Остатки успел изменить параллельный заказ: решаем заново по свежим
+            continue
+        break
+
+    rollups.record_orders_created(session, list(zip(placed, lines)))
+
+    on_commit(session, availability_index.update_stock, new_stock)
+    results = [rejected.get(index, result) for index, result in enumerate(results)]
+    for index, order in zip(accepted, placed):
+        results[index] = order
+    return results
+
+
+def _check_quantities(items):
+    # Отрицательное количество вернуло бы продукты на склад и уменьшило сумму заказа
+    for item in items:
+        quantity = item['quantity']
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+            raise ServiceError(f'Quantity must be a positive integer, got {quantity!r}')
+
+
+def _insert_orders(session, orders, menu_items, created_at):
+    """Записать принятые заказы с позициями и задачами кухни; вернуть заказы и их позиции"""
+    if not orders:
+        return [], []
+
+    created_at = created_at or datetime.utcnow()
+    placed = [Order(
+        table_number=table_number,
+        status='pending',
+        total_amount=sum(menu_items[item['menu_item_id']].price * item['quantity'] for item in items),
+        payment_method=payment_method,
+        payment_status='awaiting' if payment_method == payments.PREPAYMENT else 'not_required',
+        created_at=created_at
+    ) for table_number, items, payment_method in orders]
+    session.add_all(placed)
+    session.flush()
+
+    # Позиции всех заказов одним executemany
+    lines = [[
+        (item['menu_item_id'], item['quantity'], menu_items[item['menu_item_id']].price)
+        for item in items
+    ] for _, items, _ in orders]
+    # Порядок строк RETURNING не важен: каждая несет свой заказ, блюдо и количество
+    rows = session.execute(
+        insert(OrderItem).returning(
+            OrderItem.id, OrderItem.order_id, OrderItem.menu_item_id, OrderItem.quantity
+        ),
+        [{
+            'order_id': order.id,
+            'menu_item_id': menu_item_id,
+            'quantity': quantity,
+            'price': price
+        } for order, order_lines in zip(placed, lines) for menu_item_id, quantity, price in order_lines]
+    ).all()
+    order_items = {}
+    for row in rows:
+        order_items.setdefault(row.order_id, []).append((row.id, row.menu_item_id, row.quantity))
+
+    kitchen.create_order_tasks(session, [
+        (order, order_items.get(order.id, [])) for order in placed if order.payment_method != payments.PREPAYMENT
+    ], {m_id: menu_item.cooking_time for m_id, menu_item in menu_items.items()})
+    return placed, lines
+
+
+def set_order_status(session, order_id, new_status):
+    """Перевести заказ в new_status и вернуть предыдущий статус.
+
+    Переход делается через compare-and-set UPDATE по старому статусу, так что
+    при параллельных изменениях каждый переход учитывается ровно один раз.
+    """
+    row = _change_status(session, order_id, new_status)
+    if row.status != new_status:
+        rollups.record_status_change(session, order_id, row.created_at, row.total_amount or 0, row.status, new_status)
+    return row.status
+
+
+def _change_status(session, order_id, new_status):
+    """Compare-and-set перехода без роллапов; вернуть строку заказа с прежним статусом"""
+    orders_table = Order.__table__
+    while True:
+        row = session.execute(
+            select(Order.status, Order.created_at, Order.total_amount).where(Order.id == order_id)
+        ).one_or_none()
+        if row is None:
+            raise NotFound(f'Order {order_id} not found')
+        if row.status == new_status:
+            return row
+        if row.status == 'cancelled':
+            raise ServiceError('Cancelled order cannot be reopened')
+
+        result = session.execute(
+            update(orders_table)
+            .where(orders_table.c.id == order_id, orders_table.c.status == row.status)
+            .values(status=new_status, updated_at=datetime.utcnow())
+        )
+        if result.rowcount:
+            return row
+
+
+def cancel_order(session, order_id):
+    """Отменить заказ, вернуть продукты на склад и деньги за предоплату.
+
+    Возвращает False, если заказ уже был отменен: продукты возвращаются
+    ровно один раз даже при параллельных отменах.
+    """
+    row = _change_status(session, order_id, 'cancelled')
+    if row.status == 'cancelled':
+        return False
+
+    payments.refund_on_cancel(session, order_id)
+    kitchen.cancel_tasks(session, order_id)
+    new_stock = release_stock(session, order_demand(session, order_id))
+    # Роллапы после остатков, как и при оформлении заказа
+    rollups.record_status_change(session, order_id, row.created_at, row.total_amount or 0, row.status, 'cancelled')
+    on_commit(session, availability_index.update_stock, new_stock)
+    return True
+
+
+def _not_enough_ingredients(menu_items, recipes, items, short, demand, stock):
+    for item in items:
+        rows = [row for row in recipes.get(item['menu_item_id'], []) if row.product_id in short]
+        if rows:
+            return ServiceError(
+                f'Not enough ingredients for {menu_items[item["menu_item_id"]].name}',
+                missing_ingredients=[{
+                    'product_name': row.product_name,
+                    'required': demand[row.product_id],
+                    'available': stock[row.product_id],
+                    'unit': row.unit
+                } for row in rows]
+            )
@@ -0,0 +1,269 @@
+import hashlib
+import hmac
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from models import MenuItem, Order, OrderItem, PaymentEvent
+from services import kitchen
+from services.errors import NotFound, ServiceError
+
+PREPAYMENT = 'card_online'
+POSTPAYMENT_METHODS = ('card_terminal', 'cash')
+PAYMENT_METHODS = (PREPAYMENT,) + POSTPAYMENT_METHODS
+
+# Предоплата еще не прошла: можно оплатить, переключиться на постоплату или отменить заказ
+UNPAID = ('awaiting', 'failed')
+# Деньги у нас или уже возвращаются
+SETTLED = ('paid', 'refund_pending', 'refund_requested', 'refunded')
+EVENT_TYPES = ('payment.succeeded', 'payment.failed', 'refund.succeeded')
+
+orders_table = Order.__table__
+events_table = PaymentEvent.__table__
+
+
+def check_payment_method(payment_method, allowed=PAYMENT_METHODS):
+    if payment_method not in allowed:
+        raise ServiceError(f'Invalid payment method. Must be one of: {", ".join(allowed)}')
+
+
+def sign(secret, body):
+    """Подпись тела вебхука: HMAC-SHA256 в hex"""
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret, body, signature):
+    return bool(signature) and hmac.compare_digest(sign(secret, body), signature)
+
+
+def record_event(session, event):
+    """Быстрый путь вебхука: сохранить событие одним INSERT ... ON CONFLICT DO NOTHING.
+
+    Возвращает True для нового события и False для повтора уже полученного
+    (эквайер доставляет вебхуки "хотя бы один раз"). Само событие применяется
+    позже, воркером.
+    """
+    row = _event_row(event)
+    if session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    inserted = session.execute(
+        insert(events_table)
+        .values(**row, received_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=['event_id'])
+        .returning(events_table.c.id)
+    ).first()
+    return inserted is not None
+
+
+def process_events(session, limit=100):
+    """Применить до limit необработанных событий в порядке получения.
+
+    События забираются через FOR UPDATE SKIP LOCKED, так что несколько
+    воркеров делят очередь, не обрабатывая одно событие дважды. Возвращает
+    {результат: число событий}.
+    """
+    events = session.execute(
+        select(events_table)
+        .where(events_table.c.processed_at.is_(None))
+        .order_by(events_table.c.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+    results = {}
+    for event in events:
+        result = apply_event(session, event)
+        session.execute(
+            update(events_table)
+            .where(events_table.c.id == event.id, events_table.c.processed_at.is_(None))
+            .values(processed_at=datetime.utcnow(), result=result)
+        )
+        results[result] = results.get(result, 0) + 1
+    return results
+
+
+def apply_event(session, event):
+    """Перевести оплату заказа по событию эквайера и вернуть, что было сделано.
+
+    Статус оплаты только растет (awaiting/failed -> paid -> refund_* -> refunded),
+    поэтому события, пришедшие не по порядку, не откатывают его назад.
+    Каждый переход - compare-and-set UPDATE по прочитанному состоянию; если
+    заказ параллельно отменили или перевели на постоплату, состояние
+    перечитывается и выбирается другой переход.
+    """
+    while True:
+        order = session.execute(
+            select(
+                Order.id, Order.status, Order.created_at,
+                Order.payment_method, Order.payment_status, Order.payment_id
+            ).where(Order.id == event.order_id)
+        ).one_or_none()
+        if order is None:
+            return 'unknown_order'
+
+        if event.event_type == 'payment.failed':
+            # Отказ по прежней попытке оплаты не касается текущей
+            if order.payment_status != 'awaiting' or order.payment_id not in (None, event.payment_id):
+                return 'stale'
+            target, result = 'failed', 'failed'
+        elif event.event_type == 'refund.succeeded':
+            if order.payment_status not in ('refund_pending', 'refund_requested') or order.payment_id != event.payment_id:
+                return 'stale'
+            target, result = 'refunded', 'refunded'
+        elif order.payment_status in SETTLED:
+            # Повтор с другим event_id или вторая оплата того же заказа
+            return 'duplicate' if order.payment_id == event.payment_id else 'extra_payment'
+        elif order.status == 'cancelled' or order.payment_method != PREPAYMENT:
+            # Оплата дошла после отмены заказа или перехода на постоплату: деньги возвращаем
+            target, result = 'refund_pending', 'refund'
+        else:
+            target, result = 'paid', 'paid'
+
+        changed = session.execute(
+            update(orders_table)
+            .where(
+                orders_table.c.id == order.id,
+                orders_table.c.status == order.status,
+                orders_table.c.payment_method == order.payment_method,
+                orders_table.c.payment_status == order.payment_status
+            )
+            .values(payment_status=target, payment_id=event.payment_id, updated_at=datetime.utcnow())
+        ).rowcount
+        if not changed:
+            continue
+
+        if target == 'paid':
+            release_to_kitchen(session, order)
+        return result
+
+
+def switch_to_postpayment(session, order_id, payment_method):
+    """Отказаться от онлайн-оплаты в пользу терминала или наличных.
+
+    Возможно, пока предоплата не прошла; заказ сразу уходит на кухню.
+    """
+    check_payment_method(payment_method, POSTPAYMENT_METHODS)
+
+    while True:
+        order = session.execute(
+            select(Order.id, Order.status, Order.created_at, Order.payment_method, Order.payment_status)
+            .where(Order.id == order_id)
+        ).one_or_none()
+        if order is None:
+            raise NotFound(f'Order {order_id} not found')
+        if order.status == 'cancelled':
+            raise ServiceError('Order is cancelled', status_code=409)
+        if order.payment_status in SETTLED:
+            raise ServiceError('Order is already paid', status_code=409)
+
+        changed = session.execute(
+            update(orders_table)
+            .where(
+                orders_table.c.id == order_id,
+                orders_table.c.status == order.status,
+                orders_table.c.payment_status == order.payment_status
+            )
+            .values(payment_method=payment_method, payment_status='not_required', updated_at=datetime.utcnow())
+        ).rowcount
+        if changed:
+            break
+
+    if order.payment_status in UNPAID:
+        release_to_kitchen(session, order)
+
+
+def attach_payment(session, order_id, payment_id):
+    """Запомнить платеж, созданный у эквайера для еще не оплаченного заказа"""
+    changed = session.execute(
+        update(orders_table)
+        .where(
+            orders_table.c.id == order_id,
+            orders_table.c.status != 'cancelled',
+            orders_table.c.payment_method == PREPAYMENT,
+            orders_table.c.payment_status.in_(UNPAID)
+        )
+        .values(payment_status='awaiting', payment_id=payment_id, updated_at=datetime.utcnow())
+    ).rowcount
+    if not changed:
+        raise ServiceError('Order does not await online payment', status_code=409)
+
+
+def payable_order(session, order_id):
+    """Заказ, для которого можно начать онлайн-оплату"""
+    order = session.execute(
+        select(Order.id, Order.status, Order.total_amount, Order.payment_method, Order.payment_status)
+        .where(Order.id == order_id)
+    ).one_or_none()
+    if order is None:
+        raise NotFound(f'Order {order_id} not found')
+    if order.status == 'cancelled' or order.payment_method != PREPAYMENT or order.payment_status not in UNPAID:
+        raise ServiceError('Order does not await online payment', status_code=409)
+    return order
+
+
+def refund_on_cancel(session, order_id):
+    """При отмене оплаченного заказа поставить возврат в очередь"""
+    session.execute(
+        update(orders_table)
+        .where(orders_table.c.id == order_id, orders_table.c.payment_status == 'paid')
+        .values(payment_status='refund_pending', updated_at=datetime.utcnow())
+    )
+
+
+def refunds_due(session, limit=50):
+    """Возвраты, которые еще не удалось запросить у эквайера"""
+    return session.execute(
+        select(Order.id, Order.payment_id, Order.total_amount)
+        .where(Order.payment_status == 'refund_pending')
+        .order_by(Order.id)
+        .limit(limit)
+    ).all()
+
+
+def mark_refund_requested(session, order_id, payment_id):
+    session.execute(
+        update(orders_table)
+        .where(
+            orders_table.c.id == order_id,
+            orders_table.c.payment_id == payment_id,
+            orders_table.c.payment_status == 'refund_pending'
+        )
+        .values(payment_status='refund_requested', updated_at=datetime.utcnow())
+    )
+
+
+def release_to_kitchen(session, order):
+    """Отправить на кухню заказ, который ждал предоплаты"""
+    order_items = session.execute(
+        select(OrderItem.id, OrderItem.menu_item_id, OrderItem.quantity, MenuItem.cooking_time)
+        .join(MenuItem, MenuItem.id == OrderItem.menu_item_id)
+        .where(OrderItem.order_id == order.id)
+    ).all()
+    kitchen.create_tasks(
+        session, order,
+        [(row.id, row.menu_item_id, row.quantity) for row in order_items],
+        {row.menu_item_id: row.cooking_time for row in order_items}
+    )
+
+
+def _event_row(event):
+    if not isinstance(event, dict):
+        raise ServiceError('Event must be a JSON object')
+    if event.get('type') not in EVENT_TYPES:
+        raise ServiceError(f'Unknown event type: {event.get("type")}')
+    try:
+        row = {
+            'event_id': str(event['id']),
+            'event_type': event['type'],
+            'payment_id': str(event['payment_id']),
+            'order_id': int(event['order_id']),
+            'amount': float(event['amount']) if event.get('amount') is not None else None
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise ServiceError(f'Invalid event: {e}')
+    if not 0 < len(row['event_id']) <= 64 or not 0 < len(row['payment_id']) <= 64:
+        raise ServiceError('Invalid event: id and payment_id must be 1-64 characters')
+    return row
@@ -0,0 +1,291 @@
+import threading
+from array import array
+
+from sqlalchemy import select
+
+from models import MenuItem, MenuItemIngredient, Product
+from services.availability import availability_index
+
+
+class RecipeCostMatrix:
+    """Разреженная матрица рецептов блюда × продукты и себестоимость блюд.
+
+    Ненулевые элементы матрицы хранятся тройками (строка-блюдо, столбец-продукт,
+    количество) в типизированных массивах, себестоимость блюд - произведение
+    матрицы на вектор цен продуктов. Строится при первом чтении себестоимости и
+    дальше обновляется инкрементально: правка рецепта или цены продукта
+    пересчитывает только затронутые блюда. NumPy нужен только для сборки и
+    чтения, так что ни в импорт, ни в старт приложения он не попадает.
+
+    Пока матрица не собрана, правки ничего не делают: их прочитает сборка. Правки,
+    пришедшие во время сборки, она копит и повторяет поверх прочитанного - все
+    они идемпотентны.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self.loaded = False
+        # Правки, пришедшие во время сборки: [(метод, аргументы), ...]; None - сборки нет
+        self._pending = None
+        self._reset()
+
+    def _reset(self):
+        # menu_item_id -> строка, product_id -> столбец
+        self.dish_rows = {}
+        self.product_columns = {}
+        self.menu_item_ids = array('q')
+        self.product_ids = array('q')
+        self.unit_costs = array('d')
+        self.dish_costs = array('d')
+        # Ячейки матрицы; у удаленных количество обнуляется, а сама ячейка переиспользуется
+        self.rows = array('q')
+        self.columns = array('q')
+        self.quantities = array('d')
+        self.free_cells = []
+        # ingredient_id -> ячейка
+        self.cells = {}
+        # столбец -> {ячейка, ...}
+        self.dependents = {}
+
+    def build(self, session):
+        """Построить матрицу с нуля (два запроса) и посчитать себестоимость одним умножением"""
+        with self._build_lock:
+            self._build(session)
+
+    def _build(self, session):
+        import numpy as np
+
+        with self._lock:
+            self._pending = []
+        try:
+            ingredients = session.execute(
+                select(
+                    MenuItemIngredient.id,
+                    MenuItemIngredient.menu_item_id,
+                    MenuItemIngredient.product_id,
+                    MenuItemIngredient.quantity_required
+                )
+            ).all()
+            # Продукты читаем вторыми: удалить продукт из рецепта нельзя, так что все продукты рецептов найдутся
+            products = session.execute(select(Product.id, Product.cost_per_unit).order_by(Product.id)).all()
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+
+        product_ids, unit_costs = (np.array(column) for column in zip(*products)) if products else ([], [])
+        ingredient_ids, menu_item_ids, ingredient_products, quantities = (
+            np.array(column) for column in zip(*ingredients)
+        ) if ingredients else ([], [], [], [])
+        menu_item_ids, rows = np.unique(np.asarray(menu_item_ids, dtype=np.int64), return_inverse=True)
+        columns = np.searchsorted(np.asarray(product_ids, dtype=np.int64), np.asarray(ingredient_products, dtype=np.int64))
+        unit_costs = np.nan_to_num(np.asarray(unit_costs, dtype=float))
+        quantities = np.nan_to_num(np.asarray(quantities, dtype=float))
+        dish_costs = np.bincount(rows, weights=quantities * unit_costs[columns], minlength=len(menu_item_ids))
+
+        with self._lock:
+            self._reset()
+            self.menu_item_ids = array('q', np.asarray(menu_item_ids, dtype=np.int64).tobytes())
+            self.product_ids = array('q', np.asarray(product_ids, dtype=np.int64).tobytes())
+            self.dish_rows = dict(zip(self.menu_item_ids, range(len(self.menu_item_ids))))
+            self.product_columns = dict(zip(self.product_ids, range(len(self.product_ids))))
+            self.unit_costs = array('d', unit_costs.tobytes())
+            self.dish_costs = array('d', dish_costs.tobytes())
+            self.rows = array('q', rows.astype(np.int64).tobytes())
+            self.columns = array('q', columns.astype(np.int64).tobytes())
+            self.quantities = array('d', quantities.tobytes())
+            self.cells = dict(zip(np.asarray(ingredient_ids).tolist(), range(len(self.rows))))
+            self.dependents = {column: set() for column in range(len(self.product_ids))}
+            for cell, column in enumerate(self.columns):
+                self.dependents[column].add(cell)
+            self.loaded = True
+            pending, self._pending = self._pending, None
+            for method, args in pending:
+                method(*args)
+
+    def ensure_loaded(self, session):
+        if not self.loaded:
+            with self._build_lock:
+                if not self.loaded:
+                    self._build(session)
+
+    def reload(self, session):
+        """Пересобрать матрицу, если ее уже читали; иначе ее соберет первое чтение"""
+        if self.loaded:
+            self.build(session)
+
+    # --- Чтение ---
+
+    def report(self, menu_item_ids, prices, stock):
+        """Себестоимость, маржа и число порций из текущих остатков для блюд menu_item_ids.
+
+        stock(product_id) -> остаток. Возвращает словарь массивов NumPy по порядку
+        menu_item_ids; у блюда без рецепта порции не ограничены (inf).
+        """
+        import numpy as np
+
+        menu_item_ids = np.asarray(menu_item_ids, dtype=np.int64)
+        prices = np.nan_to_num(np.asarray(prices, dtype=float))
+        with self._lock:
+            rows, columns, quantities, _ = self._arrays(np)
+            # Последняя строка - заглушка для блюд без рецепта: себестоимость 0, порции не ограничены
+            known_ids = np.append(np.array(self.menu_item_ids, dtype=np.int64), -1)
+            dish_costs = np.append(np.array(self.dish_costs, dtype=float), 0)
+            stocks = np.fromiter(map(stock, self.product_ids), dtype=float, count=len(self.product_ids))
+
+        # Продукт может встретиться в рецепте несколько раз: сначала суммируем
+        # количество по паре (блюдо, продукт), затем по блюду берем минимум порций
+        used = quantities > 0
+        pairs, pair_index = np.unique(rows[used] * len(stocks) + columns[used], return_inverse=True)
+        required = np.bincount(pair_index, weights=quantities[used])
+        portions = np.full(len(known_ids), np.inf)
+        np.minimum.at(portions, pairs // len(stocks), np.floor(np.maximum(stocks[pairs % len(stocks)], 0) / required))
+
+        # Строки матрицы идут в порядке появления блюд, так что ищем их через сортировку
+        order = np.argsort(known_ids)
+        position = order[np.minimum(np.searchsorted(known_ids, menu_item_ids, sorter=order), len(order) - 1)]
+        position = np.where(known_ids[position] == menu_item_ids, position, len(known_ids) - 1)
+
+        food_cost = dish_costs[position]
+        margin = prices - food_cost
+        with np.errstate(divide='ignore', invalid='ignore'):
+            margin_percent = np.where(prices > 0, margin / prices * 100, np.nan)
+        return {
+            'food_cost': food_cost,
+            'margin': margin,
+            'margin_percent': margin_percent,
+            'max_portions': portions[position],
+        }
+
+    # --- Инкрементальные обновления ---
+
+    def set_product_cost(self, product_id, cost_per_unit):
+        """Добавить продукт или поменять его цену; себестоимость меняется только у блюд с ним"""
+        with self._lock:
+            if self._deferred(self.set_product_cost, product_id, cost_per_unit):
+                return
+            column = self._column(product_id)
+            delta = (cost_per_unit or 0) - self.unit_costs[column]
+            if not delta:
+                return
+            self.unit_costs[column] = cost_per_unit or 0
+            for cell in self.dependents[column]:
+                self.dish_costs[self.rows[cell]] += self.quantities[cell] * delta
+
+    def remove_product(self, product_id):
+        with self._lock:
+            if self._deferred(self.remove_product, product_id):
+                return
+            column = self.product_columns.get(product_id)
+            if column is None:
+                return
+            for ingredient_id in [i for i, cell in self.cells.items() if self.columns[cell] == column]:
+                self.remove_ingredient(ingredient_id)
+            self.set_product_cost(product_id, 0)
+
+    def add_ingredient(self, ingredient_id, menu_item_id, product_id, quantity_required):
+        with self._lock:
+            if self._deferred(self.add_ingredient, ingredient_id, menu_item_id, product_id, quantity_required):
+                return
+            self._add_cell(ingredient_id, self._row(menu_item_id), self._column(product_id), quantity_required or 0)
+
+    def remove_ingredient(self, ingredient_id):
+        with self._lock:
+            if self._deferred(self.remove_ingredient, ingredient_id):
+                return
+            cell = self.cells.pop(ingredient_id, None)
+            if cell is None:
+                return
+            row, column = self.rows[cell], self.columns[cell]
+            self.dish_costs[row] -= self.quantities[cell] * self.unit_costs[column]
+            self.quantities[cell] = 0
+            self.dependents[column].discard(cell)
+            self.free_cells.append(cell)
+
+    def _deferred(self, method, *args):
+        """Отложить правку, если матрица еще не собрана; вызывается под блокировкой"""
+        if self.loaded:
+            return False
+        if self._pending is not None:
+            self._pending.append((method, args))
+        return True
+
+    def _row(self, menu_item_id):
+        row = self.dish_rows.get(menu_item_id)
+        if row is None:
+            row = self.dish_rows[menu_item_id] = len(self.menu_item_ids)
+            self.menu_item_ids.append(menu_item_id)
+            self.dish_costs.append(0)
+        return row
+
+    def _column(self, product_id):
+        column = self.product_columns.get(product_id)
+        if column is None:
+            column = self.product_columns[product_id] = len(self.product_ids)
+            self.product_ids.append(product_id)
+            self.unit_costs.append(0)
+            self.dependents[column] = set()
+        return column
+
+    def _add_cell(self, ingredient_id, row, column, quantity):
+        if ingredient_id in self.cells:
+            self.remove_ingredient(ingredient_id)
+        if self.free_cells:
+            cell = self.free_cells.pop()
+            self.rows[cell], self.columns[cell], self.quantities[cell] = row, column, quantity
+        else:
+            cell = len(self.rows)
+            self.rows.append(row)
+            self.columns.append(column)
+            self.quantities.append(quantity)
+        self.cells[ingredient_id] = cell
+        self.dependents[column].add(cell)
+        self.dish_costs[row] += quantity * self.unit_costs[column]
+
+    def _arrays(self, np):
+        """Копии буферов матрицы в массивах NumPy.
+
+        Копия, а не frombuffer: пока на массив array смотрит буфер NumPy,
+        array нельзя дополнить, и параллельная правка рецепта упала бы.
+        """
+        return (
+            np.array(self.rows, dtype=np.int64),
+            np.array(self.columns, dtype=np.int64),
+            np.array(self.quantities, dtype=float),
+            np.array(self.unit_costs, dtype=float),
+        )
+
+
+
+def menu_costs(session):
+    """Себестоимость, маржа и доступные порции по всему меню одним запросом в БД"""
+    import numpy as np
+
+    recipe_costs.ensure_loaded(session)
+    availability_index.ensure_loaded(session)
+    items = session.execute(select(MenuItem.id, MenuItem.name, MenuItem.price).order_by(MenuItem.id)).all()
+    if not items:
+        return []
+
+    menu_item_ids, names, prices = zip(*items)
+    report = recipe_costs.report(menu_item_ids, prices, availability_index.stock)
+    food_cost = report['food_cost'].round(2).tolist()
+    margin = report['margin'].round(2).tolist()
+    margin_percent = report['margin_percent'].round(1)
+    margin_percent = np.where(np.isnan(margin_percent), None, margin_percent).tolist()
+    max_portions = report['max_portions']
+    max_portions = np.where(np.isinf(max_portions), None, max_portions).tolist()
+
+    return [{
+        'menu_item_id': menu_item_id,
+        'name': names[n],
+        'price': prices[n],
+        'food_cost': food_cost[n],
+        'margin': margin[n],
+        'margin_percent': margin_percent[n],
+        'max_portions': None if max_portions[n] is None else int(max_portions[n])
+    } for n, menu_item_id in enumerate(menu_item_ids)]
+
+
+recipe_costs = RecipeCostMatrix()
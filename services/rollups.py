@@ -0,0 +1,262 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, func, select, text
+
+from models import MenuItem, Order, OrderItem, OrderRollup, SalesRollup
+from services.stats import as_datetime, bucket_expr
+
+ROLLUP_SECONDS = 3600
+
+SALES_COUNTERS = (
+    'ordered_quantity', 'ordered_revenue',
+    'completed_quantity', 'completed_revenue',
+    'cancelled_quantity', 'cancelled_revenue',
+)
+
+
+def hour_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def covers(start, end, bucket_seconds, now=None):
+    """Можно ли посчитать статистику за окно по почасовым роллапам"""
+    now = now or datetime.utcnow()
+    return (
+        bucket_seconds % ROLLUP_SECONDS == 0
+        and start == hour_start(start)
+        and (end == hour_start(end) or end >= now)
+    )
+
+
+# --- Инкрементальное обновление (в той же транзакции, что и заказ) ---
+
+def record_orders_created(session, orders):
+    """Учесть новые заказы [(order, lines), ...] двумя UPSERT на всю пачку; lines - [(menu_item_id, quantity, price), ...]"""
+    totals = {}
+    sales = {}
+    for order, lines in orders:
+        bucket = hour_start(order.created_at)
+        row = totals.setdefault((bucket, order.status), {
+            'bucket_start': bucket,
+            'status': order.status,
+            'order_count': 0,
+            'revenue': 0
+        })
+        row['order_count'] += 1
+        row['revenue'] += order.total_amount
+
+        for menu_item_id, quantity, price in lines:
+            row = sales.setdefault((bucket, menu_item_id), _sales_row(bucket, menu_item_id))
+            row['ordered_quantity'] += quantity
+            row['ordered_revenue'] += quantity * price
+
+    # Строки в одном порядке во всех транзакциях, чтобы параллельные пачки не ловили взаимоблокировку.
+    # Счетчик заказов за час - одна строка на всех, ее пишем последней: блокировка держится до коммита
+    _upsert(session, SalesRollup.__table__, ('bucket_start', 'menu_item_id'), [sales[key] for key in sorted(sales)])
+    _upsert(session, OrderRollup.__table__, ('bucket_start', 'status'), [totals[key] for key in sorted(totals)])
+
+
+def record_status_change(session, order_id, created_at, total_amount, old_status, new_status):
+    """Перенести заказ между статусами в счетчиках (строки в том же порядке, что и при создании заказов)"""
+    bucket = hour_start(created_at)
+
+    sign_completed = (new_status == 'completed') - (old_status == 'completed')
+    sign_cancelled = (new_status == 'cancelled') - (old_status == 'cancelled')
+    if sign_completed or sign_cancelled:
+        lines = session.execute(
+            select(
+                OrderItem.menu_item_id,
+                func.sum(OrderItem.quantity).label('quantity'),
+                func.sum(OrderItem.quantity * OrderItem.price).label('revenue')
+            )
+            .where(OrderItem.order_id == order_id)
+            .group_by(OrderItem.menu_item_id)
+            .order_by(OrderItem.menu_item_id)
+        ).all()
+
+        rows = []
+        for line in lines:
+            row = _sales_row(bucket, line.menu_item_id)
+            row['completed_quantity'] = sign_completed * line.quantity
+            row['completed_revenue'] = sign_completed * line.revenue
+            row['cancelled_quantity'] = sign_cancelled * line.quantity
+            row['cancelled_revenue'] = sign_cancelled * line.revenue
+            rows.append(row)
+        _upsert(session, SalesRollup.__table__, ('bucket_start', 'menu_item_id'), rows)
+
+    _upsert(session, OrderRollup.__table__, ('bucket_start', 'status'), sorted([
+        {'bucket_start': bucket, 'status': old_status, 'order_count': -1, 'revenue': -total_amount},
+        {'bucket_start': bucket, 'status': new_status, 'order_count': 1, 'revenue': total_amount},
+    ], key=lambda row: row['status']))
+
+
+# --- Пересчет с нуля ---
+
+def rebuild(session):
+    """Пересчитать роллапы по всей истории заказов.
+
+    Можно запускать на работающем приложении: заказы и смены статусов пишут
+    роллапы последним шагом перед коммитом, и пока идет пересчет, они ждут
+    блокировку таблиц роллапов. Незакоммиченные изменения пересчет не видит,
+    а свои приращения они добавят уже после него, так что ничего не теряется
+    и не считается дважды. В SQLite то же дает единственный писатель.
+    """
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == 'postgresql':
+        # Чтение остается открытым, пишущие транзакции ждут до коммита пересчета.
+        # Порядок тот же, в котором их берут заказы, иначе взаимоблокировка
+        session.execute(text(
+            f'LOCK TABLE {SalesRollup.__tablename__}, {OrderRollup.__tablename__} IN EXCLUSIVE MODE'
+        ))
+    session.execute(delete(OrderRollup))
+    session.execute(delete(SalesRollup))
+
+    bucket = bucket_expr(Order.created_at, ROLLUP_SECONDS, dialect_name).label('bucket')
+    order_rows = session.execute(
+        select(
+            bucket,
+            Order.status,
+            func.count().label('order_count'),
+            func.coalesce(func.sum(Order.total_amount), 0).label('revenue')
+        ).group_by(bucket, Order.status)
+    ).all()
+    if order_rows:
+        session.execute(OrderRollup.__table__.insert(), [{
+            'bucket_start': as_datetime(row.bucket),
+            'status': row.status,
+            'order_count': row.order_count,
+            'revenue': row.revenue
+        } for row in order_rows])
+
+    revenue = OrderItem.quantity * OrderItem.price
+    is_completed = Order.status == 'completed'
+    is_cancelled = Order.status == 'cancelled'
+    sales_rows = session.execute(
+        select(
+            bucket,
+            OrderItem.menu_item_id,
+            func.sum(OrderItem.quantity).label('ordered_quantity'),
+            func.sum(revenue).label('ordered_revenue'),
+            func.sum(case((is_completed, OrderItem.quantity), else_=0)).label('completed_quantity'),
+            func.sum(case((is_completed, revenue), else_=0)).label('completed_revenue'),
+            func.sum(case((is_cancelled, OrderItem.quantity), else_=0)).label('cancelled_quantity'),
+            func.sum(case((is_cancelled, revenue), else_=0)).label('cancelled_revenue')
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .group_by(bucket, OrderItem.menu_item_id)
+    ).all()
+    if sales_rows:
+        session.execute(SalesRollup.__table__.insert(), [{
+            'bucket_start': as_datetime(row.bucket),
+            'menu_item_id': row.menu_item_id,
+            **{name: getattr(row, name) for name in SALES_COUNTERS}
+        } for row in sales_rows])
+
+    return len(order_rows), len(sales_rows)
+
+
+# --- Чтение ---
+
+def order_stats(session, start, end, bucket_seconds, top=5):
+    """То же, что services.stats.order_stats, но по роллапам: O(число интервалов)"""
+    in_window = (OrderRollup.bucket_start >= start, OrderRollup.bucket_start < _ceil_hour(end))
+    is_completed = OrderRollup.status == 'completed'
+
+    by_status = session.execute(
+        select(
+            OrderRollup.status,
+            func.sum(OrderRollup.order_count).label('orders'),
+            func.sum(OrderRollup.revenue).label('revenue')
+        )
+        .where(*in_window)
+        .group_by(OrderRollup.status)
+    ).all()
+
+    hourly = session.execute(
+        select(
+            OrderRollup.bucket_start,
+            func.sum(OrderRollup.order_count).label('total_orders'),
+            func.sum(case((is_completed, OrderRollup.order_count), else_=0)).label('completed_orders'),
+            func.sum(case((is_completed, OrderRollup.revenue), else_=0)).label('revenue')
+        )
+        .where(*in_window)
+        .group_by(OrderRollup.bucket_start)
+        .order_by(OrderRollup.bucket_start)
+    ).all()
+
+    popular_items = session.execute(
+        select(
+            SalesRollup.menu_item_id,
+            MenuItem.name,
+            func.sum(SalesRollup.completed_quantity).label('total_quantity')
+        )
+        .join(MenuItem, MenuItem.id == SalesRollup.menu_item_id)
+        .where(SalesRollup.bucket_start >= start, SalesRollup.bucket_start < _ceil_hour(end))
+        .group_by(SalesRollup.menu_item_id, MenuItem.name)
+        .having(func.sum(SalesRollup.completed_quantity) > 0)
+        .order_by(func.sum(SalesRollup.completed_quantity).desc())
+        .limit(top)
+    ).all()
+
+    # Нулевые строки остаются после переходов между статусами
+    status_counts = {row.status: row.orders for row in by_status if row.orders}
+    completed = next((row for row in by_status if row.status == 'completed'), None)
+    completed_orders = completed.orders if completed else 0
+    total_revenue = (completed.revenue or 0) if completed else 0
+
+    series = {}
+    for row in hourly:
+        if not row.total_orders:
+            continue
+        # Часовые роллапы сворачиваются в интервалы кратной длины
+        epoch = as_datetime(row.bucket_start) - datetime(1970, 1, 1)
+        key = datetime(1970, 1, 1) + timedelta(
+            seconds=epoch.total_seconds() // bucket_seconds * bucket_seconds
+        )
+        point = series.setdefault(key, {'total_orders': 0, 'completed_orders': 0, 'revenue': 0})
+        point['total_orders'] += row.total_orders
+        point['completed_orders'] += row.completed_orders
+        point['revenue'] += row.revenue or 0
+
+    return {
+        'summary': {
+            'total_orders': sum(status_counts.values()),
+            'completed_orders': completed_orders,
+            'total_revenue': total_revenue,
+            'average_order_value': total_revenue / completed_orders if completed_orders else 0
+        },
+        'by_status': status_counts,
+        'series': [{'bucket_start': key.isoformat(), **point} for key, point in sorted(series.items())],
+        'popular_items': [{
+            'menu_item_id': row.menu_item_id,
+            'name': row.name,
+            'total_quantity': row.total_quantity
+        } for row in popular_items]
+    }
+
+
+def _ceil_hour(moment):
+    start = hour_start(moment)
+    return start if start == moment else start + timedelta(seconds=ROLLUP_SECONDS)
+
+
+def _sales_row(bucket, menu_item_id):
+    return {'bucket_start': bucket, 'menu_item_id': menu_item_id, **{name: 0 for name in SALES_COUNTERS}}
+
+
+def _upsert(session, table, keys, rows):
+    """INSERT ... ON CONFLICT DO UPDATE, прибавляющий счетчики к существующей строке"""
+    if not rows:
+        return
+    if session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(table)
+    counters = [name for name in rows[0] if name not in keys]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: table.c[name] + stmt.excluded[name] for name in counters}
+    )
+    session.execute(stmt, rows)
@@ -0,0 +1,231 @@
+import bisect
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import KitchenTask
+
+DEFAULT_STATIONS = 4
+# Для блюд без cooking_time, минуты
+DEFAULT_COOKING_TIME = 10
+# Через сколько позиций очереди запоминается занятость станций
+CHECKPOINT_INTERVAL = 64
+
+
+class KitchenScheduler:
+    """Планировщик кухни и прогноз готовности заказов.
+
+    Очередь задач держится в памяти в том же порядке, в каком их забирают
+    повара (services.kitchen.queue_order), и раскладывается по станциям жадно:
+    следующая задача уходит на станцию, которая освободится раньше всех.
+    Позиция задачи ищется бинарным поиском, а вставка и удаление в списке
+    очереди - сдвиг памяти за O(n), на очередях кухни это быстрее дерева.
+    Расписание досчитывается лениво и только до позиции запрошенного заказа.
+    Новый заказ или отмена на позиции p отбрасывают только хвост расписания
+    от ближайшего снимка станций перед p (снимки через CHECKPOINT_INTERVAL
+    позиций). Старт и финиш готовящихся задач меняют занятость станций с
+    самого начала, после них расписание считается заново.
+    """
+
+    def __init__(self, stations=DEFAULT_STATIONS, default_cooking_time=DEFAULT_COOKING_TIME):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.stations = stations
+        self.default_cooking_time = default_cooking_time
+        # Ключи очереди в порядке приоритета: (order_created_at, -cooking_time, task_id)
+        self.queue = []
+        # task_id -> {'order_id', 'key', 'duration'}
+        self.tasks = {}
+        # task_id -> ожидаемое окончание готовящейся задачи
+        self.running = {}
+        # order_id -> {task_id, ...} еще не приготовленных задач
+        self.order_tasks = {}
+        # Посчитанный префикс расписания: окончание задачи queue[i]
+        self._finish = []
+        # Куча времен освобождения станций после посчитанного префикса
+        self._free = None
+        # Снимки кучи перед позициями 0, CHECKPOINT_INTERVAL, 2 * CHECKPOINT_INTERVAL, ...
+        self._checkpoints = []
+        # Префикс верен, пока первая станция не освободилась
+        self._valid_until = None
+
+    def build(self, session):
+        """Загрузить очередь и готовящиеся задачи из БД"""
+        rows = session.execute(
+            select(
+                KitchenTask.id,
+                KitchenTask.order_id,
+                KitchenTask.status,
+                KitchenTask.order_created_at,
+                KitchenTask.cooking_time,
+                KitchenTask.updated_at
+            ).where(KitchenTask.status.in_(('queued', 'cooking')))
+        ).all()
+
+        with self._lock:
+            self.queue = []
+            self.tasks = {}
+            self.running = {}
+            self.order_tasks = {}
+            self.add_tasks(row for row in rows if row.status == 'queued')
+            for row in rows:
+                if row.status == 'cooking':
+                    self._track(row)
+                    self.running[row.id] = row.updated_at + self.tasks[row.id]['duration']
+            self._reset()
+            self.loaded = True
+
+    def ensure_loaded(self, session):
+        if not self.loaded:
+            self.build(session)
+
+    # --- События ---
+
+    def add_tasks(self, rows):
+        """Поставить в очередь задачи (id, order_id, order_created_at, cooking_time)"""
+        with self._lock:
+            for row in rows:
+                task = self._track(row)
+                position = bisect.bisect(self.queue, task['key'])
+                self.queue.insert(position, task['key'])
+                self._invalidate(position)
+
+    def start_tasks(self, task_ids, now=None):
+        """Задачи взяли в работу"""
+        now = now or datetime.utcnow()
+        with self._lock:
+            for task_id in task_ids:
+                task = self.tasks.get(task_id)
+                if task is None or task_id in self.running:
+                    continue
+                self._dequeue(task)
+                self.running[task_id] = now + task['duration']
+            self._reset()
+
+    def finish_task(self, task_id):
+        """Задача приготовлена"""
+        with self._lock:
+            task = self.tasks.pop(task_id, None)
+            if task is None:
+                return
+            if self.running.pop(task_id, None) is None:
+                self._dequeue(task)
+            else:
+                self._reset()
+            order_tasks = self.order_tasks[task['order_id']]
+            order_tasks.discard(task_id)
+            if not order_tasks:
+                del self.order_tasks[task['order_id']]
+
+    def remove_order(self, order_id):
+        """Заказ отменен: убрать все его задачи"""
+        with self._lock:
+            for task_id in list(self.order_tasks.get(order_id, ())):
+                self.finish_task(task_id)
+
+    def set_stations(self, stations):
+        with self._lock:
+            self.stations = stations
+            self._reset()
+
+    # --- Прогноз ---
+
+    def next_task(self):
+        """Задача, которую повар заберет следующей"""
+        with self._lock:
+            return self.queue[0][2] if self.queue else None
+
+    def order_eta(self, order_id, now=None):
+        """Ожидаемое время готовности заказа или None, если готовить нечего"""
+        now = now or datetime.utcnow()
+        with self._lock:
+            task_ids = self.order_tasks.get(order_id)
+            if not task_ids:
+                return None
+
+            eta = None
+            last_position = -1
+            for task_id in task_ids:
+                if task_id in self.running:
+                    finish = max(now, self.running[task_id])
+                    eta = finish if eta is None else max(eta, finish)
+                else:
+                    last_position = max(last_position, self._position(self.tasks[task_id]))
+            if last_position < 0:
+                return eta
+
+            self._plan(last_position, now)
+            for task_id in task_ids:
+                if task_id not in self.running:
+                    finish = self._finish[self._position(self.tasks[task_id])]
+                    eta = finish if eta is None else max(eta, finish)
+            return eta
+
+    def backlog(self):
+        """Суммарное время готовки задач в очереди"""
+        with self._lock:
+            return sum((self.tasks[key[2]]['duration'] for key in self.queue), timedelta())
+
+    # --- Внутреннее ---
+
+    def _track(self, row):
+        duration = timedelta(minutes=row.cooking_time or self.default_cooking_time)
+        task = {
+            'order_id': row.order_id,
+            # Тот же порядок, что и у очереди в БД: cooking_time по убыванию
+            'key': (row.order_created_at, -(row.cooking_time or 0), row.id),
+            'duration': duration
+        }
+        self.tasks[row.id] = task
+        self.order_tasks.setdefault(row.order_id, set()).add(row.id)
+        return task
+
+    def _position(self, task):
+        return bisect.bisect_left(self.queue, task['key'])
+
+    def _dequeue(self, task):
+        position = self._position(task)
+        del self.queue[position]
+        self._invalidate(position)
+
+    def _invalidate(self, position):
+        # Очередь изменилась на позиции position: расписание до нее остается верным
+        if position >= len(self._finish):
+            return
+        checkpoint = position // CHECKPOINT_INTERVAL
+        del self._checkpoints[checkpoint + 1:]
+        del self._finish[checkpoint * CHECKPOINT_INTERVAL:]
+        self._free = list(self._checkpoints[checkpoint])
+
+    def _reset(self):
+        self._finish = []
+        self._free = None
+        self._checkpoints = []
+
+    def _plan(self, position, now):
+        """Досчитать расписание очереди до позиции position включительно"""
+        if self._free is None or now > self._valid_until:
+            self._free = sorted(max(now, finish) for finish in self.running.values())
+            self._free += [now] * (max(self.stations, 1) - len(self._free))
+            heapq.heapify(self._free)
+            self._valid_until = self._free[0]
+            self._finish = []
+            self._checkpoints = []
+
+        free, tasks, planned = self._free, self.tasks, self._finish
+        while len(planned) <= position:
+            start = len(planned)
+            if start == len(self._checkpoints) * CHECKPOINT_INTERVAL:
+                self._checkpoints.append(list(free))
+            # До следующего снимка считаем без проверок
+            end = min(position + 1, (start // CHECKPOINT_INTERVAL + 1) * CHECKPOINT_INTERVAL)
+            for key in self.queue[start:end]:
+                # Задача занимает станцию, которая освободится раньше всех
+                finish = free[0] + tasks[key[2]]['duration']
+                heapq.heapreplace(free, finish)
+                planned.append(finish)
+
+
+kitchen_scheduler = KitchenScheduler()
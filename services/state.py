@@ -0,0 +1,115 @@
+from sqlalchemy import select
+
+from models import KitchenTask, MenuItemIngredient, Product
+from services.availability import availability_index
+from services.recipe_costs import recipe_costs
+from services.kitchen import load_stations
+from services.scheduler import kitchen_scheduler
+
+# Таблицы, изменения которых видны индексам в памяти
+TRACKED_TABLES = ('products', 'menu_item_ingredients', 'kitchen_tasks', 'kitchen_settings')
+
+
+def load_state(session):
+    """Построить индексы в памяти с нуля; матрицу себестоимости - только если ее уже читали"""
+    availability_index.build(session)
+    recipe_costs.reload(session)
+    _apply_stations(session)
+    kitchen_scheduler.build(session)
+
+
+def apply_changes(session, changes):
+    """Подтянуть в индексы строки, которые изменил другой процесс.
+
+    changes - {таблица: {id, ...}}. Строки перечитываются по id, так что
+    порядок и повторы уведомлений не важны: индекс приходит к тому, что
+    сейчас лежит в базе. Не больше одного запроса на таблицу.
+    """
+    product_ids = changes.get('products')
+    if product_ids:
+        _apply_products(session, product_ids)
+    ingredient_ids = changes.get('menu_item_ingredients')
+    if ingredient_ids:
+        _apply_ingredients(session, ingredient_ids)
+    task_ids = changes.get('kitchen_tasks')
+    if task_ids:
+        _apply_tasks(session, task_ids)
+    if changes.get('kitchen_settings'):
+        _apply_stations(session)
+
+
+def _apply_products(session, product_ids):
+    rows = {row.id: row for row in session.execute(
+        select(Product.id, Product.name, Product.unit, Product.current_stock, Product.cost_per_unit)
+        .where(Product.id.in_(product_ids))
+    )}
+    stocks = {}
+    for product_id in product_ids:
+        row = rows.get(product_id)
+        if row is None:
+            availability_index.remove_product(product_id)
+            recipe_costs.remove_product(product_id)
+            continue
+        known = availability_index.products.get(product_id)
+        # Смена одного остатка не меняет описание блюд в меню, версию индекса не трогаем
+        if known is not None and (known['name'], known['unit']) == (row.name, row.unit):
+            stocks[product_id] = row.current_stock
+        else:
+            availability_index.set_product(row.id, row.name, row.unit, row.current_stock)
+        recipe_costs.set_product_cost(row.id, row.cost_per_unit)
+    availability_index.update_stock(stocks)
+
+
+def _apply_ingredients(session, ingredient_ids):
+    rows = {row.id: row for row in session.execute(
+        select(
+            MenuItemIngredient.id,
+            MenuItemIngredient.menu_item_id,
+            MenuItemIngredient.product_id,
+            MenuItemIngredient.quantity_required
+        ).where(MenuItemIngredient.id.in_(ingredient_ids))
+    )}
+    for ingredient_id in ingredient_ids:
+        row = rows.get(ingredient_id)
+        known = availability_index.ingredients.get(ingredient_id)
+        if row is None:
+            availability_index.remove_ingredient(ingredient_id)
+            recipe_costs.remove_ingredient(ingredient_id)
+            continue
+        if known == row._asdict():
+            continue
+        if known is not None:
+            availability_index.remove_ingredient(ingredient_id)
+        availability_index.add_ingredient(row.id, row.menu_item_id, row.product_id, row.quantity_required)
+        recipe_costs.add_ingredient(row.id, row.menu_item_id, row.product_id, row.quantity_required)
+
+
+def _apply_stations(session):
+    stations = load_stations(session)
+    # Без строки настроек остается значение по умолчанию из настроек приложения;
+    # смена числа станций пересчитывает расписание, без нее его не трогаем
+    if stations is not None and stations != kitchen_scheduler.stations:
+        kitchen_scheduler.set_stations(stations)
+
+
+def _apply_tasks(session, task_ids):
+    rows = {row.id: row for row in session.execute(
+        select(
+            KitchenTask.id,
+            KitchenTask.order_id,
+            KitchenTask.status,
+            KitchenTask.order_created_at,
+            KitchenTask.cooking_time,
+            KitchenTask.updated_at
+        ).where(KitchenTask.id.in_(task_ids))
+    )}
+    for task_id in sorted(task_ids):
+        row = rows.get(task_id)
+        status = row.status if row is not None else None
+        if status in ('queued', 'cooking') and task_id not in kitchen_scheduler.tasks:
+            kitchen_scheduler.add_tasks([row])
+        if status == 'cooking' and task_id not in kitchen_scheduler.running:
+            kitchen_scheduler.start_tasks([task_id], row.updated_at)
+        elif status not in ('queued', 'cooking'):
+            # Приготовлена, отменена или удалена
+            kitchen_scheduler.finish_task(task_id)
@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Integer, case, cast, func, literal, literal_column, select
+
+from models import MenuItem, Order, OrderItem
+
+# Допустимые шаги временного ряда, в секундах
+BUCKETS = {
+    'hour': 3600,
+    '15min': 900,
+}
+
+
+def naive_utc(moment):
+    """Время с часовым поясом - в наивное UTC, в котором оно хранится в базе"""
+    if moment is not None and moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def bucket_expr(column, seconds, dialect_name):
+    """Начало интервала длиной seconds, в который попадает column"""
+    if dialect_name == 'postgresql':
+        return func.date_bin(
+            literal_column(f"interval '{int(seconds)} seconds'"),
+            column,
+            literal(datetime(2000, 1, 1))
+        )
+    return func.datetime(
+        cast(func.strftime('%s', column), Integer) // seconds * seconds,
+        'unixepoch'
+    )
+
+
+def order_stats(session, start, end, bucket_seconds, top=5):
+    """Статистика по заказам за окно [start, end) несколькими GROUP BY без загрузки ORM-объектов"""
+    dialect_name = session.get_bind().dialect.name
+    in_window = (Order.created_at >= start, Order.created_at < end)
+    is_completed = Order.status == 'completed'
+
+    by_status = session.execute(
+        select(Order.status, func.count().label('orders'), func.sum(Order.total_amount).label('revenue'))
+        .where(*in_window)
+        .group_by(Order.status)
+    ).all()
+
+    bucket = bucket_expr(Order.created_at, bucket_seconds, dialect_name).label('bucket')
+    series = session.execute(
+        select(
+            bucket,
+            func.count().label('total_orders'),
+            func.sum(case((is_completed, 1), else_=0)).label('completed_orders'),
+            func.sum(case((is_completed, Order.total_amount), else_=0)).label('revenue')
+        )
+        .where(*in_window)
+        .group_by(bucket)
+        .order_by(bucket)
+    ).all()
+
+    popular_items = session.execute(
+        select(
+            OrderItem.menu_item_id,
+            MenuItem.name,
+            func.sum(OrderItem.quantity).label('total_quantity')
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .join(MenuItem, MenuItem.id == OrderItem.menu_item_id)
+        .where(is_completed, *in_window)
+        .group_by(OrderItem.menu_item_id, MenuItem.name)
+        .order_by(func.sum(OrderItem.quantity).desc())
+        .limit(top)
+    ).all()
+
+    status_counts = {row.status: row.orders for row in by_status}
+    completed = next((row for row in by_status if row.status == 'completed'), None)
+    completed_orders = completed.orders if completed else 0
+    total_revenue = (completed.revenue or 0) if completed else 0
+
+    return {
+        'summary': {
+            'total_orders': sum(status_counts.values()),
+            'completed_orders': completed_orders,
+            'total_revenue': total_revenue,
+            'average_order_value': total_revenue / completed_orders if completed_orders else 0
+        },
+        'by_status': status_counts,
+        'series': [{
+            'bucket_start': as_datetime(row.bucket).isoformat(),
+            'total_orders': row.total_orders,
+            'completed_orders': row.completed_orders,
+            'revenue': row.revenue or 0
+        } for row in series],
+        'popular_items': [{
+            'menu_item_id': row.menu_item_id,
+            'name': row.name,
+            'total_quantity': row.total_quantity
+        } for row in popular_items]
+    }
+
+
+def as_datetime(value):
+    # SQLite отдает datetime() строкой
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
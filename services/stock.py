@@ -0,0 +1,114 @@
+from datetime import datetime
+
+from sqlalchemy import case, func, select, update
+
+from models import MenuItemIngredient, OrderItem, Product
+from services.errors import ServiceError
+
+products_table = Product.__table__
+
+
+class InsufficientStock(ServiceError):
+    """Одного или нескольких продуктов не хватило при списании"""
+
+    def __init__(self, product_ids):
+        super().__init__('Not enough stock', product_ids=sorted(product_ids))
+        self.product_ids = set(product_ids)
+
+
+def _in_lock_order(product_ids):
+    """Условие на id, при котором UPDATE блокирует строки products по возрастанию id.
+
+    Многострочный UPDATE ... WHERE id IN (...) в PostgreSQL блокирует строки в
+    порядке чтения таблицы, а он меняется с каждой новой версией строки, так что
+    два списания одних и тех же продуктов могут заблокировать друг друга.
+    Подзапрос с ORDER BY ... FOR NO KEY UPDATE берет блокировки в одном порядке
+    для всех (MATERIALIZED - чтобы PostgreSQL не встроил его в UPDATE). Это та же
+    блокировка, что берет сам UPDATE: FOR UPDATE конфликтовал бы с FOR KEY SHARE,
+    которую держит транзакция, вставившая строку со ссылкой на продукт (поставку),
+    и две такие транзакции блокировали бы друг друга.
+    """
+    locked = (
+        select(products_table.c.id)
+        .where(products_table.c.id.in_(sorted(product_ids)))
+        .order_by(products_table.c.id)
+        .with_for_update(key_share=True)
+        .cte('locked_products')
+        .prefix_with('MATERIALIZED', dialect='postgresql')
+    )
+    return products_table.c.id.in_(select(locked.c.id))
+
+
+def apply_stock_delta(session, deltas):
+    """Изменить остатки {product_id: delta} одним UPDATE, вернуть новые остатки"""
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return {}
+
+    stmt = update(products_table)\
+        .where(_in_lock_order(deltas))\
+        .values(
+            current_stock=products_table.c.current_stock + case(deltas, value=products_table.c.id),
+            updated_at=datetime.utcnow()
+        )\
+        .returning(products_table.c.id, products_table.c.current_stock)
+
+    return {row.id: row.current_stock for row in session.execute(stmt)}
+
+
+def reserve_stock(session, demand):
+    """Атомарно списать {product_id: quantity} одним условным UPDATE.
+
+    Строка обновляется, только если остатка хватает (current_stock >= quantity),
+    поэтому параллельные заказы не могут увести остаток в минус. Если хотя бы
+    один продукт не прошел проверку, бросается InsufficientStock, и вызывающий
+    код обязан откатить транзакцию целиком.
+    """
+    demand = {product_id: quantity for product_id, quantity in demand.items() if quantity}
+    if not demand:
+        return {}
+    if any(quantity < 0 for quantity in demand.values()):
+        raise ServiceError('Cannot reserve a negative quantity')
+
+    required = case(demand, value=products_table.c.id)
+    stmt = update(products_table)\
+        .where(
+            _in_lock_order(demand),
+            products_table.c.current_stock >= required
+        )\
+        .values(
+            current_stock=products_table.c.current_stock - required,
+            updated_at=datetime.utcnow()
+        )\
+        .returning(products_table.c.id, products_table.c.current_stock)
+
+    new_stock = {row.id: row.current_stock for row in session.execute(stmt)}
+    if len(new_stock) != len(demand):
+        raise InsufficientStock(set(demand) - set(new_stock))
+    return new_stock
+
+
+def release_stock(session, demand):
+    """Вернуть продукты {product_id: quantity} на склад"""
+    return apply_stock_delta(session, demand)
+
+
+def order_demand(session, order_id):
+    """Сколько продуктов ушло на заказ по текущим рецептам: {product_id: quantity}"""
+    rows = session.execute(
+        select(
+            MenuItemIngredient.product_id,
+            func.sum(MenuItemIngredient.quantity_required * OrderItem.quantity).label('quantity')
+        )
+        .join(OrderItem, OrderItem.menu_item_id == MenuItemIngredient.menu_item_id)
+        .where(OrderItem.order_id == order_id)
+        .group_by(MenuItemIngredient.product_id)
+    ).all()
+    return {row.product_id: row.quantity for row in rows}
+
+
+def current_stock(session, product_ids):
+    rows = session.execute(
+        select(Product.id, Product.current_stock).where(Product.id.in_(product_ids))
+    ).all()
+    return {row.id: row.current_stock or 0 for row in rows}
@@ -0,0 +1,76 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from models import Product, ProductSupply
+
+
+def month_start(year, month):
+    return datetime(year, month, 1)
+
+
+def next_month_start(year, month):
+    return datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+
+
+def _supplier_name():
+    return func.coalesce(ProductSupply.supplier_name, 'Unknown')
+
+
+def _distinct_names(dialect_name):
+    """Агрегат списка уникальных названий продуктов в зависимости от СУБД"""
+    if dialect_name == 'postgresql':
+        return func.array_agg(Product.name.distinct())
+    return func.json_group_array(Product.name.distinct())
+
+
+def supplier_totals(session, start, end):
+    """Итоги по поставщикам за [start, end) одним GROUP BY"""
+    dialect_name = session.get_bind().dialect.name
+    supplier_name = _supplier_name().label('supplier_name')
+    rows = session.execute(
+        select(
+            supplier_name,
+            func.sum(ProductSupply.quantity).label('total_quantity'),
+            func.sum(func.coalesce(ProductSupply.cost, 0) * ProductSupply.quantity).label('total_cost'),
+            func.count().label('supply_count'),
+            _distinct_names(dialect_name).label('products')
+        )
+        .join(Product, Product.id == ProductSupply.product_id)
+        .where(ProductSupply.supply_date >= start, ProductSupply.supply_date < end)
+        .group_by(supplier_name)
+        .order_by(supplier_name)
+    )
+    for row in rows:
+        products = json.loads(row.products) if isinstance(row.products, str) else row.products
+        yield {
+            'supplier_name': row.supplier_name,
+            'total_quantity': row.total_quantity,
+            'total_cost': row.total_cost,
+            'supply_count': row.supply_count,
+            'products': sorted(products)
+        }
+
+
+def supplier_product_breakdown(session, start, end):
+    """Итоги по парам (поставщик, продукт) за [start, end), потоково"""
+    supplier_name = _supplier_name().label('supplier_name')
+    rows = session.execute(
+        select(
+            supplier_name,
+            Product.id.label('product_id'),
+            Product.name.label('product_name'),
+            Product.unit,
+            func.sum(ProductSupply.quantity).label('total_quantity'),
+            func.sum(func.coalesce(ProductSupply.cost, 0) * ProductSupply.quantity).label('total_cost'),
+            func.count().label('supply_count')
+        )
+        .join(Product, Product.id == ProductSupply.product_id)
+        .where(ProductSupply.supply_date >= start, ProductSupply.supply_date < end)
+        .group_by(supplier_name, Product.id, Product.name, Product.unit)
+        .order_by(supplier_name, Product.name)
+        .execution_options(yield_per=1000)
+    )
+    for row in rows:
+        yield row._asdict()
@@ -0,0 +1,142 @@
+import csv
+import json
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from models import Product, ProductSupply
+from services.availability import availability_index
+from services.stock import apply_stock_delta
+from services.transaction import on_commit
+
+BATCH_SIZE = 5000
+
+SUPPLY_COLUMNS = ('product_id', 'quantity', 'supply_date', 'supplier_name', 'cost', 'batch_number')
+
+
+def parse_ndjson(lines):
+    """Строки JSON Lines -> (номер строки, запись или ошибка)"""
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError:
+            yield line_no, ValueError('Invalid JSON')
+
+
+def parse_csv(lines):
+    """CSV с заголовком -> (номер строки, запись)"""
+    reader = csv.DictReader(lines)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def ingest_supplies(session, records, keep_accepted=False, supply_date=None):
+    """Загрузить поставки из потока записей (номер строки, dict).
+
+    Все product_id проверяются по одному запросу, строки вставляются пачками
+    через executemany (COPY на psycopg), а остатки увеличиваются одним
+    агрегированным UPDATE в конце. Возвращает отчет с причинами отказов.
+    """
+    products = dict(session.execute(select(Product.id, Product.name)).all())
+    supply_date = supply_date or datetime.utcnow()
+
+    batch = []
+    increments = {}
+    accepted = []
+    accepted_count = 0
+    errors = []
+
+    for line_no, record in records:
+        try:
+            row = _validate(record, products, supply_date)
+        except ValueError as e:
+            errors.append({'line': line_no, 'error': str(e)})
+            continue
+
+        batch.append(row)
+        increments[row['product_id']] = increments.get(row['product_id'], 0) + row['quantity']
+        accepted_count += 1
+        if keep_accepted:
+            accepted.append({
+                'line': line_no,
+                'product_id': row['product_id'],
+                'product_name': products[row['product_id']],
+                'quantity': row['quantity']
+            })
+
+        if len(batch) >= BATCH_SIZE:
+            _insert_supplies(session, batch)
+            batch = []
+
+    _insert_supplies(session, batch)
+
+    new_stock = apply_stock_delta(session, increments)
+    on_commit(session, availability_index.update_stock, new_stock)
+
+    report = {
+        'accepted': accepted_count,
+        'rejected': len(errors),
+        'errors': errors
+    }
+    if keep_accepted:
+        report['supplies'] = accepted
+    return report
+
+
+def _validate(record, products, supply_date):
+    if isinstance(record, Exception):
+        raise ValueError(str(record))
+    if not isinstance(record, dict):
+        raise ValueError('Row must be an object')
+
+    try:
+        product_id = int(record['product_id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('product_id must be an integer')
+    if product_id not in products:
+        raise ValueError(f'Product {product_id} not found')
+
+    try:
+        quantity = float(record['quantity'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('quantity must be a number')
+    if quantity <= 0:
+        raise ValueError('quantity must be positive')
+
+    cost = record.get('cost')
+    if cost in (None, ''):
+        cost = None
+    else:
+        try:
+            cost = float(cost)
+        except (TypeError, ValueError):
+            raise ValueError('cost must be a number')
+
+    return {
+        'product_id': product_id,
+        'quantity': quantity,
+        'supply_date': supply_date,
+        'supplier_name': record.get('supplier_name') or None,
+        'cost': cost,
+        'batch_number': record.get('batch_number') or None
+    }
+
+
+def _insert_supplies(session, rows):
+    if not rows:
+        return
+
+    connection = session.connection()
+    if connection.dialect.driver == 'psycopg' and not connection.dialect.is_async:
+        # COPY - самый быстрый способ залить много строк в PostgreSQL;
+        # через async-адаптер курсора он недоступен, там остается executemany
+        cursor = connection.connection.cursor()
+        columns = ', '.join(SUPPLY_COLUMNS)
+        with cursor.copy(f'COPY {ProductSupply.__tablename__} ({columns}) FROM STDIN') as copy:
+            for row in rows:
+                copy.write_row([row[name] for name in SUPPLY_COLUMNS])
+        return
+
+    session.execute(insert(ProductSupply), rows)
@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_PENDING_KEY = 'on_commit_callbacks'
+
+
+def on_commit(session, func, *args):
+    """Отложить вызов func(*args) до успешного коммита сессии"""
+    session.info.setdefault(_PENDING_KEY, []).append((func, args))
+
+
+@contextmanager
+def savepoint(session):
+    """SAVEPOINT, при откате которого отбрасываются и отложенные внутри него вызовы"""
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    mark = len(pending)
+    try:
+        with session.begin_nested():
+            yield
+    except Exception:
+        del pending[mark:]
+        raise
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_pending(session):
+    # RELEASE SAVEPOINT тоже считается коммитом, но данные видны только после внешнего
+    if session.in_nested_transaction():
+        return
+    for func, args in session.info.pop(_PENDING_KEY, []):
+        func(*args)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    # Откат SAVEPOINT тоже приходит сюда; его вызовы уже отбросил savepoint(),
+    # а отложенные до него должны дождаться коммита внешней транзакции
+    if session.in_nested_transaction():
+        return
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,7 @@
+"""Benchmarks and checks of the app, run from the repository root.
+
+    python -m tools.<name> --help
+
+Each one works on a scratch database (see tools.scratch) and exits with
+status 1 when its check fails. Nothing in the app imports this package.
+"""
@@ -0,0 +1,117 @@
+"""Stock forecast benchmark on synthetic history.
+
+    python -m tools.forecast_bench [--products 500] [--dishes 300] [--days 180] [--budget-ms 1000]
+
+Builds a random menu and daily sales rollup rows, then times the forecast
+pipeline from those rows: sales matrix, recipe matrix, consumption and the
+per-product forecast. The same numbers are also computed with plain
+per-row Python loops, as a reference and a correctness check. Exits with
+status 1 when the vectorized run is over budget or disagrees.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from services.forecast import build_recipe_matrix, forecast, sales_matrix
+
+LEAD_TIME, COVER_DAYS, HALF_LIFE = 3, 7, 14
+
+
+def synthetic_history(products: int, dishes: int, days: int, ingredients: int, seed: int):
+    rng = np.random.default_rng(seed)
+    product_ids = np.arange(1, products + 1)
+    menu_item_ids = np.arange(1, dishes + 1)
+
+    recipe_dishes = np.repeat(menu_item_ids, ingredients)
+    recipe_products = np.concatenate([rng.choice(product_ids, ingredients, replace=False) for _ in menu_item_ids])
+    recipe_quantities = rng.uniform(0.01, 0.5, len(recipe_dishes)).round(3)
+
+    # A day row per dish that sold anything, as the rollup query returns them
+    popularity = rng.gamma(1.5, 4, dishes)
+    weekly = 1 + 0.3 * np.sin(np.arange(days) * 2 * np.pi / 7)
+    sold = rng.poisson(np.outer(weekly, popularity))
+    day_index, dish_index = np.nonzero(sold)
+    sales_rows = (day_index, menu_item_ids[dish_index], sold[day_index, dish_index])
+
+    stock = rng.uniform(0, 200, products)
+    min_stock = rng.uniform(0, 20, products)
+    return product_ids, menu_item_ids, (recipe_dishes, recipe_products, recipe_quantities), sales_rows, stock, min_stock
+
+
+def vectorized(product_ids, menu_item_ids, recipe_rows, sales_rows, stock, min_stock, days):
+    day_index, dish_ids, quantities = sales_rows
+    sales = sales_matrix(day_index, np.searchsorted(menu_item_ids, dish_ids), quantities.astype(float),
+                         days, len(menu_item_ids))
+    usage = sales @ build_recipe_matrix(menu_item_ids, product_ids, *recipe_rows)
+    return forecast(usage, stock, min_stock, LEAD_TIME, COVER_DAYS, HALF_LIFE)
+
+
+def per_row(product_ids, recipe_rows, sales_rows, stock, min_stock, days):
+    recipes = {}
+    for dish_id, product_id, quantity in zip(*(column.tolist() for column in recipe_rows)):
+        recipes.setdefault(dish_id, []).append((product_id, quantity))
+    usage = {product_id: [0.0] * days for product_id in product_ids.tolist()}
+    for day, dish_id, portions in zip(*(column.tolist() for column in sales_rows)):
+        for product_id, quantity in recipes.get(dish_id, []):
+            usage[product_id][day] += quantity * portions
+
+    weights = [0.5 ** ((days - 1 - day) / HALF_LIFE) for day in range(days)]
+    total = sum(weights)
+    to_order = []
+    for product_id, current, minimum in zip(product_ids.tolist(), stock.tolist(), min_stock.tolist()):
+        series = usage[product_id]
+        rate = sum(w * u for w, u in zip(weights, series)) / total
+        deviation = (sum(w * (u - rate) ** 2 for w, u in zip(weights, series)) / total) ** 0.5
+        safety = 1.65 * deviation * LEAD_TIME ** 0.5
+        reorder_point = rate * LEAD_TIME + safety + minimum
+        target = rate * (LEAD_TIME + COVER_DAYS) + safety + minimum
+        to_order.append(max(target - current, 0) if current <= reorder_point else 0)
+    return np.array(to_order)
+
+
+def best_of(runs: int, func, *args):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--dishes", type=int, default=300)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--ingredients", type=int, default=6, help="products per recipe")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    args = parser.parse_args(argv)
+
+    product_ids, menu_item_ids, recipe_rows, sales_rows, stock, min_stock = synthetic_history(
+        args.products, args.dishes, args.days, args.ingredients, args.seed)
+    print(f"{args.products} products, {args.dishes} dishes, {args.days} days: "
+          f"{len(sales_rows[0])} sales rows, {len(recipe_rows[0])} recipe rows")
+
+    fast, result = best_of(args.runs, vectorized, product_ids, menu_item_ids, recipe_rows, sales_rows,
+                           stock, min_stock, args.days)
+    slow, reference = best_of(1, per_row, product_ids, recipe_rows, sales_rows, stock, min_stock, args.days)
+    print(f"NumPy:      {fast * 1000:8.1f} ms (best of {args.runs})")
+    print(f"Per-row:    {slow * 1000:8.1f} ms ({slow / fast:.0f}x slower)")
+    print(f"To reorder: {np.count_nonzero(result['quantity_to_order'])} of {args.products} products")
+
+    failed = False
+    if not np.allclose(result["quantity_to_order"], reference):
+        print("Vectorized and per-row reorder quantities differ")
+        failed = True
+    if fast * 1000 > args.budget_ms:
+        print(f"Over budget by {fast * 1000 - args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Requests/s and p99 of the legacy Flask app against the FastAPI app.
+
+    python -m tools.http_bench --db-url postgresql+psycopg://... [--concurrency 32] [--rate 50]
+
+Serves each app in turn as a separate process on its own scratch schema of
+the given PostgreSQL database, seeded the same way: the Flask app with the
+threaded server `python main.py` uses, the FastAPI app with `python -m
+vsm_restaurant`. Both get the same mix of reads and order placements twice:
+from --concurrency clients that never pause, for requests/s, then at a fixed
+--rate below what either serves, for p99. Latency under saturation only
+measures the queue, so it isn't compared. Exits with status 1 when a request
+fails, or when the FastAPI app serves fewer requests/s or has a higher p99
+than the Flask one by more than --tolerance. The Flask app needs `uv sync
+--extra legacy`.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Order
+from tools.scratch import percentile, seed_history, seed_menu, served_app
+
+# main.py's development server without its debugger and per-request log
+FLASK_SERVER = """
+import logging, sys
+from main import create_app
+logging.getLogger("werkzeug").setLevel(logging.WARNING)
+create_app().run(host="127.0.0.1", port=int(sys.argv[1]), threaded=True)
+"""
+
+APPS = {
+    "flask": [sys.executable, "-c", FLASK_SERVER, "{port}"],
+    "fastapi": None,
+}
+
+
+def workload(rng: random.Random, ids: dict):
+    """(weight, method, path, JSON body) of the request mix"""
+    return [
+        (20, "GET", "/api/menu", None),
+        (15, "GET", f"/api/menu/{rng.choice(ids['menu_items'])}/availability", None),
+        (15, "GET", f"/api/products/{rng.choice(ids['products'])}", None),
+        (15, "GET", f"/api/orders/{rng.choice(ids['orders'])}", None),
+        (10, "GET", f"/api/orders/table/{rng.randint(1, 30)}", None),
+        (10, "GET", "/api/kitchen/queue", None),
+        (5, "GET", "/api/kitchen/tasks", None),
+        (10, "POST", "/api/orders", {"table_number": rng.randint(1, 30), "items": [
+            {"menu_item_id": rng.choice(ids["menu_items"]), "quantity": rng.randint(1, 3)}]}),
+    ]
+
+
+async def request(http: httpx.AsyncClient, rng: random.Random, ids: dict) -> str | None:
+    """One request of the mix; returns the failure, if any"""
+    requests = workload(rng, ids)
+    _, method, path, body = rng.choices(requests, weights=[weight for weight, *_ in requests])[0]
+    try:
+        response = await http.request(method, path, json=body)
+    except httpx.HTTPError as e:
+        return f"{type(e).__name__} {method} {path}"
+    return f"{response.status_code} {method} {path}" if response.status_code >= 500 else None
+
+
+async def load(base_url: str, ids: dict, args, rate: float | None = None) -> tuple[list[float], list[str]]:
+    """Latencies of the requests finished within the measured window, and the failures.
+
+    Without a rate, --concurrency clients send their next request as soon as the
+    last one is answered; with it, requests start every 1/rate seconds whether
+    or not the earlier ones are answered.
+    """
+    latencies, failures = [], []
+    measure_from = time.perf_counter() + args.warmup
+    stop_at = measure_from + args.duration
+
+    async def timed(http, rng):
+        started = time.perf_counter()
+        failed = await request(http, rng, ids)
+        finished = time.perf_counter()
+        if started >= measure_from and finished <= stop_at:
+            latencies.append(finished - started)
+            if failed:
+                failures.append(failed)
+
+    async def client(number):
+        rng = random.Random(args.seed * 1000 + number)
+        async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+            while time.perf_counter() < stop_at:
+                await timed(http, rng)
+
+    async def arrivals():
+        rng = random.Random(args.seed)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as http:
+            started, sent, running = time.perf_counter(), 0, set()
+            while (now := time.perf_counter()) < stop_at:
+                # On schedule even when the loop was late: the late requests go out at once
+                while started + sent / rate <= now:
+                    task = asyncio.create_task(timed(http, rng))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                    sent += 1
+                await asyncio.sleep(started + sent / rate - now)
+            await asyncio.gather(*running)
+
+    if rate is None:
+        await asyncio.gather(*(client(number) for number in range(args.concurrency)))
+    else:
+        await arrivals()
+    return latencies, failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", required=True, help="PostgreSQL database for the scratch schemas")
+    parser.add_argument("--concurrency", type=int, default=32, help="clients of the throughput run")
+    parser.add_argument("--rate", type=float,
+                        help="req/s of the latency run; half of what the Flask app served if omitted")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of load before measuring")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="share by which the FastAPI app may fall behind before it counts")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes of the FastAPI app")
+    parser.add_argument("--orders", type=int, default=3000, help="orders in the history")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    ids = {}
+
+    def prepare(engine):
+        menu_item_ids, product_ids = seed_menu(engine, dishes=50, products=100)
+        seed_history(engine, menu_item_ids, product_ids, args.orders, supplies=args.orders // 10, seed=args.seed)
+        with Session(engine) as session:
+            order_ids = session.scalars(select(Order.id)).all()
+        ids.update(menu_items=menu_item_ids, products=product_ids, orders=order_ids)
+
+    results = {}
+    rate = args.rate
+    print(f"{args.concurrency} clients, then a fixed rate; {args.duration:g} s per run after {args.warmup:g} s "
+          f"of warmup")
+    print(f"{'app':8} {'req/s':>8} {'at req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'failed':>7}")
+    for name, command in APPS.items():
+        with served_app(args.db_url, prepare, command, workers=args.workers) as (base_url, _):
+            served, failures = asyncio.run(load(base_url, ids, args))
+            rps = len(served) / args.duration
+            # The same rate for both apps, well below what either serves
+            rate = rate or rps / 2
+            latencies, more_failures = asyncio.run(load(base_url, ids, args, rate))
+        failures += more_failures
+        p99 = percentile(latencies, 0.99)
+        results[name] = rps, p99, failures
+        print(f"{name:8} {rps:8.0f} {rate:9.0f} {percentile(latencies, 0.5) * 1000:8.1f} "
+              f"{p99 * 1000:8.1f} {len(failures):7d}")
+
+    problems = [f"{name}: {len(failures)} requests failed, e.g. {failures[0]}"
+                for name, (_, _, failures) in results.items() if failures]
+    (flask_rps, flask_p99, _), (fastapi_rps, fastapi_p99, _) = results["flask"], results["fastapi"]
+    if fastapi_rps < flask_rps * (1 - args.tolerance):
+        problems.append(f"FastAPI serves {fastapi_rps:.0f} req/s, Flask {flask_rps:.0f}")
+    if fastapi_p99 > flask_p99 * (1 + args.tolerance):
+        problems.append(f"FastAPI p99 is {fastapi_p99 * 1000:.1f} ms, Flask {flask_p99 * 1000:.1f} ms")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Import time budget of the application.
+
+    python -m tools.importtime [--budget-ms 1200] [--runs 5]
+
+Imports the app in fresh interpreters under `python -X importtime`, takes
+the best run and exits with status 1 when it's over budget or when a module
+that must stay lazy (Flask, Alembic, ...) was imported.
+"""
+import argparse
+import subprocess
+import sys
+
+TARGET = "vsm_restaurant.web"
+IMPORT_BUDGET_MS = 1200
+# Loaded on demand only: the legacy app, the migration tooling, NumPy for stock forecasts and
+# the database dialects, of which the engines load the one DB_URL names
+LAZY_MODULES = ("flask", "flask_sqlalchemy", "alembic", "uvicorn", "numpy",
+                "sqlalchemy.dialects.postgresql", "sqlalchemy.dialects.sqlite")
+
+
+def measure(module: str) -> dict[str, tuple[int, int]]:
+    """Module -> (self, cumulative) import time in microseconds, for one fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default=TARGET)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    # The first runs also warm up the bytecode and filesystem caches, so take the fastest
+    runs = [measure(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda times: times[args.module][1])
+    total_ms = best[args.module][1] / 1000
+
+    print(f"{args.module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+    print("Slowest modules by own time:")
+    for name, (self_us, _) in sorted(best.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in best]
+    if eager:
+        print(f"Imported eagerly: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"Over budget by {total_ms - args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
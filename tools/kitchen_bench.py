@@ -0,0 +1,146 @@
+"""Kitchen queue throughput with N concurrent workers.
+
+    python -m tools.kitchen_bench [--db-url postgresql+psycopg://...] [--workers 1,2,4,8,16] [--tasks 2000]
+
+For each worker count, fills the kitchen queue with orders and lets that
+many threads claim and complete tasks through services.kitchen on a scratch
+database until the queue is empty. Reports tasks/s and claim latency; the
+workers share this process's interpreter, so beyond a few of them tasks/s is
+bound by statement building here rather than by the database. On
+PostgreSQL one more transaction claims a task and stays open for the whole
+run, like a cook whose request hangs; the workers have a lock_timeout, so one
+of them waiting on that lock fails the run. Exits with status 1 when a task
+is claimed twice or not at all, or a worker hits an error.
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from models import KitchenTask
+from services.kitchen import claim_tasks, complete_task
+from services.orders import place_orders
+from tools.scratch import percentile, scratch_engine, seed_menu
+
+
+def fill_queue(engine, menu_item_ids: list[int], tasks: int, rng: random.Random) -> int:
+    """Orders of one portion per line until the queue has `tasks` more tasks; returns the queue length."""
+    with Session(engine) as session:
+        orders = []
+        for _ in range(tasks // 4):
+            orders.append((rng.randint(1, 30), [{"menu_item_id": menu_item_id, "quantity": 1}
+                                                 for menu_item_id in rng.sample(menu_item_ids, 4)], "cash"))
+        place_orders(session, orders)
+        session.commit()
+        return session.scalar(select(func.count()).select_from(KitchenTask).where(KitchenTask.status == "queued"))
+
+
+def run_workers(engine, menu_item_ids: list[int], count: int, args, rng: random.Random, held: bool) -> list[str]:
+    """Fill the queue, drain it with `count` threads and print one row; returns the problems found."""
+    queued = fill_queue(engine, menu_item_ids, args.tasks, rng)
+    claimed = [[] for _ in range(count)]
+    latencies = [[] for _ in range(count)]
+    errors = []
+
+    def worker(number):
+        name = f"cook {number}"
+        while True:
+            try:
+                with Session(engine) as session:
+                    started = time.perf_counter()
+                    rows = claim_tasks(session, name, "cooking", args.batch)
+                    session.commit()
+                    latencies[number].append(time.perf_counter() - started)
+                    if not rows:
+                        return
+                    claimed[number] += [row.id for row in rows]
+                    for row in rows:
+                        complete_task(session, row.id, name)
+                    session.commit()
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {str(e).splitlines()[0]}")
+                return
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(count)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_claimed = [task_id for ids in claimed for task_id in ids]
+    waits = [latency for per_worker in latencies for latency in per_worker]
+    print(f"{count:7d} {len(all_claimed):6d} {len(all_claimed) / elapsed:8.0f} "
+          f"{percentile(waits, 0.5) * 1000:13.2f} {percentile(waits, 0.99) * 1000:13.2f} "
+          f"{len(errors):7d}")
+
+    problems = []
+    # The held task is still queued for everybody else, so it isn't expected to be claimed
+    expected = queued - held
+    if len(all_claimed) != len(set(all_claimed)):
+        problems.append(f"{count} workers: {len(all_claimed) - len(set(all_claimed))} tasks claimed twice")
+    if len(set(all_claimed)) != expected and not errors:
+        problems.append(f"{count} workers: {len(set(all_claimed))} of {expected} queued tasks claimed")
+    problems += [f"{count} workers: {error}" for error in sorted(set(errors))[:5]]
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", help="PostgreSQL database for the scratch schema; a temporary SQLite file if omitted")
+    parser.add_argument("--workers", default="1,2,4,8,16", help="worker counts, comma-separated")
+    parser.add_argument("--tasks", type=int, default=2000, help="tasks per worker count")
+    parser.add_argument("--batch", type=int, default=1, help="tasks per claim")
+    parser.add_argument("--lock-timeout", type=int, default=1000, help="ms a PostgreSQL worker may wait for a lock")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    counts = [int(count) for count in args.workers.split(",")]
+    rng = random.Random(args.seed)
+
+    problems = []
+    with scratch_engine(args.db_url, db_pool_size=max(counts) + 2, db_max_overflow=0) as engine:
+        postgresql = engine.dialect.name == "postgresql"
+        if postgresql:
+            @event.listens_for(engine, "connect")
+            def set_lock_timeout(connection, _):
+                with connection.cursor() as cursor:
+                    cursor.execute(f"SET lock_timeout = {args.lock_timeout}")
+                connection.commit()
+            # Connections made before the listener keep no timeout
+            engine.dispose()
+        menu_item_ids, _ = seed_menu(engine, dishes=20, products=20)
+
+        holder = None
+        if postgresql:
+            fill_queue(engine, menu_item_ids, 4, rng)
+            holder = Session(engine)
+            held = claim_tasks(holder, "hanging cook")
+            print(f"task {held[0].id} stays claimed in an open transaction")
+        try:
+            print(f"{engine.dialect.name}, claims of {args.batch} task(s)")
+            print(f"{'workers':>7} {'tasks':>6} {'tasks/s':>8} {'claim p50 ms':>13} {'claim p99 ms':>13} "
+                  f"{'errors':>7}")
+            for count in counts:
+                problems += run_workers(engine, menu_item_ids, count, args, rng, holder is not None)
+
+            with Session(engine) as session:
+                statuses = dict(session.execute(
+                    select(KitchenTask.status, func.count()).group_by(KitchenTask.status)).all())
+            print("Tasks by status: " + ", ".join(f"{status}={number}" for status, number in sorted(statuses.items())))
+        finally:
+            # The scratch schema can't be dropped while the held task is locked
+            if holder is not None:
+                holder.close()
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
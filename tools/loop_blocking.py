@@ -0,0 +1,135 @@
+"""Event loop blocking check of the API endpoints.
+
+    python -m tools.loop_blocking --db-url postgresql+psycopg://... [--threshold 0.1] [--rows 20000]
+
+Serves the app in this process on a migrated scratch schema of the given
+PostgreSQL database and calls every endpoint of the query plan check, plus
+bulk supply uploads of --rows rows, one request at a time. Meanwhile a
+LoopLagWatchdog probes the loop every few milliseconds; as nothing else
+runs, how late it wakes up is how long the request held the loop without
+yielding. First a canary endpoint runs a synchronous query inside an
+`async def`, the way a blocking handler would, to show the probe sees it.
+Exits with status 1 when a request holds the loop for longer than
+--threshold, or when the canary goes unnoticed.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from fastapi import Request
+from sqlalchemy import text
+
+from tools.query_plans import endpoints
+from tools.scratch import running_app, seed_history, seed_menu
+from vsm_restaurant.blocking import LoopLagWatchdog
+
+CANARY_PATH = "/_loop_blocking_canary"
+
+
+def supply_rows(product_ids: list[int], rows: int) -> list[dict]:
+    return [{"product_id": product_ids[number % len(product_ids)], "quantity": 1 + number % 50,
+             "supplier_name": f"Supplier {number % 10}", "cost": 1 + number % 20, "batch_number": f"B{number}"}
+            for number in range(rows)]
+
+
+async def held_for(watchdog: LoopLagWatchdog, client, method: str, path: str, **kwargs):
+    """(response, longest time the loop went without yielding while it was served)"""
+    # Let the probe wake up once, so a stall before the request isn't counted
+    await asyncio.sleep(watchdog.interval * 2)
+    watchdog.max_lag = 0.0
+    response = await client.request(method, path, **kwargs)
+    # A stall at the very end shows when the probe wakes up next
+    await asyncio.sleep(watchdog.interval * 2)
+    return response, watchdog.max_lag
+
+
+async def run(args) -> int:
+    ids = {}
+
+    def prepare(engine):
+        menu_item_ids, product_ids = seed_menu(engine, args.dishes, args.products)
+        seed_history(engine, menu_item_ids, product_ids, args.orders, args.supplies)
+        ids.update(product_ids=product_ids)
+
+    # Never reports by itself: the lag is compared per request below
+    watchdog = LoopLagWatchdog(interval=args.interval, threshold=float("inf"))
+    failed = 0
+    async with running_app(args.db_url, prepare, payment_worker_interval=3600, journal_replay_interval=3600,
+                           loop_lag_threshold=0) as client:
+        from vsm_restaurant.web import app
+
+        async def canary(request: Request):
+            # What this check is for: a synchronous query in an async handler
+            with request.app.state.engine.connect() as connection:
+                connection.execute(text("SELECT pg_sleep(:seconds)"), {"seconds": args.threshold * 2})
+            return {}
+
+        app.add_api_route(CANARY_PATH, canary)
+        probe = asyncio.create_task(watchdog.run())
+        try:
+            _, lag = await held_for(watchdog, client, "GET", CANARY_PATH)
+            print(f"{'ok' if lag > args.threshold else 'FAIL':>4}  {lag * 1000:8.1f} ms  canary: blocking query in "
+                  f"an async handler")
+            if lag <= args.threshold:
+                print(f"      the probe missed a {args.threshold * 2000:.0f} ms stall")
+                failed += 1
+
+            order_id = (await client.get("/api/orders", params={"limit": 1})).json()[0]["id"]
+            task_id = (await client.get("/api/kitchen/tasks", params={"limit": 1})).json()[0]["id"]
+            menu_item_id = min(item["id"] for item in (await client.get("/api/menu")).json())
+            product_id = ids["product_ids"][0]
+            rows = supply_rows(ids["product_ids"], args.rows)
+            # Encoded up front: the client runs on the same loop, and its work would count against the app
+            json_body = json.dumps({"supplies": rows})
+            ndjson_body = "".join(json.dumps(row) + "\n" for row in rows)
+            csv_body = "product_id,quantity,supplier_name,cost,batch_number\n" + "".join(
+                f"{row['product_id']},{row['quantity']},{row['supplier_name']},{row['cost']},{row['batch_number']}\n"
+                for row in rows)
+
+            requests = [(method, path, {"params": params, "json": body})
+                        for method, path, params, body, _ in endpoints(order_id, task_id, menu_item_id, product_id)]
+            requests += [
+                ("GET", "/api/orders", {"params": {"limit": 500}}),
+                ("GET", "/api/supplier/forecast", {}),
+                ("POST", "/api/supplier/supplies",
+                 {"content": json_body, "headers": {"content-type": "application/json"}}),
+                ("POST", "/api/supplier/supplies/import",
+                 {"content": ndjson_body, "headers": {"content-type": "application/x-ndjson"}}),
+                ("POST", "/api/supplier/supplies/import",
+                 {"content": csv_body, "headers": {"content-type": "text/csv"}}),
+            ]
+            for method, path, kwargs in requests:
+                response, lag = await held_for(watchdog, client, method, path, **kwargs)
+                problems = [] if response.status_code < 500 else [f"status {response.status_code}"]
+                if lag > args.threshold:
+                    problems.append(f"held the event loop for {lag * 1000:.0f} ms")
+                print(f"{'FAIL' if problems else 'ok':>4}  {lag * 1000:8.1f} ms  {method:6} {path[:40]:40} "
+                      f"{response.status_code}")
+                for problem in problems:
+                    print(f"      {problem}")
+                failed += bool(problems)
+        finally:
+            probe.cancel()
+
+    print(f"{failed} requests blocked the event loop" if failed else
+          f"No request held the event loop for longer than {args.threshold * 1000:.0f} ms")
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", required=True, help="PostgreSQL database for the scratch schema")
+    parser.add_argument("--threshold", type=float, default=0.1, help="seconds a request may hold the event loop")
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between the probe's wake-ups")
+    parser.add_argument("--rows", type=int, default=20000, help="rows of each bulk supply upload")
+    parser.add_argument("--dishes", type=int, default=50)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=3000)
+    parser.add_argument("--supplies", type=int, default=3000)
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Order intake benchmark with group commit off and on.
+
+    python -m tools.order_bench --db-url postgresql+psycopg://... [--orders 2000] [--concurrency 50]
+
+Starts the app as a separate process on a scratch schema of the given
+PostgreSQL database, once with ORDER_GROUP_COMMIT=false and once with
+=true, each time on a fresh schema with the same menu. Places --orders
+orders as fast as it takes them, --concurrency at a time, and reports
+orders per second and latency percentiles of both runs side by side.
+Exits with status 1 when an order isn't accepted with 201.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+
+from tools.scratch import percentile, seed_menu, served_app
+
+
+async def place(base_url: str, menu_item_ids: list[int], args) -> tuple[float, list[float], dict[int, int]]:
+    """(orders/s, latencies, response count by status)"""
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies, statuses = [], {}
+
+        async def order(number):
+            payload = {
+                "table_number": number % 30 + 1,
+                "items": [{"menu_item_id": menu_item_ids[number % len(menu_item_ids)], "quantity": 1}],
+            }
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/orders", json=payload)
+                latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(order(number) for number in range(args.orders)))
+        elapsed = time.perf_counter() - started
+    return args.orders / elapsed, latencies, statuses
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", required=True, help="PostgreSQL database for the scratch schemas")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--dishes", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    ids = {}
+
+    def prepare(engine):
+        ids["menu_item_ids"], _ = seed_menu(engine, dishes=args.dishes, products=args.dishes * 2)
+
+    failed = 0
+    print(f"{args.orders} orders, concurrency {args.concurrency}")
+    print(f"{'group commit':12} {'orders/s':>9} {'p50 ms':>8} {'p99 ms':>8}  responses")
+    for group_commit in (False, True):
+        # Under saturation orders wait for row locks by design, the slow query log would only be noise
+        with served_app(args.db_url, prepare, order_group_commit=str(group_commit).lower(),
+                        slow_query_threshold=0) as (base_url, _):
+            rate, latencies, statuses = asyncio.run(place(base_url, ids["menu_item_ids"], args))
+        print(f"{'on' if group_commit else 'off':12} {rate:9.0f} {percentile(latencies, 0.5) * 1000:8.1f} "
+              f"{percentile(latencies, 0.99) * 1000:8.1f}  "
+              + ", ".join(f"{status}={count}" for status, count in sorted(statuses.items())))
+        failed += sum(count for status, count in statuses.items() if status != 201)
+
+    if failed:
+        print(f"FAIL: {failed} orders weren't accepted")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Round trips per order as the number of order lines grows.
+
+    python -m tools.order_roundtrips [--db-url postgresql+psycopg://...] [--lines 1,5,10,25,50,100]
+
+Places orders of 1, 5, 10, ... distinct dishes through services.orders on a
+scratch database (a temporary SQLite file, or a scratch schema in the given
+PostgreSQL database) and counts the statements each order sends. Exits
+with status 1 when the count grows with the number of lines.
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from services.orders import place_order
+from tools.scratch import scratch_engine, seed_menu
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", help="PostgreSQL database for the scratch schema; a temporary SQLite file if omitted")
+    parser.add_argument("--lines", default="1,5,10,25,50,100", help="order sizes, comma-separated")
+    parser.add_argument("--ingredients", type=int, default=3, help="products per recipe")
+    parser.add_argument("--runs", type=int, default=20, help="orders per size")
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.lines.split(",")]
+
+    with scratch_engine(args.db_url) as engine:
+        menu_item_ids, _ = seed_menu(engine, dishes=max(sizes), products=max(sizes) * 2,
+                                     ingredients=args.ingredients)
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *_: statements.append(1))
+
+        print(f"{engine.dialect.name}, {args.ingredients} products per dish, {args.runs} orders per size")
+        print(f"{'lines':>6} {'statements':>11} {'median ms':>10}")
+        counts = {}
+        for size in sizes:
+            items = [{"menu_item_id": menu_item_id, "quantity": 1} for menu_item_id in menu_item_ids[:size]]
+            per_order, timings = set(), []
+            for _ in range(args.runs):
+                statements.clear()
+                started = time.perf_counter()
+                with Session(engine) as session:
+                    place_order(session, 1, items)
+                    session.commit()
+                timings.append(time.perf_counter() - started)
+                per_order.add(len(statements))
+            counts[size] = max(per_order)
+            print(f"{size:6d} {counts[size]:11d} {statistics.median(timings) * 1000:10.2f}")
+
+    if len(set(counts.values())) > 1:
+        print(f"Statements per order grow with its size: {min(counts.values())} -> {max(counts.values())}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""Database outage drill for the offline order journal.
+
+    python -m tools.outage_drill --db-url postgresql+psycopg://... [--rate 40] [--duration 15]
+
+Serves the app in this process on a scratch schema of the given PostgreSQL
+database, with its connections going through a TCP relay the drill owns.
+Sends a steady rush of orders, cuts the relay part way through (open
+connections are dropped, new ones refused), keeps ordering through the
+outage and opens the relay again; the database server itself is never
+touched. Exits with status 1 when an order request failed, when no order
+went to the journal, or when once the journal is replayed an accepted
+order isn't in the database exactly once and wasn't rejected with a reason.
+"""
+import argparse
+import asyncio
+import sys
+import threading
+import time
+
+import httpx
+from sqlalchemy import make_url
+
+from tools.scratch import percentile, running_app, seed_menu
+
+
+class Relay:
+    """A TCP relay to the database on its own thread and loop, that can be cut and restored.
+
+    The app's blocking shutdown (dropping the scratch schema) still goes
+    through it, so it can't share the app's event loop.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.target = host, port
+        self.port = None
+        self._server = None
+        self._writers = set()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True, name="relay").start()
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _pipe(self, reader, writer):
+        try:
+            while data := await reader.read(65536):
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, client_reader, client_writer):
+        try:
+            server_reader, server_writer = await asyncio.open_connection(*self.target)
+        except OSError:
+            client_writer.close()
+            return
+        self._writers |= {client_writer, server_writer}
+        try:
+            await asyncio.gather(self._pipe(client_reader, server_writer), self._pipe(server_reader, client_writer))
+        finally:
+            self._writers -= {client_writer, server_writer}
+
+    async def _open(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", self.port or 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _cut(self):
+        self._server.close()
+        for writer in list(self._writers):
+            writer.transport.abort()
+        await self._server.wait_closed()
+
+    def open(self):
+        self._call(self._open())
+
+    def cut(self):
+        self._call(self._cut())
+
+    def close(self):
+        self._call(self._cut())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+async def run(args, relayed_url: str, relay: Relay) -> int:
+    ids = {}
+
+    def prepare(engine):
+        ids["menu_item_ids"], _ = seed_menu(engine, dishes=20, products=40)
+
+    # Orders queue up on row locks at this rate, the slow query log would only be noise
+    async with running_app(relayed_url, prepare, payment_worker_interval=3600, slow_query_threshold=0,
+                           journal_replay_interval=args.replay_interval) as client:
+        menu_item_ids = ids["menu_item_ids"]
+        # Status -> [(latency, order id or journal key)]
+        outcomes = {"placed": [], "journaled": [], "failed": []}
+
+        async def order(number):
+            started = time.perf_counter()
+            try:
+                response = await client.post("/api/orders", json={
+                    "table_number": number % 30 + 1,
+                    "items": [{"menu_item_id": menu_item_ids[number % len(menu_item_ids)], "quantity": 1}],
+                })
+            except Exception as e:
+                # The ASGI transport lets an unhandled error of the app through
+                outcomes["failed"].append((time.perf_counter() - started, f"{type(e).__name__}: {e}"))
+                return
+            latency = time.perf_counter() - started
+            if response.status_code == 201:
+                outcomes["placed"].append((latency, response.json()["order_id"]))
+            elif response.status_code == 202:
+                outcomes["journaled"].append((latency, response.json()["journal_key"]))
+            else:
+                outcomes["failed"].append((latency, f"{response.status_code} {response.text[:200]}"))
+
+        async def at(seconds, action, name):
+            await asyncio.sleep(seconds)
+            print(f"{seconds:5.1f} s: {name}")
+            await asyncio.to_thread(action)
+
+        outage = [asyncio.create_task(at(args.cut_at, relay.cut, "database connection cut")),
+                  asyncio.create_task(at(args.restore_at, relay.open, "database connection restored"))]
+        requests = []
+        started = time.perf_counter()
+        for number in range(int(args.rate * args.duration)):
+            await asyncio.sleep(max(0.0, started + number / args.rate - time.perf_counter()))
+            requests.append(asyncio.create_task(order(number)))
+        await asyncio.gather(*requests, *outage)
+
+        for status, results in outcomes.items():
+            latencies = [latency for latency, _ in results]
+            print(f"{status:>9}: {len(results):5d}  p50={percentile(latencies, 0.5) * 1000:7.1f} ms"
+                  f"  p99={percentile(latencies, 0.99) * 1000:7.1f} ms")
+        for _, error in outcomes["failed"][:10]:
+            print(f"  failed: {error}")
+
+        # Wait until every journaled order has been replayed
+        replayed = time.perf_counter()
+        waiting = {key for _, key in outcomes["journaled"]}
+        applied, rejected, lost = [], [], []
+        while waiting and time.perf_counter() - replayed < args.timeout:
+            await asyncio.sleep(0.5)
+            for key in list(waiting):
+                response = await client.get(f"/api/journal/{key}")
+                if response.status_code == 404:
+                    lost.append(key)
+                elif response.json()["status"] == "applied":
+                    applied.append(response.json()["order_id"])
+                elif response.json()["status"] == "rejected":
+                    rejected.append((key, response.json()["detail"]))
+                else:
+                    continue
+                waiting.discard(key)
+        print(f"Journal replayed in {time.perf_counter() - replayed:.1f} s: "
+              f"{len(applied)} applied, {len(rejected)} rejected, {len(waiting)} still queued")
+        for key, detail in rejected[:10]:
+            print(f"  rejected {key}: {detail}")
+
+        order_ids = [order_id for _, order_id in outcomes["placed"]] + applied
+        duplicates = len(order_ids) - len(set(order_ids))
+        missing = [order_id for order_id in order_ids
+                   if (await client.get(f"/api/orders/{order_id}")).status_code != 200]
+
+    problems = {
+        "failed requests": len(outcomes["failed"]),
+        "lost journal records": len(lost),
+        "never replayed": len(waiting),
+        "duplicate orders": duplicates,
+        "orders missing from the database": len(missing),
+    }
+    if not outcomes["journaled"]:
+        # Otherwise the drill proved nothing
+        problems["outages the app didn't notice"] = 1
+    for problem, count in problems.items():
+        if count:
+            print(f"FAIL: {count} {problem}")
+    if not any(problems.values()):
+        print(f"OK: {len(order_ids)} orders placed exactly once, {len(rejected)} rejected with a reason")
+    return 1 if any(problems.values()) else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", required=True, help="PostgreSQL database for the scratch schema")
+    parser.add_argument("--rate", type=float, default=40, help="orders per second")
+    parser.add_argument("--duration", type=float, default=15, help="length of the rush, seconds")
+    parser.add_argument("--cut-at", type=float, default=3, help="seconds into the rush")
+    parser.add_argument("--restore-at", type=float, default=8, help="seconds into the rush")
+    parser.add_argument("--replay-interval", type=float, default=1.0, help="JOURNAL_REPLAY_INTERVAL of the app")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for the replay")
+    args = parser.parse_args(argv)
+
+    url = make_url(args.db_url)
+    relay = Relay(url.host or "127.0.0.1", url.port or 5432)
+    relay.open()
+    try:
+        relayed_url = url.set(host="127.0.0.1", port=relay.port).render_as_string(hide_password=False)
+        return asyncio.run(run(args, relayed_url, relay))
+    finally:
+        relay.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Query plan regression check of the API endpoints.
+
+    python -m tools.query_plans --db-url postgresql+psycopg://... [--orders 3000]
+
+Serves the app in this process on a migrated scratch schema of the given
+PostgreSQL database, calls every hot endpoint, records the statements each
+one sends and runs EXPLAIN on them with sequential scans, hash and merge
+joins disabled, so a plan still scanning a whole table means no index
+fits. Exits with status 1 when a statement reads a whole table outside the
+listings that return it whole. The schema comes from the migrations, not
+from models.py.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Engine, create_engine, event, text
+
+from tools.scratch import running_app, seed_history, seed_menu
+from vsm_restaurant.instrumentation import current_request
+
+# Scan nodes that read a relation; without an index condition (and outside a LIMIT) they read all of it
+SCAN_NODES = ("Seq Scan", "Index Scan", "Index Only Scan")
+
+
+def endpoints(order_id: int, task_id: int, menu_item_id: int, product_id: int):
+    """(method, path, query parameters, JSON body, tables the endpoint may read whole)"""
+    now = datetime.now(timezone.utc)
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    return [
+        # Listings that return the whole table
+        ("GET", "/api/menu", None, None, {"menu_items", "categories"}),
+        ("GET", "/api/menu/costs", None, None, {"menu_items"}),
+        ("GET", "/api/products", None, None, {"products"}),
+        ("GET", "/api/products/stock-report", None, None, {"products"}),
+
+        ("GET", "/api/orders", None, None, set()),
+        ("GET", "/api/orders", {"status": "pending"}, None, set()),
+        ("GET", "/api/orders/table/3", None, None, set()),
+        ("GET", f"/api/orders/{order_id}", None, None, set()),
+        # Hour-aligned windows are served from the rollups, the rest from orders
+        ("GET", "/api/orders/stats", {"from": (hour - timedelta(days=7)).isoformat(), "to": hour.isoformat()},
+         None, set()),
+        ("GET", "/api/orders/stats", {"from": (now - timedelta(days=7)).isoformat(), "to": now.isoformat(),
+                                      "bucket": "15min"}, None, set()),
+        ("POST", "/api/orders", None, {"table_number": 3, "items": [{"menu_item_id": menu_item_id, "quantity": 1}]},
+         set()),
+        ("PUT", f"/api/orders/{order_id}/status", None, {"status": "in_progress"}, set()),
+        ("DELETE", f"/api/orders/{order_id}", None, None, set()),
+
+        ("GET", f"/api/menu/{menu_item_id}/availability", None, None, set()),
+        ("GET", "/api/products/low-stock", None, None, set()),
+        ("GET", f"/api/products/{product_id}", None, None, set()),
+        ("POST", f"/api/products/{product_id}/supply", None, {"quantity": 5, "supplier_name": "Supplier 1"}, set()),
+        # Refused: the product is in a recipe
+        ("DELETE", f"/api/products/{product_id}", None, None, set()),
+
+        ("GET", "/api/supplier/supplies", {"days": 3}, None, set()),
+        ("GET", "/api/supplier/supplies", {"days": 3, "supplier_name": "Supplier 1"}, None, set()),
+        ("GET", "/api/supplier/products-to-order", None, None, set()),
+        ("GET", "/api/supplier/monthly-report", {"year": now.year, "month": now.month}, None, set()),
+        ("GET", "/api/supplier/monthly-report", {"year": now.year, "month": now.month, "format": "csv"}, None, set()),
+        # Uploads check every row against the product catalog, read once
+        ("POST", "/api/supplier/supplies", None, {"supplies": [{"product_id": product_id, "quantity": 3}]},
+         {"products"}),
+
+        ("GET", "/api/kitchen/tasks", None, None, set()),
+        ("GET", "/api/kitchen/queue", None, None, set()),
+        ("POST", "/api/kitchen/tasks/claim", None, {"worker": "cook", "limit": 2}, set()),
+        ("POST", f"/api/kitchen/tasks/{task_id}/complete", None, {"worker": "cook"}, set()),
+    ]
+
+
+def full_scans(plan: dict, under_limit: bool = False):
+    """Relations the plan reads whole"""
+    node = plan["Node Type"]
+    if node in SCAN_NODES and "Index Cond" not in plan and not under_limit:
+        yield plan["Relation Name"]
+    under_limit = under_limit or node == "Limit"
+    for child in plan.get("Plans", ()):
+        yield from full_scans(child, under_limit)
+
+
+def explain(engine: Engine, statement: str, parameters) -> dict:
+    with engine.connect() as connection:
+        for setting in ("enable_seqscan", "enable_hashjoin", "enable_mergejoin"):
+            connection.execute(text(f"SET {setting} = off"))
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        connection.rollback()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+async def run(args) -> int:
+    def prepare(engine):
+        menu_item_ids, product_ids = seed_menu(engine, args.dishes, args.products)
+        seed_history(engine, menu_item_ids, product_ids, args.orders, args.supplies)
+        with engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+
+    # Statements sent while a request is being served, with their parameters
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if current_request.get() is not None and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(Engine, "before_cursor_execute", record)
+    failed = 0
+    async with running_app(args.db_url, prepare, payment_worker_interval=3600, journal_replay_interval=3600,
+                           loop_lag_threshold=0) as client:
+        from vsm_restaurant.dependencies import settings
+
+        order_id = (await client.get("/api/orders", params={"limit": 1})).json()[0]["id"]
+        task_id = (await client.get("/api/kitchen/tasks", params={"limit": 1})).json()[0]["id"]
+        menu_item_id = min(item["id"] for item in (await client.get("/api/menu")).json())
+        # The first products are in the recipes of the first dishes
+        product_id = min(product["id"] for product in (await client.get("/api/products")).json())
+        # The recipe cost matrix reads both of its tables whole on the first request only
+        await client.get("/api/menu/costs")
+        explain_engine = create_engine(settings.db_url)
+
+        for method, path, params, body, whole in endpoints(order_id, task_id, menu_item_id, product_id):
+            statements.clear()
+            response = await client.request(method, path, params=params, json=body)
+            problems = [] if response.status_code < 500 else [f"status {response.status_code}"]
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+                    continue
+                scanned = set(full_scans(explain(explain_engine, statement, parameters))) - whole
+                if scanned:
+                    problems.append(f"reads all of {', '.join(sorted(scanned))}: {' '.join(statement.split())[:160]}")
+            print(f"{'FAIL' if problems else 'ok':>4}  {method:6} {path[:40]:40} "
+                  f"{response.status_code}  {len(statements)} statements")
+            for problem in problems:
+                print(f"      {problem}")
+            failed += bool(problems)
+        explain_engine.dispose()
+
+    print(f"{failed} endpoints with full scans" if failed else "No endpoint reads a whole table it doesn't return")
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", required=True, help="PostgreSQL database for the scratch schema")
+    parser.add_argument("--dishes", type=int, default=50)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=3000)
+    parser.add_argument("--supplies", type=int, default=3000)
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Throwaway databases and shared helpers for the benchmark and check tools."""
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+from sqlalchemy import Engine, create_engine, insert, make_url, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from models import Category, MenuItem, MenuItemIngredient, Model, Product
+from services.orders import place_orders
+from services.state import load_state
+from services.supplies import ingest_supplies
+from vsm_restaurant.db import create_db_engine, run_migrations
+from vsm_restaurant.settings import Settings
+
+
+@contextmanager
+def scratch_schema(db_url: str):
+    """A PostgreSQL URL whose connections work in a new empty schema, dropped on exit.
+
+    Any database will do, including the app's own: nothing outside the schema is touched.
+    """
+    url = make_url(db_url)
+    if url.get_backend_name() != "postgresql":
+        raise ValueError(f"Scratch schemas need PostgreSQL, got {url.get_backend_name()}")
+    schema = f"scratch_{secrets.token_hex(4)}"
+    # Unpooled: the connection that drops the schema must not be one a test has broken meanwhile
+    admin = create_engine(url, isolation_level="AUTOCOMMIT", poolclass=NullPool)
+    try:
+        with admin.connect() as connection:
+            connection.execute(text(f"CREATE SCHEMA {schema}"))
+        try:
+            yield url.update_query_dict({"options": f"-csearch_path={schema}"}).render_as_string(hide_password=False)
+        finally:
+            with admin.connect() as connection:
+                connection.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+    finally:
+        admin.dispose()
+
+
+@contextmanager
+def scratch_engine(db_url: str | None = None, **settings):
+    """An engine with the app's pool and pragmas on freshly created tables.
+
+    Without db_url the tables go to a temporary SQLite file, with a PostgreSQL
+    URL to a scratch schema. settings override the Settings fields (pool size, ...).
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        if db_url is None:
+            urls = nullcontext(f"sqlite:///{Path(directory) / 'scratch.db'}")
+        else:
+            urls = scratch_schema(db_url)
+        with urls as url:
+            engine = create_db_engine(Settings(db_url=url, **settings), "scratch")
+            try:
+                Model.metadata.create_all(engine)
+                yield engine
+            finally:
+                engine.dispose()
+
+
+@contextmanager
+def migrated_schema(db_url: str, prepare=None):
+    """A scratch schema migrated with Alembic and a temporary directory; yields (url, directory).
+
+    prepare(engine) may fill the schema before an app is started on it.
+    """
+    with scratch_schema(db_url) as url, tempfile.TemporaryDirectory() as directory:
+        settings = Settings(db_url=url)
+        run_migrations(settings)
+        if prepare is not None:
+            engine = create_db_engine(settings, "scratch")
+            try:
+                prepare(engine)
+            finally:
+                engine.dispose()
+        yield url, Path(directory)
+
+
+@asynccontextmanager
+async def running_app(db_url: str, prepare=None, **env):
+    """The FastAPI app served in this process on a scratch schema; yields an httpx client for it.
+
+    env sets Settings fields through the environment, which the app reads
+    when it's imported, so nothing may import vsm_restaurant.web before this.
+    The ASGI transport returns a response only once it's complete, so
+    streaming endpoints need served_app().
+    """
+    with migrated_schema(db_url, prepare) as (url, directory):
+        os.environ.update({
+            "DB_URL": url,
+            "JOURNAL_PATH": str(directory / "journal.jsonl"),
+            **{name.upper(): str(value) for name, value in env.items()},
+        })
+        from vsm_restaurant.web import app
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://scratch", timeout=60) as client:
+                yield client
+
+
+@contextmanager
+def served_app(db_url: str, prepare=None, command=None, startup_timeout: float = 60, **env):
+    """The app run by `python -m vsm_restaurant` on a scratch schema; yields (base URL, process).
+
+    command replaces that with another server, "{port}" in its arguments is
+    the port to listen on. env sets Settings fields of the server (WORKERS and
+    the like). Its access log is discarded, errors go to this process's stderr.
+    """
+    with migrated_schema(db_url, prepare) as (url, directory):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        command = [part.format(port=port) for part in command or [sys.executable, "-m", "vsm_restaurant"]]
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, env={
+            **os.environ,
+            "DB_URL": url,
+            "JOURNAL_PATH": str(directory / "journal.jsonl"),
+            "HOST": "127.0.0.1",
+            "PORT": str(port),
+            "RUN_MIGRATIONS_ON_STARTUP": "false",
+            **{name.upper(): str(value) for name, value in env.items()},
+        })
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.monotonic() + startup_timeout
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"The app exited with status {process.returncode} during startup")
+                try:
+                    httpx.get(base_url, timeout=1)
+                    break
+                except httpx.TransportError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"The app didn't answer within {startup_timeout:g} s")
+                    time.sleep(0.1)
+            yield base_url, process
+        finally:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def seed_menu(engine: Engine, dishes: int, products: int, ingredients: int = 3, stock: float = 1e9,
+              cooking_time=lambda number: 5 + number % 10) -> tuple[list[int], list[int]]:
+    """Dishes with recipes of `ingredients` products each; returns (menu item ids, product ids).
+
+    The in-memory indexes are rebuilt from the new rows, as at app startup.
+    """
+    with Session(engine) as session:
+        category_id = session.execute(insert(Category).returning(Category.id), {"name": "Scratch"}).scalar_one()
+        product_ids = session.execute(insert(Product).returning(Product.id), [
+            {"name": f"Product {number}", "unit": "kg", "current_stock": stock, "min_stock": 0, "cost_per_unit": 1}
+            for number in range(products)
+        ]).scalars().all()
+        menu_item_ids = session.execute(insert(MenuItem).returning(MenuItem.id), [
+            {"name": f"Dish {number}", "price": 10, "category_id": category_id, "is_available": True,
+             "cooking_time": cooking_time(number)}
+            for number in range(dishes)
+        ]).scalars().all()
+        session.execute(insert(MenuItemIngredient), [
+            {"menu_item_id": menu_item_id, "product_id": product_ids[(number + offset) % products],
+             "quantity_required": 1}
+            for number, menu_item_id in enumerate(menu_item_ids)
+            for offset in range(min(ingredients, products))
+        ])
+        session.commit()
+        load_state(session)
+    return sorted(menu_item_ids), sorted(product_ids)
+
+
+def seed_history(engine: Engine, menu_item_ids: list[int], product_ids: list[int],
+                 orders: int, supplies: int, days: int = 30, seed: int = 0):
+    """Orders (with their kitchen tasks and rollups) and supplies spread over the last `days` days."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        for day in range(days):
+            created_at = now - timedelta(days=days - day, minutes=rng.randrange(24 * 60))
+            place_orders(session, [
+                (rng.randint(1, 30),
+                 [{"menu_item_id": rng.choice(menu_item_ids), "quantity": rng.randint(1, 3)}
+                  for _ in range(rng.randint(1, 4))],
+                 "cash")
+                for _ in range(orders // days)
+            ], created_at)
+            ingest_supplies(session, enumerate(({
+                "product_id": rng.choice(product_ids),
+                "quantity": rng.randint(1, 50),
+                "supplier_name": f"Supplier {rng.randrange(10)}",
+                "cost": rng.randint(1, 20),
+            } for _ in range(supplies // days)), start=1), supply_date=created_at)
+        session.commit()
+
+
+def percentile(values: list[float], share: float) -> float:
+    """The value `share` of the way up the sorted values (nearest rank), NaN for none."""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
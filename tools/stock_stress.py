@@ -0,0 +1,139 @@
+"""Concurrent stock reservation stress test.
+
+    python -m tools.stock_stress [--db-url postgresql+psycopg://...] [--writers 16] [--orders 3000] [--stock 50]
+
+Writer threads place and cancel orders through services.orders against
+scarce stock on a scratch database, so most orders race for the last
+portions. Passes when stock never went negative, every unit is accounted
+for by the orders that remain, no writer hit an error other than "not enough
+ingredients", and the in-memory availability index agrees with the database.
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import MenuItemIngredient, Order, OrderItem, Product
+from services.availability import availability_index
+from services.errors import ServiceError
+from services.orders import cancel_order, place_order
+from tools.scratch import scratch_engine, seed_menu
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", help="PostgreSQL database for the scratch schema; a temporary SQLite file if omitted")
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--orders", type=int, default=3000, help="order attempts in total")
+    parser.add_argument("--products", type=int, default=4)
+    parser.add_argument("--dishes", type=int, default=8)
+    # Runs out within the first few dozen orders, after which cancellations hand back single
+    # portions that all the writers race for
+    parser.add_argument("--stock", type=float, default=50, help="initial stock of every product")
+    parser.add_argument("--cancel-share", type=float, default=0.2, help="share of placed orders cancelled again")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # All the writers queue on the one SQLite write lock, whose busy handler isn't fair:
+    # a writer may wait longer than the app's default timeout without anything being wrong
+    with scratch_engine(args.db_url, db_pool_size=args.writers + 2, db_max_overflow=0,
+                        sqlite_busy_timeout=60) as engine:
+        menu_item_ids, product_ids = seed_menu(engine, args.dishes, args.products, ingredients=2, stock=args.stock)
+        print(f"{engine.dialect.name}: {args.writers} writers, {args.orders} orders, "
+              f"{args.products} products x {args.stock:g}, {args.dishes} dishes of 2 products")
+
+        attempts = iter(range(args.orders))
+        attempts_lock = threading.Lock()
+        outcomes = {"placed": 0, "rejected": 0, "cancelled": 0}
+        errors = []
+        lowest_stock = [args.stock]
+        done = threading.Event()
+
+        def writer(number):
+            rng = random.Random(args.seed * 1000 + number)
+            placed = []
+            while True:
+                with attempts_lock:
+                    if next(attempts, None) is None:
+                        return
+                try:
+                    with Session(engine) as session:
+                        if placed and rng.random() < args.cancel_share:
+                            cancel_order(session, placed.pop(rng.randrange(len(placed))))
+                            outcome = "cancelled"
+                        else:
+                            items = [{"menu_item_id": rng.choice(menu_item_ids), "quantity": rng.randint(1, 3)}
+                                     for _ in range(rng.randint(1, 3))]
+                            placed.append(place_order(session, number, items).id)
+                            outcome = "placed"
+                        session.commit()
+                except ServiceError as e:
+                    if not str(e).startswith("Not enough ingredients"):
+                        errors.append(f"{type(e).__name__}: {e}")
+                    outcome = "rejected"
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+                    continue
+                with attempts_lock:
+                    outcomes[outcome] += 1
+
+        def watcher():
+            # Another reader would see a negative stock between the commits
+            with Session(engine) as session:
+                while not done.is_set():
+                    lowest_stock[0] = min(lowest_stock[0], session.scalar(select(func.min(Product.current_stock))))
+                    session.rollback()
+                    time.sleep(0.005)
+
+        threads = [threading.Thread(target=writer, args=(number,)) for number in range(args.writers)]
+        watching = threading.Thread(target=watcher)
+        watching.start()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        watching.join()
+
+        with Session(engine) as session:
+            stock = dict(session.execute(select(Product.id, Product.current_stock)).all())
+            # Stock taken by the orders that were not cancelled
+            used = dict(session.execute(
+                select(MenuItemIngredient.product_id,
+                       func.sum(MenuItemIngredient.quantity_required * OrderItem.quantity))
+                .join(OrderItem, OrderItem.menu_item_id == MenuItemIngredient.menu_item_id)
+                .join(Order, Order.id == OrderItem.order_id)
+                .where(Order.status != "cancelled")
+                .group_by(MenuItemIngredient.product_id)
+            ).all())
+
+    print(f"{args.orders / elapsed:.0f} attempts/s: {outcomes['placed']} placed, {outcomes['cancelled']} cancelled, "
+          f"{outcomes['rejected']} rejected for lack of stock, {len(errors)} errors")
+    print("Stock left: " + ", ".join(f"{product_id}={stock[product_id]:g}" for product_id in product_ids))
+
+    problems = []
+    if min(lowest_stock[0], *stock.values()) < 0:
+        problems.append(f"stock went negative: {min(lowest_stock[0], *stock.values()):g}")
+    for product_id in product_ids:
+        expected = args.stock - used.get(product_id, 0)
+        if abs(stock[product_id] - expected) > 1e-6:
+            problems.append(f"product {product_id}: stock {stock[product_id]:g}, orders account for {expected:g}")
+        if abs(availability_index.stock(product_id) - stock[product_id]) > 1e-6:
+            problems.append(f"product {product_id}: availability index has {availability_index.stock(product_id):g}, "
+                            f"database {stock[product_id]:g}")
+    if not outcomes["rejected"]:
+        problems.append("stock never ran out, raise --orders or lower --stock")
+    problems += sorted(set(errors))[:10]
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
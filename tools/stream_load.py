@@ -0,0 +1,163 @@
+"""Load test of the menu availability push channel.
+
+    python -m tools.stream_load --db-url postgresql+psycopg://... [--clients 2000] [--events 20]
+
+Starts the app as a separate process on a scratch schema of the given
+PostgreSQL database and opens --clients SSE subscriptions to
+/api/menu/availability/stream from one asyncio loop, plus --stalled ones
+that never read. Then it makes a dish available and unavailable again
+(a supply, then an order that uses it up) --events times and measures how
+long each change takes to reach every reading client. Exits with status 1
+when a client misses an event or gets them out of order, or when the p99
+delivery time exceeds --p99-budget.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from tools.scratch import percentile, seed_menu, served_app
+
+STREAM_PATH = "/api/menu/availability/stream"
+
+
+class Subscriber:
+    """One SSE client on a raw connection; keeps (arrival time, available) of its events."""
+
+    def __init__(self):
+        self.events = []
+        self.connected = asyncio.Event()
+        self.arrived = asyncio.Condition()
+
+    async def run(self, host: str, port: int, read: bool = True):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f"GET {STREAM_PATH} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+        try:
+            # Chunk sizes of the chunked encoding come as lines of their own and are skipped
+            while line := await reader.readline():
+                if line.startswith(b"retry:"):
+                    self.connected.set()
+                    if not read:
+                        await asyncio.Event().wait()
+                elif line.startswith(b"data:"):
+                    delta = json.loads(line[5:])
+                    async with self.arrived:
+                        self.events.append((time.perf_counter(), delta["available"]))
+                        self.arrived.notify_all()
+        finally:
+            writer.close()
+
+    async def wait_for(self, count: int):
+        async with self.arrived:
+            await self.arrived.wait_for(lambda: len(self.events) >= count)
+
+
+def rss_mb(pid: int) -> float:
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def run(args, base_url: str, pid: int, menu_item_id: int, product_id: int) -> list[str]:
+    url = httpx.URL(base_url)
+    rss_idle = rss_mb(pid)
+    subscribers = [Subscriber() for _ in range(args.clients)]
+    stalled = [Subscriber() for _ in range(args.stalled)]
+    connecting = asyncio.Semaphore(200)
+
+    async def connect(subscriber, read):
+        async with connecting:
+            task = asyncio.create_task(subscriber.run(url.host, url.port, read))
+            subscribed = asyncio.create_task(subscriber.connected.wait())
+            # A failed connection ends the task without subscribing
+            await asyncio.wait([task, subscribed], return_when=asyncio.FIRST_COMPLETED)
+            subscribed.cancel()
+            return task
+
+    started = time.perf_counter()
+    tasks = await asyncio.gather(*(connect(subscriber, True) for subscriber in subscribers),
+                                 *(connect(subscriber, False) for subscriber in stalled))
+    connected = sum(subscriber.connected.is_set() for subscriber in subscribers + stalled)
+    print(f"{connected} of {len(subscribers) + len(stalled)} clients connected in "
+          f"{time.perf_counter() - started:.1f} s, server RSS {rss_idle:.0f} -> {rss_mb(pid):.0f} MB")
+
+    problems = []
+    if connected < len(subscribers) + len(stalled):
+        problems.append(f"{len(subscribers) + len(stalled) - connected} clients couldn't subscribe")
+    delays, spreads = [], []
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        for number in range(args.events):
+            sent = time.perf_counter()
+            if number % 2 == 0:
+                response = await client.post(f"/api/products/{product_id}/supply", json={"quantity": 1})
+            else:
+                response = await client.post("/api/orders", json={
+                    "table_number": 1, "items": [{"menu_item_id": menu_item_id, "quantity": 1}]})
+            if response.is_error:
+                problems.append(f"event {number}: {response.status_code} {response.text[:200]}")
+                break
+            waiting = [subscriber.wait_for(number + 1) for subscriber in subscribers if subscriber.connected.is_set()]
+            try:
+                await asyncio.wait_for(asyncio.gather(*waiting), args.timeout)
+            except asyncio.TimeoutError:
+                missed = sum(len(subscriber.events) <= number for subscriber in subscribers)
+                problems.append(f"event {number}: {missed} clients got nothing within {args.timeout:g} s")
+                break
+            arrivals = [subscriber.events[number][0] for subscriber in subscribers if subscriber.connected.is_set()]
+            delays += [arrival - sent for arrival in arrivals]
+            spreads.append(max(arrivals) - min(arrivals))
+    print(f"server RSS after {args.events} events: {rss_mb(pid):.0f} MB")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    expected = [number % 2 == 0 for number in range(args.events)]
+    wrong = sum([available for _, available in subscriber.events] != expected
+                for subscriber in subscribers if subscriber.connected.is_set())
+    if wrong and not problems:
+        problems.append(f"{wrong} clients got the availability changes incomplete or out of order")
+    if delays:
+        p99 = percentile(delays, 0.99)
+        print(f"delivery to {len(subscribers)} clients: p50 {percentile(delays, 0.5) * 1000:.0f} ms, "
+              f"p99 {p99 * 1000:.0f} ms, max {max(delays) * 1000:.0f} ms; "
+              f"first to last client {statistics.median(spreads) * 1000:.0f} ms (median)")
+        if p99 > args.p99_budget:
+            problems.append(f"p99 delivery {p99 * 1000:.0f} ms over the {args.p99_budget * 1000:.0f} ms budget")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", required=True, help="PostgreSQL database for the scratch schema")
+    parser.add_argument("--clients", type=int, default=2000, help="subscribers that read their stream")
+    parser.add_argument("--stalled", type=int, default=200, help="subscribers that never read")
+    parser.add_argument("--events", type=int, default=20, help="availability changes, alternately on and off")
+    parser.add_argument("--buffer", type=int, default=100, help="per-subscriber buffer of the app")
+    parser.add_argument("--timeout", type=float, default=10, help="seconds every client may take to get an event")
+    parser.add_argument("--p99-budget", type=float, default=1.0, help="seconds")
+    args = parser.parse_args(argv)
+
+    ids = {}
+
+    def prepare(engine):
+        # One dish of one product that starts out of stock
+        menu_item_ids, product_ids = seed_menu(engine, dishes=1, products=1, ingredients=1, stock=0)
+        ids.update(menu_item_id=menu_item_ids[0], product_id=product_ids[0])
+
+    with served_app(args.db_url, prepare, availability_stream_buffer=args.buffer) as (base_url, process):
+        problems = asyncio.run(run(args, base_url, process.pid, **ids))
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Bulk supply ingestion benchmark.
+
+    python -m tools.supply_bench [--db-url postgresql+psycopg://...] [--rows 10000,100000,1000000]
+
+Writes NDJSON (or CSV) manifests of 10k, 100k and 1M rows with a share of
+broken rows to temporary files and loads each through services.supplies on a
+scratch database, streaming the file the way the upload endpoint does.
+Reports rows/s and how much the process grew while loading. Exits with
+status 1 when the accepted and rejected counts, the stored supplies or the
+stock don't match the manifest, or when loading takes more memory than
+--memory-budget.
+"""
+import argparse
+import csv
+import json
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import Product, ProductSupply
+from services.supplies import ingest_supplies, parse_csv, parse_ndjson
+from tools.scratch import scratch_engine, seed_menu
+
+# Rows the ingestion must reject, in the manifest's own format
+BROKEN_ROWS = (
+    {"product_id": "x", "quantity": 1},
+    {"product_id": 0, "quantity": 1},
+    {"product_id": 1, "quantity": -1},
+    {"product_id": 1, "quantity": 1, "cost": "free"},
+)
+
+
+def write_manifest(path: Path, rows: int, product_ids: list[int], broken_share: float, csv_format: bool,
+                   seed: int) -> tuple[int, dict[int, float]]:
+    """Returns the number of broken rows and the quantity per product of the good ones."""
+    rng = random.Random(seed)
+    broken = 0
+    quantities = {}
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, ["product_id", "quantity", "supplier_name", "cost", "batch_number"])
+        if csv_format:
+            writer.writeheader()
+        for number in range(rows):
+            if rng.random() < broken_share:
+                row = dict(rng.choice(BROKEN_ROWS))
+                broken += 1
+            else:
+                row = {"product_id": rng.choice(product_ids), "quantity": rng.randint(1, 100),
+                       "supplier_name": f"Supplier {number % 10}", "cost": rng.randint(1, 20),
+                       "batch_number": f"B{number}"}
+                quantities[row["product_id"]] = quantities.get(row["product_id"], 0) + row["quantity"]
+            if csv_format:
+                writer.writerow(row)
+            else:
+                file.write(json.dumps(row) + "\n")
+    return broken, quantities
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", help="PostgreSQL database for the scratch schema; a temporary SQLite file if omitted")
+    parser.add_argument("--rows", default="10000,100000,1000000", help="manifest sizes, comma-separated")
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--broken-share", type=float, default=0.001, help="share of rows that must be rejected")
+    parser.add_argument("--memory-budget", type=float, default=200,
+                        help="MB the process may grow by while loading the largest manifest")
+    args = parser.parse_args(argv)
+    sizes = sorted(int(size) for size in args.rows.split(","))
+    csv_format = args.format == "csv"
+    parse = parse_csv if csv_format else parse_ndjson
+
+    problems = []
+    with scratch_engine(args.db_url) as engine, tempfile.TemporaryDirectory() as directory:
+        _, product_ids = seed_menu(engine, dishes=1, products=args.products, ingredients=1, stock=0)
+        print(f"{engine.dialect.name}, {args.format}, {args.products} products, "
+              f"{args.broken_share:.1%} broken rows")
+        print(f"{'rows':>9} {'seconds':>8} {'rows/s':>9} {'rejected':>9} {'RSS +MB':>8}")
+
+        for size in sizes:
+            path = Path(directory) / f"manifest.{args.format}"
+            broken, quantities = write_manifest(path, size, product_ids, args.broken_share, csv_format, size)
+            with Session(engine) as session:
+                stock_before = dict(session.execute(select(Product.id, Product.current_stock)).all())
+                supplies_before = session.scalar(select(func.count()).select_from(ProductSupply))
+
+            rss_before = peak_rss_mb()
+            started = time.perf_counter()
+            with Session(engine) as session, open(path, newline="") as file:
+                report = ingest_supplies(session, parse(file))
+                session.commit()
+            elapsed = time.perf_counter() - started
+            # The peak only moves once loading needs more than any earlier step
+            grown = peak_rss_mb() - rss_before
+            print(f"{size:9d} {elapsed:8.2f} {size / elapsed:9.0f} {report['rejected']:9d} {grown:8.1f}")
+
+            with Session(engine) as session:
+                stock = dict(session.execute(select(Product.id, Product.current_stock)).all())
+                supplies = session.scalar(select(func.count()).select_from(ProductSupply))
+            if (report["accepted"], report["rejected"]) != (size - broken, broken):
+                problems.append(f"{size} rows: {report['accepted']} accepted, {report['rejected']} rejected, "
+                                f"expected {size - broken} and {broken}")
+            if supplies - supplies_before != size - broken:
+                problems.append(f"{size} rows: {supplies - supplies_before} supplies stored, "
+                                f"expected {size - broken}")
+            wrong_stock = [product_id for product_id in product_ids
+                           if abs(stock[product_id] - stock_before[product_id] - quantities.get(product_id, 0)) > 1e-6]
+            if wrong_stock:
+                problems.append(f"{size} rows: stock of {len(wrong_stock)} products doesn't match the manifest")
+            if grown > args.memory_budget:
+                problems.append(f"{size} rows: the process grew by {grown:.0f} MB, budget {args.memory_budget:g} MB")
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import copy
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import uvicorn
+from uvicorn.config import LOGGING_CONFIG
+
+from vsm_restaurant.db import create_db_engine, migrate
+from vsm_restaurant.settings import Settings
+
+
+def main():
+    settings = Settings()
+    # Migrate once here rather than concurrently in every worker's lifespan
+    if settings.run_migrations_on_startup:
+        engine = create_db_engine(settings, "migrations")
+        migrate(settings, engine)
+        engine.dispose()
+    os.environ["RUN_MIGRATIONS_ON_STARTUP"] = "false"
+
+    # Each worker has its own registry; they share it through files so one scrape covers them all
+    metrics_dir = settings.metrics_dir
+    temporary_metrics_dir = settings.workers > 1 and not metrics_dir
+    if temporary_metrics_dir:
+        metrics_dir = tempfile.mkdtemp(prefix="vsm-metrics-")
+        os.environ["METRICS_DIR"] = metrics_dir
+    elif metrics_dir:
+        # Counters of a previous run would be added to this one's
+        for path in Path(metrics_dir).glob("*.json"):
+            path.unlink()
+
+    # Let the app's own INFO messages (startup timings and the like) through uvicorn's handler
+    log_config = copy.deepcopy(LOGGING_CONFIG)
+    log_config["loggers"]["vsm_restaurant"] = {"handlers": ["default"], "level": "INFO", "propagate": False}
+
+    try:
+        uvicorn.run(
+            "vsm_restaurant.web:app",
+            host=settings.host,
+            port=settings.port,
+            workers=settings.workers,
+            proxy_headers=True,
+            log_config=log_config,
+        )
+    finally:
+        if temporary_metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import httpx
+
+
+class AcquirerError(Exception):
+    pass
+
+
+class AcquirerClient:
+    """HTTP client of the acquirer service: payment links and refunds."""
+
+    def __init__(self, base_url: str, timeout: float = 10.0):
+        self._client = httpx.AsyncClient(base_url=base_url, timeout=timeout)
+
+    async def create_payment(self, order_id: int, amount: float, webhook_url: str) -> dict:
+        """A new payment for the order: {"payment_id": ..., "payment_url": ...}."""
+        return await self._post("/payments", {"order_id": order_id, "amount": amount, "webhook_url": webhook_url})
+
+    async def refund(self, payment_id: str, amount: float) -> dict:
+        # The acquirer deduplicates by the key, so a retried request can't refund twice
+        return await self._post(f"/payments/{payment_id}/refunds", {"amount": amount},
+                                headers={"Idempotency-Key": f"refund-{payment_id}"})
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def _post(self, path: str, payload: dict, headers: dict | None = None) -> dict:
+        try:
+            response = await self._client.post(path, json=payload, headers=headers)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AcquirerError(f"Acquirer request {path} failed: {e}") from e
+        return response.json()
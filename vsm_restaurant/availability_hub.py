@@ -0,0 +1,53 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AvailabilityHub:
+    """Fan-out of menu availability deltas to push subscribers.
+
+    All subscribers live on one asyncio loop; each one gets a bounded queue,
+    so a slow client can only lose its own oldest events, never stall the
+    others. Publishers may call publish_threadsafe() from any thread
+    (sync request handlers run in a thread pool).
+    """
+
+    def __init__(self, buffer_size: int = 100):
+        self.buffer_size = buffer_size
+        self._subscribers: set[asyncio.Queue] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def bind(self, loop: asyncio.AbstractEventLoop, buffer_size: int | None = None):
+        self._loop = loop
+        if buffer_size is not None:
+            self.buffer_size = buffer_size
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.buffer_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish_threadsafe(self, deltas: list[dict]):
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self.publish, deltas)
+
+    def publish(self, deltas: list[dict]):
+        for delta in deltas:
+            for queue in self._subscribers:
+                if queue.full():
+                    # Drop the oldest event: the client will still converge on the latest state
+                    queue.get_nowait()
+                    logger.debug("Availability subscriber buffer overflow, dropping oldest event")
+                queue.put_nowait(delta)
+
+
+hub = AvailabilityHub()
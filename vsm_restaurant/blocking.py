@@ -0,0 +1,49 @@
+import asyncio
+import functools
+import logging
+
+import anyio
+import anyio.to_thread
+
+logger = logging.getLogger(__name__)
+
+# Shared by every sync-only code path, so a burst of imports can't occupy
+# all of Starlette's default threads (or all sync pool connections)
+_limiter = anyio.CapacityLimiter(4)
+
+
+def set_blocking_threads(count: int):
+    _limiter.total_tokens = count
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function in the bounded thread pool and wait for it."""
+    return await anyio.to_thread.run_sync(functools.partial(func, *args, **kwargs), limiter=_limiter)
+
+
+class LoopLagWatchdog:
+    """Reports when something holds the event loop for longer than the threshold.
+
+    The watchdog sleeps for a fixed interval and measures how late it wakes up;
+    a late wake-up means some callback ran without yielding for that long.
+    """
+
+    def __init__(self, interval: float = 0.5, threshold: float = 0.1):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_lag = 0.0
+        self.stalls = 0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - started - self.interval
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.stalls += 1
+                logger.warning("Event loop was blocked for %.0f ms", lag * 1000)
+
+
+loop_watchdog = LoopLagWatchdog()
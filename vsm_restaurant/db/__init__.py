@@ -1,19 +1,31 @@
-import alembic.command
-import alembic.config
-from sqlalchemy import Engine
+from sqlalchemy import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import create_engine
 
 from ..settings import Settings
+from .migrations import migrate, run_migrations, schema_is_current
+from .pooling import configure_engine, engine_options
 
 # Remember to import your models here for alembic to discover them
 from .demo import DemoModel
 
 
-def run_migrations(settings: Settings):
-    alembic_cfg = alembic.config.Config("alembic.ini")
-    alembic_cfg.set_main_option("sqlalchemy.url", settings.db_url)
-    alembic.command.upgrade(alembic_cfg, "head")
+def create_db_engine(settings: Settings, name: str = "sync") -> Engine:
+    engine = create_engine(settings.db_url, **engine_options(settings))
+    configure_engine(engine, settings, name)
+    return engine
 
-def create_db_engine(settings: Settings) -> Engine:
-    return create_engine(settings.db_url)
 
+def async_db_url(db_url: str) -> str:
+    """The same database through an asyncio driver: DB_URL names the sync one, as the migrations use it."""
+    url = make_url(db_url)
+    if url.drivername in ("sqlite", "sqlite+pysqlite"):
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url.render_as_string(hide_password=False)
+
+
+def create_async_db_engine(settings: Settings, name: str = "async", db_url: str | None = None) -> AsyncEngine:
+    db_url = async_db_url(db_url or settings.db_url)
+    engine = create_async_engine(db_url, **engine_options(settings, is_async=True, db_url=db_url))
+    configure_engine(engine.sync_engine, settings, name)
+    return engine
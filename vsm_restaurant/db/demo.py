@@ -2,11 +2,26 @@ from datetime import datetime
 from enum import Enum
 
 from pydantic import ConfigDict
-from sqlalchemy import Column
-from sqlalchemy.dialects.sqlite import TEXT, INTEGER, VARCHAR
+from sqlalchemy import JSON, Column, DateTime, Integer, String, Text, TypeDecorator
 from sqlalchemy.sql.schema import Index
 from sqlmodel import Field, SQLModel
-from sqlalchemy.dialects.postgresql import JSONB, insert
+
+
+class JSONDocument(TypeDecorator):
+    """JSONB on PostgreSQL, plain JSON elsewhere (migration f3b8d0a6c527).
+
+    The PostgreSQL dialect is imported only when it's the one in use,
+    instead of whenever the model is.
+    """
+
+    impl = JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import JSONB
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(JSON())
 
 
 class DemoEnumType(int, Enum):
@@ -17,11 +32,12 @@ class DemoEnumType(int, Enum):
 
 class DemoModel(SQLModel, table=True):
     id: int | None = Field(primary_key=True, default=None)
-    timestamp: datetime = Field()
-    title: str | None = Field(sa_column=Column(VARCHAR(255)))
-    message: str | None = Field(sa_column=Column(TEXT), default=None)
-    demo_enum: DemoEnumType | None = Field(sa_column=Column(INTEGER), default=None)
-    json_data: dict | None = Field(sa_column=Column(JSONB), default=None)
+    # Newer SQLModel maps datetime to its own UTCDateTime, the column stays a plain DateTime
+    timestamp: datetime = Field(sa_column=Column(DateTime, nullable=False))
+    title: str | None = Field(sa_column=Column(String(255)))
+    message: str | None = Field(sa_column=Column(Text), default=None)
+    demo_enum: DemoEnumType | None = Field(sa_column=Column(Integer), default=None)
+    json_data: dict | None = Field(sa_column=Column(JSONDocument), default=None)
 
     __tablename__ = "demo"
     __table_args__ = (
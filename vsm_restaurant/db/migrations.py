@@ -0,0 +1,94 @@
+import logging
+import re
+import time
+from pathlib import Path
+
+from sqlalchemy import Engine, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from ..settings import Settings
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = "alembic.ini"
+VERSIONS_DIR = Path("alembic") / "versions"
+# pg_advisory_lock key shared by every process that may migrate this database
+MIGRATION_LOCK_ID = 0x76736d5f6d6967  # "vsm_mig"
+
+_REVISION = re.compile(r"^revision(?::[^=]*)?=\s*['\"](\w+)['\"]", re.MULTILINE)
+_DOWN_REVISION = re.compile(r"^down_revision(?::[^=]*)?=(.*)$", re.MULTILINE)
+
+
+def run_migrations(settings: Settings):
+    # Alembic and the revision scripts take a noticeable share of a cold start,
+    # so they are only imported when there is something to upgrade
+    import alembic.command
+    import alembic.config
+
+    alembic_cfg = alembic.config.Config(ALEMBIC_INI)
+    # The option goes through configparser interpolation, where "%" is special (escaped passwords, options)
+    alembic_cfg.set_main_option("sqlalchemy.url", settings.db_url.replace("%", "%%"))
+    alembic.command.upgrade(alembic_cfg, "head")
+
+
+def script_heads(versions_dir: Path = VERSIONS_DIR) -> set[str]:
+    """Head revisions of the migration scripts, read from the files without importing Alembic."""
+    revisions, parents = set(), set()
+    for path in versions_dir.glob("*.py"):
+        source = path.read_text(encoding="utf-8")
+        revision = _REVISION.search(source)
+        if revision is None:
+            continue
+        revisions.add(revision.group(1))
+        down_revision = _DOWN_REVISION.search(source)
+        if down_revision is not None:
+            parents.update(re.findall(r"['\"](\w+)['\"]", down_revision.group(1)))
+    return revisions - parents
+
+
+def current_revisions(connection) -> set[str]:
+    """Revisions in alembic_version, in one round trip; none if the table doesn't exist yet."""
+    try:
+        return set(connection.execute(text("SELECT version_num FROM alembic_version")).scalars())
+    except (ProgrammingError, OperationalError):
+        # PostgreSQL aborts the transaction on the failed statement
+        connection.rollback()
+        return set()
+
+
+def schema_is_current(engine: Engine) -> bool:
+    with engine.connect() as connection:
+        return current_revisions(connection) == script_heads()
+
+
+def migrate(settings: Settings, engine: Engine) -> bool:
+    """Upgrade the database to head unless it's already there; returns whether Alembic ran.
+
+    On PostgreSQL the upgrade runs under an advisory lock, so when several
+    workers start together one migrates and the rest wait and then skip.
+    """
+    heads = script_heads()
+    with engine.connect() as connection:
+        if current_revisions(connection) == heads:
+            return False
+
+        locked = connection.dialect.name == "postgresql"
+        if locked:
+            connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+        try:
+            # Another process may have finished the upgrade while we waited for the lock
+            if current_revisions(connection) == heads:
+                return False
+            connection.rollback()
+
+            started = time.perf_counter()
+            run_migrations(settings)
+            logger.info("Database upgraded to %s in %.0f ms", ", ".join(sorted(heads)),
+                        (time.perf_counter() - started) * 1000)
+            return True
+        finally:
+            if locked:
+                connection.rollback()
+                connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                connection.commit()
@@ -0,0 +1,120 @@
+import time
+import weakref
+
+from sqlalchemy import Engine, event, exc, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from ..metrics import registry
+from ..settings import Settings
+
+pool_wait_seconds = registry.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool",
+    labels=("pool",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+pool_timeouts = registry.counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after pool_timeout",
+    labels=("pool",),
+)
+
+# Pool name -> pool, for the scrape-time gauges
+_pools = weakref.WeakValueDictionary()
+
+
+class _TimedCheckout:
+    pool_name = "default"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_timeouts.inc(self.pool_name)
+            raise
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - started, self.pool_name)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.pool_name = self.pool_name
+        _pools[self.pool_name] = pool
+        return pool
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_gauge(read):
+    return lambda: {(name,): read(pool) for name, pool in list(_pools.items())}
+
+
+registry.gauge("db_pool_size", "Connections the pool keeps open", ("pool",),
+               _pool_gauge(lambda pool: pool.size()))
+registry.gauge("db_pool_max_overflow", "Connections the pool may open above its size", ("pool",),
+               _pool_gauge(lambda pool: pool._max_overflow))
+registry.gauge("db_pool_checked_out", "Connections currently in use", ("pool",),
+               _pool_gauge(lambda pool: pool.checkedout()))
+registry.gauge("db_pool_saturation", "Connections in use as a share of size + max overflow", ("pool",),
+               _pool_gauge(lambda pool: pool.checkedout() / max(pool.size() + max(pool._max_overflow, 0), 1)))
+
+
+def engine_options(settings: Settings, is_async: bool = False, db_url: str | None = None) -> dict:
+    """Keyword arguments for create_engine/create_async_engine built from the settings."""
+    url = make_url(db_url or settings.db_url)
+    options = {
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+    if url.get_backend_name() == "sqlite":
+        # In-memory databases live in a single connection, there is nothing to size
+        if url.database in (None, "", ":memory:"):
+            return options
+    elif url.get_backend_name() == "postgresql":
+        # Without a timeout a connection attempt to an unreachable host hangs for minutes
+        connect_args = {"connect_timeout": settings.db_connect_timeout}
+        if settings.db_statement_timeout > 0:
+            connect_args["options"] = f"-c statement_timeout={int(settings.db_statement_timeout * 1000)}"
+        options["connect_args"] = connect_args
+
+    options.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+    )
+    return options
+
+
+def configure_engine(engine: Engine, settings: Settings, name: str):
+    """Name the engine's pool for metrics and apply the SQLite pragmas on every new connection."""
+    if isinstance(engine.pool, _TimedCheckout):
+        engine.pool.pool_name = name
+        _pools[name] = engine.pool
+
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers work while a writer commits; NORMAL fsyncs only at checkpoints
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout * 1000)}")
+        cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")
+        cursor.close()
+
+    @event.listens_for(engine, "savepoint")
+    def begin_before_savepoint(connection, name):
+        # The driver opens a transaction only before INSERT/UPDATE/DELETE. A SAVEPOINT outside one
+        # starts its own, and releasing it would commit everything up to there on its own
+        if not connection.connection.driver_connection.in_transaction:
+            connection.exec_driver_sql("BEGIN")
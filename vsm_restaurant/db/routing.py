@@ -0,0 +1,116 @@
+import asyncio
+import itertools
+import logging
+import time
+import weakref
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Zero while the replica has replayed everything it received, otherwise the age
+# of the last replayed transaction (an idle primary doesn't make a replica stale)
+PG_REPLICA_LAG = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+# Set on responses to writes; while it's fresh the client reads from the primary
+PRIMARY_COOKIE = "vsm_primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_routers = weakref.WeakSet()
+
+
+class ReplicaRouter:
+    """Chooses the engine for read-only sessions.
+
+    Replicas are used round-robin while their measured lag is within
+    max_lag; when none qualifies (or none is configured) reads go to the
+    primary. Lag is refreshed by run() in the background, so picking an
+    engine never waits on the network.
+    """
+
+    def __init__(self, primary: AsyncEngine, replicas: dict[str, AsyncEngine], max_lag: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+        # Replica name -> lag in seconds, None while unknown or unreachable
+        self.lag = dict.fromkeys(replicas)
+        self._next = itertools.count()
+        _routers.add(self)
+
+    def pick(self) -> AsyncEngine:
+        fresh = [name for name, lag in self.lag.items() if lag is not None and lag <= self.max_lag]
+        if not fresh:
+            return self.primary
+        return self.replicas[fresh[next(self._next) % len(fresh)]]
+
+    async def check(self):
+        for name, engine in self.replicas.items():
+            try:
+                self.lag[name] = await asyncio.wait_for(_measure_lag(engine), timeout=max(self.max_lag, 1.0))
+            except Exception as error:
+                if self.lag[name] is not None:
+                    logger.warning("Replica %s is unavailable, reading from the primary: %s", name, error)
+                self.lag[name] = None
+
+    async def run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.check()
+
+    async def dispose(self):
+        for engine in self.replicas.values():
+            await engine.dispose()
+
+
+async def _measure_lag(engine: AsyncEngine) -> float:
+    async with engine.connect() as connection:
+        if connection.dialect.name != "postgresql":
+            # Other backends have no replication to lag behind
+            return 0.0
+        return float(await connection.scalar(PG_REPLICA_LAG))
+
+
+def pinned_to_primary(cookies: dict) -> bool:
+    try:
+        return float(cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    """Marks clients that just wrote something, so their next reads see the write.
+
+    Successful unsafe requests get a short-lived cookie; read-only sessions
+    of requests carrying it are opened on the primary.
+    """
+
+    def __init__(self, app, window: float):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or self.window <= 0:
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (f"{PRIMARY_COOKIE}={time.time() + self.window:.3f}; "
+                          f"Max-Age={int(self.window) + 1}; Path=/; HttpOnly; SameSite=Lax")
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+registry.gauge(
+    "db_replica_lag_seconds", "Replication lag of each read replica, -1 when unavailable", ("replica",),
+    lambda: {(name,): -1 if lag is None else lag for router in list(_routers) for name, lag in router.lag.items()}
+)
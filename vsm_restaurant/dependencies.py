@@ -1,13 +1,29 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from typing import Annotated
 
 from fastapi import FastAPI, Depends, Request
 from sqlalchemy.engine.base import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlmodel import Session
-
-from vsm_restaurant.db import run_migrations, create_db_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from services.availability import availability_index
+from services.scheduler import kitchen_scheduler
+from services.state import load_state
+from vsm_restaurant.acquirer import AcquirerClient
+from vsm_restaurant.availability_hub import hub
+from vsm_restaurant.blocking import loop_watchdog, run_blocking, set_blocking_threads
+from vsm_restaurant.db import migrate, create_db_engine, create_async_db_engine
+from vsm_restaurant.db.routing import ReplicaRouter, pinned_to_primary
+from vsm_restaurant.journal import is_disconnect, journal
+from vsm_restaurant.metrics import registry
+from vsm_restaurant.order_batcher import order_batcher
+from vsm_restaurant.payment_worker import payment_worker
 from vsm_restaurant.settings import Settings
+from vsm_restaurant.startup import startup_timer
+from vsm_restaurant.state_sync import state_sync
 
 logger = logging.getLogger(__name__)
 
@@ -22,24 +38,139 @@ def get_engine(request: Request):
     return request.app.state.engine
 
 
+def get_async_engine(request: Request):
+    return request.app.state.async_engine
+
+
 def get_session(engine: Engine = Depends(get_engine)):
     with Session(engine) as session:
         yield session
 
 
+async def get_async_session(engine: AsyncEngine = Depends(get_async_engine)):
+    # Handlers read attributes after commit, so don't expire them
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_read_session(request: Request):
+    """Session for read-only handlers: a fresh replica, or the primary right after this client wrote."""
+    router = request.app.state.db_router
+    engine = router.primary if pinned_to_primary(request.cookies) else router.pick()
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+
 
 SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+# Mark of a read-only handler, which may be served by a replica
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
+
+
+def _load_state(engine: Engine):
+    # Rebuilding the indexes is CPU-bound, so it runs in a worker thread on the sync engine
+    with Session(engine) as session:
+        load_state(session)
+
+
+async def refresh_state(engine: Engine, interval: float):
+    """Periodically rebuild state written by other processes, where the database can't announce changes (SQLite)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_blocking(_load_state, engine)
+        except Exception as e:
+            # The journal reports outages
+            if not is_disconnect(e):
+                logger.exception("Failed to refresh in-memory state")
+
+
+async def share_metrics(interval: float):
+    """Keep this worker's samples in the shared metrics directory current."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_blocking(registry.dump)
+        except OSError:
+            logger.exception("Failed to share metrics")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app.state.settings = settings
-
-    run_migrations(settings)
-
-    engine = create_db_engine(settings)
-    app.state.engine = engine
+    set_blocking_threads(settings.blocking_threads)
+
+    with startup_timer.phase("engines"):
+        engine = create_db_engine(settings)
+        app.state.engine = engine
+        async_engine = create_async_db_engine(settings)
+        app.state.async_engine = async_engine
+        # Changes written through these pools are applied by on_commit, not by the state sync
+        state_sync.track(engine)
+        state_sync.track(async_engine.sync_engine)
+
+    if settings.run_migrations_on_startup:
+        # One query when the schema is already at head, Alembic otherwise
+        with startup_timer.phase("migrations"):
+            await run_blocking(migrate, settings, engine)
+
+    with startup_timer.phase("replicas"):
+        replicas = {
+            f"replica{number}": create_async_db_engine(settings, f"replica{number}", url)
+            for number, url in enumerate(settings.db_replica_urls, start=1)
+        }
+        db_router = ReplicaRouter(async_engine, replicas, settings.db_replica_max_lag)
+        await db_router.check()
+        app.state.db_router = db_router
+
+    with startup_timer.phase("state"):
+        kitchen_scheduler.set_stations(settings.kitchen_stations)
+        await state_sync.listen(settings.db_url, settings.db_connect_timeout)
+        await run_blocking(_load_state, engine)
+
+    # Stock changes anywhere in this process are pushed to availability subscribers
+    hub.bind(asyncio.get_running_loop(), settings.availability_stream_buffer)
+    availability_index.add_listener(hub.publish_threadsafe)
+
+    acquirer = AcquirerClient(settings.acquirer_url)
+    app.state.acquirer = acquirer
+
+    # Replays what was accepted during an outage, including before a restart
+    journal.open(settings.journal_path)
+
+    background = [
+        asyncio.create_task(payment_worker.run(
+            engine, acquirer, settings.payment_worker_interval, settings.payment_worker_batch)),
+        asyncio.create_task(journal.run(engine, settings.journal_replay_interval, settings.journal_replay_batch)),
+    ]
+    if settings.order_group_commit:
+        background.append(order_batcher.start(
+            engine, settings.order_group_commit_window, settings.order_group_commit_max_batch))
+    if replicas:
+        background.append(asyncio.create_task(db_router.run(settings.db_replica_check_interval)))
+    if state_sync.listening:
+        background.append(asyncio.create_task(state_sync.run(engine, settings.state_sync_delay)))
+    elif settings.state_refresh_interval > 0:
+        background.append(asyncio.create_task(refresh_state(engine, settings.state_refresh_interval)))
+    if settings.loop_lag_threshold > 0:
+        loop_watchdog.threshold = settings.loop_lag_threshold
+        background.append(asyncio.create_task(loop_watchdog.run()))
+    if settings.metrics_dir:
+        registry.share(settings.metrics_dir)
+        background.append(asyncio.create_task(share_metrics(settings.metrics_share_interval)))
+
+    startup_timer.report()
 
     yield # Wait until the app shuts down
 
-    # Here we can do some post-shutdown tasks, but there is nothing to do for now.
+    for task in background:
+        task.cancel()
+    if settings.metrics_dir:
+        # Counters of a worker that stops still count in the totals
+        registry.dump()
+    await acquirer.close()
+    await state_sync.close()
+    journal.close()
+    await db_router.dispose()
+    await async_engine.dispose()
+    engine.dispose()
@@ -0,0 +1,148 @@
+import contextvars
+import logging
+import time
+
+from sqlalchemy import Engine, event
+
+from vsm_restaurant.metrics import registry
+
+slow_query_logger = logging.getLogger("vsm_restaurant.slow_queries")
+
+UNMATCHED_ROUTE = "unmatched"
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "Request latency", labels=("method", "route", "status"))
+request_db_time = registry.histogram(
+    "http_request_db_seconds", "Time a request spent in SQL statements", labels=("method", "route"))
+request_statements = registry.histogram(
+    "http_request_db_statements", "SQL statements issued by a request", labels=("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500))
+slow_queries = registry.counter(
+    "db_slow_queries_total", "Statements slower than the slow query threshold", labels=("route",))
+
+
+class RequestStats:
+    """SQL statements and database time of the current request."""
+
+    def __init__(self, route=None):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        # A string, or a callable resolved once the framework has matched the route
+        self._route = route
+
+    @property
+    def route(self) -> str:
+        route = self._route() if callable(self._route) else self._route
+        return route or UNMATCHED_ROUTE
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        return (f'db;desc="{self.statements} statements";dur={self.db_time * 1000:.1f}, '
+                f'total;dur={self.elapsed() * 1000:.1f}')
+
+    def observe(self, method: str, status: int):
+        route = self.route
+        request_duration.observe(self.elapsed(), method, route, status)
+        request_db_time.observe(self.db_time, method, route)
+        request_statements.observe(self.statements, method, route)
+
+
+# Set for the duration of a request; copied into the threads and greenlets that run its queries
+current_request = contextvars.ContextVar("current_request", default=None)
+
+slow_query_threshold = 0.1
+
+
+def configure_slow_query_log(threshold: float, path: str | None = None):
+    global slow_query_threshold
+    slow_query_threshold = threshold
+    if path and not any(getattr(handler, "baseFilename", None) == path for handler in slow_query_logger.handlers):
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_query_logger.addHandler(handler)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["statement_started"].pop()
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+
+    if slow_query_threshold > 0 and elapsed >= slow_query_threshold:
+        route = stats.route if stats is not None else "-"
+        slow_queries.inc(route)
+        # Parameters are left out: they may carry customer data
+        slow_query_logger.warning("%.1f ms route=%s statement=%s", elapsed * 1000, route, " ".join(statement.split()))
+
+
+class RequestTimingMiddleware:
+    """Per-request statement count, DB time and latency for the FastAPI app.
+
+    Adds a Server-Timing header to every response and feeds the per-route
+    histograms served at /metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # The router stores the matched route in the scope it was given
+        stats = RequestStats(lambda: getattr(scope.get("route"), "path", None))
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            stats.observe(scope["method"], status)
+
+
+def instrument_flask(app):
+    """The same instrumentation and the /metrics endpoint for the legacy Flask app."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_request_stats():
+        g.request_stats = RequestStats(lambda: request.url_rule.rule if request.url_rule else None)
+        g.request_stats_token = current_request.set(g.request_stats)
+
+    @app.after_request
+    def add_server_timing(response):
+        stats = g.get("request_stats")
+        if stats is not None:
+            response.headers["Server-Timing"] = stats.server_timing()
+            stats.observe(request.method, response.status_code)
+        return response
+
+    @app.teardown_request
+    def finish_request_stats(error):
+        token = g.pop("request_stats_token", None)
+        if token is not None:
+            current_request.reset(token)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
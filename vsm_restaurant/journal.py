@@ -0,0 +1,261 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import Engine, exc, text
+from sqlalchemy.orm import Session
+
+from services.journal import replay_records
+from vsm_restaurant.blocking import run_blocking
+from vsm_restaurant.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+journal_appends = registry.counter(
+    "journal_appends_total", "Writes accepted into the local journal while the database was unreachable",
+    labels=("kind",))
+journal_fsync_seconds = registry.histogram(
+    "journal_fsync_seconds", "Time to write and fsync one batch of journal records",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+journal_fsync_batch = registry.histogram(
+    "journal_fsync_batch_records", "Journal records made durable by one fsync",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+journal_replayed = registry.counter(
+    "journal_replayed_total", "Journal records moved to the database by outcome", labels=("outcome",))
+journal_skipped = registry.counter(
+    "journal_skipped_lines_total", "Unreadable journal lines, such as a record torn by a crash")
+
+
+def is_disconnect(error: BaseException) -> bool:
+    """Whether a database error means the database can't be reached, rather than a failed statement."""
+    if not isinstance(error, exc.DBAPIError):
+        return False
+    if error.connection_invalidated:
+        return True
+    # psycopg reports failed connection attempts without an SQLSTATE
+    return isinstance(error, exc.OperationalError) and getattr(error.orig, "sqlstate", "") is None
+
+
+def _ping(engine: Engine):
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+def _apply(engine: Engine, records: list[dict]):
+    with Session(engine) as session:
+        results = replay_records(session, records)
+        session.commit()
+    for outcome, count in results.items():
+        journal_replayed.inc(outcome, amount=count)
+
+
+class Journal:
+    """Append-only local journal of orders and supplies accepted while the database is unreachable.
+
+    Records are JSON lines in a file shared by the worker processes. An append
+    returns once its record is fsynced; appends that arrive while an fsync is
+    in progress are written together by the next one, so a rush costs an fsync
+    per batch rather than per order. Replay keeps its position in a side
+    file and empties the journal once everything in it is in the database.
+    """
+
+    def __init__(self):
+        self.path = None
+        # While set, writes go straight to the journal instead of waiting for the database
+        self.offline = False
+        self._fd = None
+        self._pending = []
+        self._flusher = None
+        # One thread does all writes and fsyncs, in order
+        self._writer = None
+
+    @property
+    def offset_path(self) -> str:
+        return self.path + ".offset"
+
+    def open(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="journal")
+        # A record torn by a crash must not swallow the next one
+        if os.fstat(self._fd).st_size:
+            with open(path, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":
+                    self._write(b"\n")
+        if self.pending():
+            # Left over from before a restart
+            self.offline = True
+
+    def close(self):
+        if self._fd is not None:
+            self._writer.shutdown()
+            os.close(self._fd)
+            self._fd = None
+
+    def go_offline(self):
+        if not self.offline:
+            logger.warning("Database is unreachable, accepting writes into %s", self.path)
+        self.offline = True
+
+    def pending(self) -> bool:
+        try:
+            return os.path.getsize(self.path) > 0
+        except FileNotFoundError:
+            return False
+
+    async def append(self, kind: str, payload: dict) -> str:
+        """Durably record a write for replay and return its key."""
+        key = uuid.uuid4().hex
+        record = {"key": key, "kind": kind, "recorded_at": datetime.utcnow().isoformat(), "payload": payload}
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((json.dumps(record, separators=(",", ":")).encode() + b"\n", future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        await future
+        journal_appends.inc(kind)
+        return key
+
+    def contains(self, key: str) -> bool:
+        """Whether the record is still waiting in the journal."""
+        needle = f'"key":"{key}"'.encode()
+        try:
+            with open(self.path, "rb") as file:
+                return any(needle in line for line in file)
+        except FileNotFoundError:
+            return False
+
+    async def _flush(self):
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch, self._pending = self._pending, []
+            started = time.perf_counter()
+            try:
+                await loop.run_in_executor(self._writer, self._write, b"".join(line for line, _ in batch))
+            except OSError as e:
+                logger.exception("Failed to write the journal")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            journal_fsync_seconds.observe(time.perf_counter() - started)
+            journal_fsync_batch.observe(len(batch))
+            for _, future in batch:
+                # The request may have gone away meanwhile
+                if not future.done():
+                    future.set_result(None)
+
+    def _write(self, data: bytes):
+        # Shared with other writers, exclusive with compaction
+        fcntl.flock(self._fd, fcntl.LOCK_SH)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self._fd, view):]
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.fsync(self._fd)
+
+    def replay(self, apply, batch_size: int) -> int | None:
+        """Pass the next records to apply(records) and move past them; blocking.
+
+        Returns how many records were replayed, or None when another process
+        is replaying. Once everything is replayed the journal is truncated.
+        """
+        with open(self.path + ".lock", "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+
+            offset = self._read_offset()
+            records, end = self._read(offset, batch_size)
+            if records:
+                apply(records)
+            if end != offset:
+                self._write_offset(end)
+            if not records:
+                self._compact(end)
+            return len(records)
+
+    async def run(self, engine: Engine, interval: float, batch_size: int):
+        """Replay the journal whenever the database is reachable again."""
+        while True:
+            await asyncio.sleep(interval)
+            if not self.offline and not self.pending():
+                continue
+            try:
+                await run_blocking(_ping, engine)
+                while await run_blocking(self.replay, lambda records: _apply(engine, records), batch_size):
+                    pass
+            except Exception as e:
+                if not is_disconnect(e):
+                    logger.exception("Failed to replay the journal")
+                continue
+            if self.offline and not self.pending():
+                self.offline = False
+                logger.info("Journal replayed, writing to the database again")
+
+    def _read(self, offset: int, limit: int) -> tuple[list[dict], int]:
+        records = []
+        with open(self.path, "rb") as file:
+            if offset > os.fstat(file.fileno()).st_size:
+                offset = 0
+            file.seek(offset)
+            for line in file:
+                # A record still being written
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    journal_skipped.inc()
+                    logger.error("Skipped an unreadable journal line: %r", line[:200])
+                    continue
+                if len(records) >= limit:
+                    break
+        return records, offset
+
+    def _compact(self, offset: int):
+        with open(self.path, "rb+") as file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            if os.fstat(file.fileno()).st_size != offset or not offset:
+                return
+            # Position first: after a crash in between everything is replayed
+            # again and skipped as already applied, rather than lost
+            self._write_offset(0)
+            file.truncate(0)
+
+    def _read_offset(self) -> int:
+        try:
+            with open(self.offset_path) as file:
+                return int(file.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_offset(self, offset: int):
+        temporary = self.offset_path + ".tmp"
+        with open(temporary, "w") as file:
+            file.write(str(offset))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.offset_path)
+
+
+registry.gauge("journal_offline", "1 while writes go to the local journal", (),
+               lambda: {(): int(journal.offline)})
+
+journal = Journal()
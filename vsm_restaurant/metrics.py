@@ -0,0 +1,189 @@
+import bisect
+import json
+import os
+import threading
+from pathlib import Path
+
+# A minimal in-process registry rendered in the Prometheus text format.
+# With several workers they share their samples through a directory (see
+# Registry.share), so whichever worker is scraped reports the whole app.
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _with_pid(labels: str, pid: int) -> str:
+    return f'{labels[:-1]},pid="{pid}"}}' if labels else f'{{pid="{pid}"}}'
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in values.items():
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Gauge:
+    """A value computed at scrape time by a callback returning {label values: value}."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple, collect):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.collect = collect
+
+    def samples(self):
+        for label_values, value in self.collect().items():
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        names = self.labels + ("le",)
+        for label_values, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield self.name + "_bucket", _format_labels(names, label_values + (bound,)), cumulative
+            yield self.name + "_sum", _format_labels(self.labels, label_values), total
+            yield self.name + "_count", _format_labels(self.labels, label_values), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        # Directory the worker processes share their samples through, None for a single process
+        self.directory = None
+
+    def register(self, metric):
+        # Modules may be reloaded, keep the first instance of a metric
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels, collect):
+        return self.register(Gauge(name, documentation, labels, collect))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def share(self, directory: str):
+        """Render the samples of every process sharing the directory, not only this one's.
+
+        Each process writes its own with dump(), so the others see them as of
+        its last dump. Counters and histograms are summed, including those of
+        exited processes, so the totals don't drop when a worker is replaced;
+        gauges of live processes are reported one per process with a pid label.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def dump(self):
+        """Write this process's samples to the shared directory; blocking."""
+        path = self.directory / f"{os.getpid()}.json"
+        data = {name: list(metric.samples()) for name, metric in self._metrics.items()}
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(data))
+        # Readers see either the previous dump or this one, never a torn file
+        os.replace(temporary, path)
+
+    def _others(self) -> list[tuple[int, dict]]:
+        """(pid, samples by metric) of the other processes' last dumps"""
+        others = []
+        for path in self.directory.glob("*.json"):
+            pid = int(path.stem)
+            if pid == os.getpid():
+                continue
+            try:
+                others.append((pid, json.loads(path.read_text())))
+            except (OSError, ValueError):
+                continue
+        return others
+
+    def render(self) -> str:
+        others = self._others() if self.directory is not None else []
+        alive = {pid for pid, _ in others if _alive(pid)}
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            if self.directory is None:
+                for name, labels, value in metric.samples():
+                    lines.append(f"{name}{labels} {value}")
+            elif metric.type == "gauge":
+                per_process = [(os.getpid(), metric.samples())] + [
+                    (pid, data.get(metric.name, ())) for pid, data in others if pid in alive]
+                for pid, samples in per_process:
+                    for name, labels, value in samples:
+                        lines.append(f"{name}{_with_pid(labels, pid)} {value}")
+            else:
+                # Keyed in the order first seen, so each histogram's series stay together
+                totals = {}
+                for samples in [metric.samples()] + [data.get(metric.name, ()) for _, data in others]:
+                    for name, labels, value in samples:
+                        totals[name, labels] = totals.get((name, labels), 0) + value
+                for (name, labels), value in totals.items():
+                    lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
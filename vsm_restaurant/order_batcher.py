@@ -0,0 +1,84 @@
+import asyncio
+
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+
+from services.errors import ServiceError
+from services.orders import place_orders
+from vsm_restaurant.blocking import run_blocking
+from vsm_restaurant.metrics import registry
+
+batch_size = registry.histogram(
+    "order_group_commit_batch_orders", "Orders placed by one group commit",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200))
+
+
+def _place_batch(engine: Engine, orders: list[tuple]) -> list:
+    # Handlers read the orders after commit
+    with Session(engine, expire_on_commit=False) as session:
+        results = place_orders(session, orders)
+        session.commit()
+    return results
+
+
+class OrderBatcher:
+    """Group commit for order intake.
+
+    Orders arriving within `window` seconds of the first one, up to
+    `max_batch`, are placed in one transaction, so a rush pays one commit
+    per batch instead of one per order. The next batch gathers while the
+    current one is being written. Each caller gets its own order, or its
+    own ServiceError when that order was rejected.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._queue = None
+
+    def start(self, engine: Engine, window: float, max_batch: int) -> asyncio.Task:
+        self._queue = asyncio.Queue()
+        self.enabled = True
+        return asyncio.create_task(self._run(engine, window, max_batch))
+
+    async def place(self, table_number: int, items: list[dict], payment_method: str):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(((table_number, items, payment_method), future))
+        return await future
+
+    async def _run(self, engine: Engine, window: float, max_batch: int):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + window
+            while len(batch) < max_batch:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except TimeoutError:
+                        break
+                else:
+                    batch.append(self._queue.get_nowait())
+
+            batch_size.observe(len(batch))
+            try:
+                results = await run_blocking(_place_batch, engine, [order for order, _ in batch])
+            except Exception as e:
+                # The transaction is rolled back, so none of the orders was placed
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, ServiceError):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+order_batcher = OrderBatcher()
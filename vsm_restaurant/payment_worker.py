@@ -0,0 +1,92 @@
+import asyncio
+import logging
+
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+
+from services import payments
+from vsm_restaurant.acquirer import AcquirerClient, AcquirerError
+from vsm_restaurant.blocking import run_blocking
+from vsm_restaurant.journal import is_disconnect
+from vsm_restaurant.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+webhooks_received = registry.counter(
+    "payment_webhooks_total", "Acquirer webhooks by ingestion result", labels=("result",))
+events_applied = registry.counter(
+    "payment_events_applied_total", "Payment events applied to orders by result", labels=("result",))
+refunds_requested = registry.counter(
+    "payment_refunds_requested_total", "Refunds requested from the acquirer", labels=("result",))
+
+
+def _process_batch(engine: Engine, batch: int) -> dict:
+    with Session(engine) as session:
+        results = payments.process_events(session, batch)
+        session.commit()
+    return results
+
+
+def _refunds_due(engine: Engine) -> list:
+    with Session(engine) as session:
+        return payments.refunds_due(session)
+
+
+def _mark_refund_requested(engine: Engine, order_id: int, payment_id: str):
+    with Session(engine) as session:
+        payments.mark_refund_requested(session, order_id, payment_id)
+        session.commit()
+
+
+class PaymentWorker:
+    """Applies recorded acquirer webhooks to orders and requests the refunds they lead to.
+
+    The webhook endpoint only stores the event and wakes the worker; the
+    worker also polls, so events stored by other processes are picked up too.
+    """
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def run(self, engine: Engine, client: AcquirerClient, interval: float, batch: int):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.drain(engine, batch)
+                await self.request_refunds(engine, client)
+            except Exception as e:
+                # Events wait in the table until the database is back
+                if not is_disconnect(e):
+                    logger.exception("Failed to process payment events")
+
+    async def drain(self, engine: Engine, batch: int):
+        while True:
+            results = await run_blocking(_process_batch, engine, batch)
+            for result, count in results.items():
+                events_applied.inc(result, amount=count)
+                if result == "extra_payment":
+                    logger.warning("%d payments for already paid orders need a manual refund", count)
+            if sum(results.values()) < batch:
+                return
+
+    async def request_refunds(self, engine: Engine, client: AcquirerClient):
+        for order in await run_blocking(_refunds_due, engine):
+            try:
+                await client.refund(order.payment_id, order.total_amount)
+            except AcquirerError as e:
+                # Stays refund_pending and is retried on the next pass
+                refunds_requested.inc("error")
+                logger.warning("Refund for order %d: %s", order.id, e)
+                continue
+            refunds_requested.inc("requested")
+            await run_blocking(_mark_refund_requested, engine, order.id, order.payment_id)
+
+
+payment_worker = PaymentWorker()
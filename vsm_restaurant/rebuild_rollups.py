@@ -0,0 +1,39 @@
+"""Rebuild the hourly order and sales rollups from the order history.
+
+    python -m vsm_restaurant.rebuild_rollups [--db-url ...]
+
+Recomputes order_rollup_hourly and sales_rollup_hourly from the orders on
+the sync engine, in one transaction, for a new deployment or after a
+backfill of old orders. Safe to run while the app serves orders: they wait
+for the rebuild and add their own counts after it. Uses DB_URL from the
+settings unless --db-url is given.
+"""
+import argparse
+import sys
+
+from sqlalchemy.orm import Session
+
+from services import rollups
+from vsm_restaurant.db import create_db_engine
+from vsm_restaurant.settings import Settings
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", help="database to rebuild; DB_URL of the settings if omitted")
+    args = parser.parse_args(argv)
+
+    settings = Settings(**({"db_url": args.db_url} if args.db_url else {}))
+    engine = create_db_engine(settings, "rollups")
+    try:
+        with Session(engine) as session:
+            order_rows, sales_rows = rollups.rebuild(session)
+            session.commit()
+    finally:
+        engine.dispose()
+    print(f"Rebuilt {order_rows} order rollup rows and {sales_rows} sales rollup rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from vsm_restaurant.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Wall-clock time of each startup phase, logged once the app is ready."""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def report(self):
+        total = sum(self.phases.values())
+        details = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases.items())
+        logger.info("Started in %.0f ms: %s", total * 1000, details)
+
+
+startup_timer = StartupTimer()
+
+registry.gauge("startup_phase_seconds", "Duration of each phase of the last startup", ("phase",),
+               lambda: {(name,): seconds for name, seconds in startup_timer.phases.items()})
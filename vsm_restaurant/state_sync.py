@@ -0,0 +1,150 @@
+import asyncio
+import logging
+
+from sqlalchemy import Engine, event, make_url
+from sqlalchemy.orm import Session
+
+from services.state import TRACKED_TABLES, apply_changes, load_state
+from vsm_restaurant.blocking import run_blocking
+from vsm_restaurant.journal import is_disconnect
+from vsm_restaurant.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "state_changes"
+# With no announcements for this long the listening connection is pinged, seconds
+IDLE_PING_INTERVAL = 30.0
+
+state_changes_applied = registry.counter(
+    "state_sync_rows_total", "Rows changed by other processes and re-read into the in-memory indexes",
+    labels=("table",))
+state_rebuilds = registry.counter(
+    "state_sync_rebuilds_total", "Full rebuilds of the in-memory indexes after the listening connection was lost")
+
+
+def _rebuild(engine: Engine):
+    with Session(engine) as session:
+        load_state(session)
+
+
+def _apply(engine: Engine, changes: dict):
+    with Session(engine) as session:
+        apply_changes(session, changes)
+
+
+class StateSync:
+    """Keeps availability, recipe costs and the kitchen schedule in step with other processes.
+
+    Triggers on the tracked tables announce the ids of changed rows on commit
+    (PostgreSQL NOTIFY). Every process listens on a connection of its own,
+    skips rows written through its own pools, which on_commit has already
+    applied, and re-reads only the rows others changed. Whatever was announced
+    while the listening connection was down is covered by one full rebuild
+    after reconnecting.
+    """
+
+    def __init__(self):
+        # Backend PIDs of this process's own connections
+        self.own_pids = set()
+        self._conninfo = None
+        self._connect_timeout = None
+        self._connection = None
+
+    @property
+    def listening(self) -> bool:
+        return self._connection is not None
+
+    def track(self, engine: Engine):
+        """Remember the backends of the engine's connections, so their changes aren't re-read."""
+        if engine.dialect.name != "postgresql":
+            return
+
+        @event.listens_for(engine, "connect")
+        def remember(dbapi_connection, connection_record):
+            pid = getattr(dbapi_connection, "driver_connection", dbapi_connection).info.backend_pid
+            connection_record.info["backend_pid"] = pid
+            self.own_pids.add(pid)
+
+        @event.listens_for(engine, "close")
+        def forget(dbapi_connection, connection_record):
+            self.own_pids.discard(connection_record.info.pop("backend_pid", None))
+
+    async def listen(self, db_url: str, connect_timeout: int):
+        """Start listening before the indexes are built, so no change falls in between."""
+        url = make_url(db_url)
+        if url.get_backend_name() != "postgresql":
+            return
+        self._conninfo = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self._connect_timeout = connect_timeout
+        await self._connect()
+
+    async def run(self, engine: Engine, delay: float, retry_interval: float = 1.0):
+        while True:
+            try:
+                if self._connection is None:
+                    await self._connect()
+                    # Announcements made while nobody listened are gone
+                    await run_blocking(_rebuild, engine)
+                    state_rebuilds.inc()
+                changes = await self._collect(delay)
+                await run_blocking(_apply, engine, changes)
+            except Exception as e:
+                if not is_disconnect(e) and not self._is_listener_error(e):
+                    logger.exception("Failed to sync in-memory state")
+                await self._close()
+                await asyncio.sleep(retry_interval)
+                continue
+            for table, ids in changes.items():
+                state_changes_applied.inc(table, amount=len(ids))
+
+    async def close(self):
+        await self._close()
+
+    async def _collect(self, delay: float) -> dict:
+        """Wait for changes from another process, then gather what arrives within delay."""
+        changes = {}
+        while not changes:
+            received = False
+            # Never break out of notifies(): the rest of an already received packet would be lost.
+            # stop_after ends the wait only once the whole packet is yielded
+            async for notify in self._connection.notifies(timeout=IDLE_PING_INTERVAL, stop_after=1):
+                received = True
+                self._add(notify, changes)
+            if not received:
+                # A connection dropped without a FIN would otherwise be waited on forever
+                await self._connection.execute("SELECT 1")
+        async for notify in self._connection.notifies(timeout=delay):
+            self._add(notify, changes)
+        return changes
+
+    def _add(self, notify, changes: dict):
+        if notify.pid in self.own_pids:
+            return
+        table, _, row_id = notify.payload.partition(":")
+        if table in TRACKED_TABLES:
+            changes.setdefault(table, set()).add(int(row_id))
+
+    async def _connect(self):
+        import psycopg
+
+        self._connection = await psycopg.AsyncConnection.connect(
+            self._conninfo, autocommit=True, connect_timeout=self._connect_timeout)
+        await self._connection.execute(f"LISTEN {CHANNEL}")
+
+    async def _close(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                await connection.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _is_listener_error(error: BaseException) -> bool:
+        # The listening connection is plain psycopg, outside SQLAlchemy
+        import psycopg
+
+        return isinstance(error, psycopg.OperationalError)
+
+
+state_sync = StateSync()
@@ -1,19 +1,64 @@
 import logging
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import exc
 
-from vsm_restaurant.dependencies import lifespan
+from services.errors import ServiceError
+from vsm_restaurant.db.routing import ReadYourWritesMiddleware
+from vsm_restaurant.dependencies import lifespan, settings
+from vsm_restaurant.instrumentation import RequestTimingMiddleware, configure_slow_query_log
+# Aliased: the .journal routes submodule takes the package attribute of that name
+from vsm_restaurant.journal import is_disconnect, journal as write_journal
 
+from .availability import router as availability_router
 from .demo import router as demo_router
+from .journal import router as journal_router
+from .kitchen import router as kitchen_router
+from .menu import router as menu_router
+from .metrics import router as metrics_router
+from .orders import router as orders_router
+from .payments import router as payments_router
+from .products import router as products_router
+from .supplier import router as supplier_router
 
 logger = logging.getLogger(__name__)
 
 media_location_prefix = "/media/"
 app = FastAPI(lifespan=lifespan)
+if settings.db_replica_urls:
+    app.add_middleware(ReadYourWritesMiddleware, window=settings.db_read_your_writes_window)
+# Outermost, so the latency covers the whole request
+app.add_middleware(RequestTimingMiddleware)
+configure_slow_query_log(settings.slow_query_threshold, settings.slow_query_log_path)
 
 app.include_router(demo_router)
+app.include_router(availability_router)
+app.include_router(menu_router)
+app.include_router(orders_router)
+app.include_router(payments_router)
+app.include_router(journal_router)
+app.include_router(products_router)
+app.include_router(supplier_router)
+app.include_router(kitchen_router)
+app.include_router(metrics_router)
+
+
+@app.exception_handler(ServiceError)
+async def handle_service_error(request: Request, error: ServiceError):
+    # The session dependency rolls the transaction back when the handler fails
+    return JSONResponse(error.to_dict(), status_code=error.status_code)
+
+
+@app.exception_handler(exc.DBAPIError)
+async def handle_database_error(request: Request, error: exc.DBAPIError):
+    if not is_disconnect(error):
+        raise error
+    # Reads fail until the database is back; writes go to the journal meanwhile
+    write_journal.go_offline()
+    return JSONResponse({"error": "Database is unavailable"}, status_code=503)
+
 
 @app.get("/")
 async def root():
     return "Hello world"
-
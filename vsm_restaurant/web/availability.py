@@ -0,0 +1,39 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from vsm_restaurant.availability_hub import hub
+from vsm_restaurant.dependencies import get_settings
+from vsm_restaurant.settings import Settings
+
+router = APIRouter()
+
+
+@router.get("/api/menu/availability/stream")
+async def stream_availability(request: Request, settings: Settings = Depends(get_settings)):
+    """Server-sent events with menu availability deltas (menu_item_id, available, missing_ingredients)."""
+    queue = hub.subscribe()
+
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    delta = await asyncio.wait_for(queue.get(), timeout=settings.availability_stream_heartbeat)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comment line keeps idle connections open through proxies
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: availability\ndata: {json.dumps(delta)}\n\n"
+        finally:
+            hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -5,7 +5,7 @@ from sqlmodel import select, desc
 
 from vsm_restaurant.db import DemoModel
 from vsm_restaurant.db.demo import DemoEnumType
-from vsm_restaurant.dependencies import SessionDep
+from vsm_restaurant.dependencies import AsyncSessionDep
 
 router = APIRouter()
 
@@ -14,8 +14,8 @@ router = APIRouter()
 # So that you can map and validate enums, for example.
 
 @router.get("/demo/recent")
-async def list_demos(session: SessionDep, limit: int = 100, days: int = 7):
-    demos = session.exec(
+async def list_demos(session: AsyncSessionDep, limit: int = 100, days: int = 7):
+    demos = await session.exec(
         select(DemoModel).where(DemoModel.timestamp > datetime.now() - timedelta(days=days))
         .order_by(desc(DemoModel.timestamp))
         .limit(limit)
@@ -24,13 +24,13 @@ async def list_demos(session: SessionDep, limit: int = 100, days: int = 7):
 
 
 @router.post("/demo/create")
-async def list_demos(session: SessionDep, model: DemoModel):
+async def create_demo(session: AsyncSessionDep, model: DemoModel):
     if model.timestamp is None:
         model.timestamp = datetime.now()
     if type(model.demo_enum) is str:
         model.demo_enum = DemoEnumType[model.demo_enum]
     session.add(model)
-    session.commit()
+    await session.commit()
     # Commit clears the model state, so we need to refresh it
-    session.refresh(model)
+    await session.refresh(model)
     return model
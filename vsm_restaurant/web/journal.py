@@ -0,0 +1,37 @@
+from fastapi import APIRouter
+from sqlalchemy import exc
+
+from services.errors import NotFound
+from services.journal import replay_status
+from vsm_restaurant.blocking import run_blocking
+from vsm_restaurant.dependencies import AsyncSessionDep
+from vsm_restaurant.journal import is_disconnect, journal
+
+router = APIRouter(prefix="/api")
+
+
+@router.get("/journal/{key}")
+async def get_journal_record(key: str, session: AsyncSessionDep):
+    """What became of an order or a supply batch accepted offline."""
+    try:
+        replay = await session.run_sync(replay_status, key)
+    except exc.DBAPIError as e:
+        if not is_disconnect(e):
+            raise
+        replay = None
+
+    if replay is None:
+        if await run_blocking(journal.contains, key):
+            return {"key": key, "status": "queued"}
+        raise NotFound(f"Journal record {key} not found")
+
+    return {
+        "key": replay.key,
+        "kind": replay.kind,
+        # applied or rejected
+        "status": replay.outcome,
+        "order_id": replay.order_id,
+        "detail": replay.detail,
+        "recorded_at": replay.recorded_at.isoformat(),
+        "replayed_at": replay.replayed_at.isoformat()
+    }
@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Query
+from pydantic import BaseModel, Field
+
+from services import kitchen
+from services.errors import ServiceError
+from services.scheduler import kitchen_scheduler
+from vsm_restaurant.dependencies import AsyncSessionDep
+
+router = APIRouter(prefix="/api")
+
+MAX_CLAIM = 20
+
+
+class TaskClaim(BaseModel):
+    worker: str = Field(min_length=1)
+    stage: str = "cooking"
+    limit: int = Field(1, ge=1, le=MAX_CLAIM)
+
+
+class TaskCompletion(BaseModel):
+    worker: str
+
+
+class StationsUpdate(BaseModel):
+    stations: int = Field(ge=1)
+
+
+@router.get("/kitchen/tasks")
+async def get_tasks(
+    session: AsyncSessionDep,
+    status: str = "queued",
+    limit: int = Query(50, ge=1, le=500),
+):
+    if status not in kitchen.TASK_FLOW + ("cancelled",):
+        raise ServiceError(f"Invalid status. Must be one of: {', '.join(kitchen.TASK_FLOW)}")
+
+    tasks = await session.run_sync(kitchen.list_tasks, status, limit)
+    return [_serialize_task(task) for task in tasks]
+
+
+@router.post("/kitchen/tasks/claim")
+async def claim_tasks(data: TaskClaim, session: AsyncSessionDep):
+    """Take the next tasks: cooks take them to cooking, conductors to delivering."""
+    tasks = await session.run_sync(kitchen.claim_tasks, data.worker, data.stage, data.limit)
+    await session.commit()
+
+    return [_serialize_task(task) for task in tasks]
+
+
+@router.post("/kitchen/tasks/{task_id}/complete")
+async def complete_task(task_id: int, data: TaskCompletion, session: AsyncSessionDep):
+    status = await session.run_sync(kitchen.complete_task, task_id, data.worker)
+    await session.commit()
+
+    return {"id": task_id, "status": status}
+
+
+@router.get("/kitchen/queue")
+async def get_queue_summary(session: AsyncSessionDep):
+    return {
+        "tasks": await session.run_sync(kitchen.queue_summary),
+        "stations": kitchen_scheduler.stations,
+        "backlog_minutes": kitchen_scheduler.backlog().total_seconds() / 60
+    }
+
+
+@router.put("/kitchen/stations")
+async def set_stations(data: StationsUpdate, session: AsyncSessionDep):
+    """Number of working stations, used to predict order ready times.
+
+    Stored in the database, so every worker picks it up; the kitchen_stations setting is the default until then.
+    """
+    await session.run_sync(kitchen.set_stations, data.stations)
+    await session.commit()
+    return {"stations": data.stations}
+
+
+def _serialize_task(task):
+    return {
+        "id": task.id,
+        "order_id": task.order_id,
+        "order_item_id": task.order_item_id,
+        "menu_item_id": task.menu_item_id,
+        "status": task.status,
+        "order_created_at": task.order_created_at.isoformat(),
+        "cooking_time": task.cooking_time,
+        "assignee": task.assignee
+    }
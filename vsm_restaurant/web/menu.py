@@ -0,0 +1,123 @@
+import json
+
+from fastapi import APIRouter, Request, Response
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from models import MenuItem, MenuItemIngredient
+from services.availability import availability_index
+from services.errors import NotFound
+from services.menu_cache import menu_cache
+from services.recipe_costs import menu_costs, recipe_costs
+from services.transaction import on_commit
+from vsm_restaurant.dependencies import AsyncSessionDep, ReadSessionDep
+
+router = APIRouter(prefix="/api")
+
+
+class IngredientCreate(BaseModel):
+    product_id: int
+    quantity_required: float
+
+
+@router.get("/menu")
+async def get_menu(request: Request, session: AsyncSessionDep, category_id: int | None = None):
+    # The serialized menu is rebuilt only after menu or availability changes. It stays on
+    # the primary: the rebuild follows a write and is cached until the next one, so a
+    # lagging replica would pin a stale menu
+    body, etag = await menu_cache.aget(category_id, lambda: _menu_body(session, category_id))
+
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@router.get("/menu/costs")
+async def get_menu_costs(session: ReadSessionDep):
+    """Food cost, margin and the portions current stock allows, for every dish."""
+    # Plain values only, so skip the response encoder: for thousands of dishes it costs more than the report
+    return Response(json.dumps(await session.run_sync(menu_costs)), media_type="application/json")
+
+
+@router.post("/menu/{item_id}/ingredients", status_code=201)
+async def add_ingredient_to_item(item_id: int, data: IngredientCreate, session: AsyncSessionDep):
+    if await session.get(MenuItem, item_id) is None:
+        raise NotFound(f"Menu item {item_id} not found")
+
+    ingredient = MenuItemIngredient(
+        menu_item_id=item_id,
+        product_id=data.product_id,
+        quantity_required=data.quantity_required
+    )
+    session.add(ingredient)
+    await session.flush()
+    on_commit(session, availability_index.add_ingredient,
+              ingredient.id, item_id, ingredient.product_id, ingredient.quantity_required)
+    on_commit(session, recipe_costs.add_ingredient,
+              ingredient.id, item_id, ingredient.product_id, ingredient.quantity_required)
+    await session.commit()
+
+    return {"message": "Ingredient added"}
+
+
+@router.delete("/menu/{item_id}/ingredients/{ingredient_id}")
+async def remove_ingredient_from_item(item_id: int, ingredient_id: int, session: AsyncSessionDep):
+    ingredient = await session.scalar(
+        select(MenuItemIngredient).where(
+            MenuItemIngredient.id == ingredient_id,
+            MenuItemIngredient.menu_item_id == item_id
+        )
+    )
+    if ingredient is None:
+        raise NotFound(f"Ingredient {ingredient_id} not found")
+
+    on_commit(session, availability_index.remove_ingredient, ingredient.id)
+    on_commit(session, recipe_costs.remove_ingredient, ingredient.id)
+    await session.delete(ingredient)
+    await session.commit()
+
+    return {"message": "Ingredient removed"}
+
+
+@router.get("/menu/{item_id}/availability")
+async def check_availability(item_id: int, session: ReadSessionDep):
+    menu_item = await session.get(MenuItem, item_id)
+    if menu_item is None:
+        raise NotFound(f"Menu item {item_id} not found")
+
+    return {
+        "item_id": menu_item.id,
+        "item_name": menu_item.name,
+        "is_available": availability_index.is_available(menu_item.id),
+        "missing_ingredients": availability_index.get_missing_ingredients(menu_item.id)
+    }
+
+
+async def _menu_body(session, category_id):
+    query = select(MenuItem).options(joinedload(MenuItem.category))
+    if category_id is not None:
+        query = query.where(MenuItem.category_id == category_id)
+    menu_items = (await session.scalars(query)).all()
+
+    return json.dumps([{
+        "id": item.id,
+        "name": item.name,
+        "description": item.description,
+        "price": item.price,
+        "category_id": item.category_id,
+        "category_name": item.category.name if item.category else None,
+        "image_url": item.image_url,
+        "cooking_time": item.cooking_time,
+        "is_available": item.is_available and availability_index.is_available(item.id),
+        "ingredients": availability_index.get_ingredients(item.id),
+        "missing_ingredients": availability_index.get_missing_ingredients(item.id)
+    } for item in menu_items]).encode()
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or f'"{etag}"' in tags
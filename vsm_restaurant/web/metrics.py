@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from vsm_restaurant.metrics import registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint; with METRICS_DIR it covers every worker process."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
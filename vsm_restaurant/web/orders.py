@@ -0,0 +1,256 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import and_, exc, or_, select
+from sqlalchemy.orm import selectinload
+
+from models import MenuItem, Order, OrderItem
+from services import payments, rollups
+from services.errors import NotFound, ServiceError
+from services.orders import cancel_order as cancel_order_service, place_order, set_order_status
+from services.scheduler import kitchen_scheduler
+from services.stats import BUCKETS, naive_utc, order_stats
+from vsm_restaurant.dependencies import AsyncSessionDep, ReadSessionDep
+from vsm_restaurant.journal import is_disconnect, journal
+from vsm_restaurant.order_batcher import order_batcher
+
+router = APIRouter(prefix="/api")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+ORDER_STATUSES = ("pending", "in_progress", "completed", "cancelled")
+
+
+class OrderLine(BaseModel):
+    menu_item_id: int
+    quantity: int = Field(gt=0)
+
+
+class OrderCreate(BaseModel):
+    table_number: int
+    items: list[OrderLine]
+    payment_method: str = "cash"
+
+
+class OrderStatusUpdate(BaseModel):
+    status: str
+
+
+@router.get("/orders")
+async def get_orders(
+    session: AsyncSessionDep,
+    status: str | None = None,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    query = select(Order)
+    if status:
+        query = query.where(Order.status == status)
+
+    return await _paginated_orders(session, query, cursor, limit, lambda order: {
+        "id": order.id,
+        "table_number": order.table_number,
+        "status": order.status,
+        "total_amount": order.total_amount,
+        "payment_method": order.payment_method,
+        "payment_status": order.payment_status,
+        "created_at": order.created_at.isoformat(),
+        "updated_at": order.updated_at.isoformat(),
+        "items": [{
+            "id": item.id,
+            "menu_item_id": item.menu_item_id,
+            "menu_item_name": item.menu_item.name,
+            "quantity": item.quantity,
+            "price": item.price
+        } for item in order.order_items]
+    })
+
+
+@router.post("/orders", status_code=201)
+async def create_order(data: OrderCreate, session: AsyncSessionDep):
+    payments.check_payment_method(data.payment_method)
+    items = [item.model_dump() for item in data.items]
+    if not journal.offline:
+        try:
+            if order_batcher.enabled:
+                # Placed and committed together with the orders that arrive alongside
+                order = await order_batcher.place(data.table_number, items, data.payment_method)
+            else:
+                order = await session.run_sync(place_order, data.table_number, items, data.payment_method)
+                await session.commit()
+        except exc.DBAPIError as e:
+            if not is_disconnect(e):
+                raise
+            journal.go_offline()
+        else:
+            return {
+                "message": "Order created successfully",
+                "order_id": order.id,
+                "total_amount": order.total_amount,
+                "payment_status": order.payment_status
+            }
+
+    # The database is unreachable: keep the order locally, it's placed once the database is back
+    key = await journal.append("order", data.model_dump())
+    return JSONResponse({
+        "message": "Order accepted offline",
+        "journal_key": key,
+        "status": "queued"
+    }, status_code=202)
+
+
+@router.get("/orders/stats")
+async def get_order_stats(
+    session: ReadSessionDep,
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to"),
+    bucket: str = "hour",
+    top: int = Query(5, ge=1, le=50),
+):
+    now = datetime.utcnow()
+    # Stored times are naive UTC, so "Z" or "+03:00" in the query is converted to that
+    start = naive_utc(start) or datetime(now.year, now.month, now.day)
+    end = naive_utc(end) or now
+
+    if bucket not in BUCKETS:
+        raise ServiceError(f"Invalid bucket. Must be one of: {', '.join(BUCKETS)}")
+    if start >= end:
+        raise ServiceError("'from' must be earlier than 'to'")
+
+    # Hour-aligned windows are served from the rollups, the rest from orders
+    stats_source = rollups.order_stats if rollups.covers(start, end, BUCKETS[bucket]) else order_stats
+    stats = await session.run_sync(stats_source, start, end, BUCKETS[bucket], top)
+
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "bucket": bucket,
+        **stats
+    }
+
+
+@router.get("/orders/table/{table_number}")
+async def get_orders_by_table(
+    table_number: int,
+    session: AsyncSessionDep,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    query = select(Order).where(Order.table_number == table_number)
+
+    return await _paginated_orders(session, query, cursor, limit, lambda order: {
+        "id": order.id,
+        "table_number": order.table_number,
+        "status": order.status,
+        "total_amount": order.total_amount,
+        "created_at": order.created_at.isoformat(),
+        "items": [{
+            "menu_item_name": item.menu_item.name,
+            "quantity": item.quantity,
+            "price": item.price
+        } for item in order.order_items]
+    })
+
+
+@router.get("/orders/{order_id}")
+async def get_order(order_id: int, session: AsyncSessionDep):
+    order = await session.get(Order, order_id, options=[
+        selectinload(Order.order_items).joinedload(OrderItem.menu_item).load_only(MenuItem.name)
+    ])
+    if order is None:
+        raise NotFound(f"Order {order_id} not found")
+    eta = kitchen_scheduler.order_eta(order.id)
+
+    return {
+        "id": order.id,
+        "table_number": order.table_number,
+        "status": order.status,
+        "total_amount": order.total_amount,
+        "payment_method": order.payment_method,
+        "payment_status": order.payment_status,
+        "created_at": order.created_at.isoformat(),
+        "updated_at": order.updated_at.isoformat(),
+        "estimated_ready_at": eta.isoformat() if eta else None,
+        "items": [{
+            "id": item.id,
+            "menu_item_id": item.menu_item_id,
+            "menu_item_name": item.menu_item.name,
+            "quantity": item.quantity,
+            "price": item.price,
+            "subtotal": item.quantity * item.price
+        } for item in order.order_items]
+    }
+
+
+@router.put("/orders/{order_id}/status")
+async def update_order_status(order_id: int, data: OrderStatusUpdate, session: AsyncSessionDep):
+    if data.status not in ORDER_STATUSES:
+        raise ServiceError(f"Invalid status. Must be one of: {', '.join(ORDER_STATUSES)}")
+
+    # Cancelling returns the ingredients to stock
+    if data.status == "cancelled":
+        await session.run_sync(cancel_order_service, order_id)
+    else:
+        await session.run_sync(set_order_status, order_id, data.status)
+    await session.commit()
+
+    return {"message": f"Order status updated to {data.status}"}
+
+
+@router.delete("/orders/{order_id}")
+async def cancel_order(order_id: int, session: AsyncSessionDep):
+    if not await session.run_sync(cancel_order_service, order_id):
+        raise ServiceError("Order is already cancelled")
+    await session.commit()
+
+    return {"message": "Order cancelled and ingredients restored"}
+
+
+async def _paginated_orders(session, query, cursor, limit, serialize):
+    """A page of orders, newest first, by a (created_at, id) keyset cursor, as a streamed JSON array.
+
+    Orders, their items and dish names take exactly two queries. The cursor
+    of the next page is returned in the X-Next-Cursor header.
+    """
+    if cursor:
+        created_at, order_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            Order.created_at < created_at,
+            and_(Order.created_at == created_at, Order.id < order_id)
+        ))
+
+    orders = (await session.scalars(
+        query.options(
+            selectinload(Order.order_items).joinedload(OrderItem.menu_item).load_only(MenuItem.name)
+        ).order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1)
+    )).all()
+
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+
+    # Everything is loaded already, so the body is written order by order without the session
+    async def generate():
+        yield "["
+        for i, order in enumerate(orders):
+            yield ("," if i else "") + json.dumps(serialize(order), separators=(",", ":"))
+        yield "]"
+
+    headers = {"X-Next-Cursor": _encode_cursor(orders[-1])} if has_more else None
+    return StreamingResponse(generate(), media_type="application/json", headers=headers)
+
+
+def _encode_cursor(order):
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except ValueError:
+        raise ServiceError("Invalid cursor")
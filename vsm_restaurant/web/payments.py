@@ -0,0 +1,72 @@
+import json
+
+from fastapi import APIRouter, Depends, Request
+from pydantic import BaseModel
+
+from services import payments
+from services.errors import ServiceError
+from vsm_restaurant.acquirer import AcquirerError
+from vsm_restaurant.dependencies import AsyncSessionDep, get_settings
+from vsm_restaurant.payment_worker import payment_worker, webhooks_received
+from vsm_restaurant.settings import Settings
+
+router = APIRouter(prefix="/api")
+
+
+class PaymentMethodUpdate(BaseModel):
+    payment_method: str
+
+
+@router.post("/payments/webhook")
+async def payment_webhook(request: Request, session: AsyncSessionDep, settings: Settings = Depends(get_settings)):
+    # The signature covers the exact bytes sent, so verify before parsing
+    body = await request.body()
+    if not payments.verify_signature(settings.acquirer_webhook_secret, body, request.headers.get("X-Signature")):
+        webhooks_received.inc("bad_signature")
+        raise ServiceError("Invalid signature", status_code=401)
+    try:
+        event = json.loads(body)
+    except ValueError:
+        webhooks_received.inc("invalid")
+        raise ServiceError("Invalid JSON")
+
+    # Only store the event here: the acquirer gets its 200 after one insert,
+    # and the payment worker applies it to the order
+    try:
+        is_new = await session.run_sync(payments.record_event, event)
+    except ServiceError:
+        webhooks_received.inc("invalid")
+        raise
+    await session.commit()
+
+    if is_new:
+        payment_worker.wake()
+    status = "accepted" if is_new else "duplicate"
+    webhooks_received.inc(status)
+    return {"status": status}
+
+
+@router.post("/orders/{order_id}/payment")
+async def start_payment(
+    order_id: int, request: Request, session: AsyncSessionDep, settings: Settings = Depends(get_settings)
+):
+    order = await session.run_sync(payments.payable_order, order_id)
+    # Don't hold a transaction open while waiting for the acquirer
+    await session.rollback()
+    try:
+        payment = await request.app.state.acquirer.create_payment(
+            order.id, order.total_amount, settings.payment_webhook_url)
+    except AcquirerError as e:
+        raise ServiceError(str(e), status_code=502)
+
+    await session.run_sync(payments.attach_payment, order_id, payment["payment_id"])
+    await session.commit()
+    return payment
+
+
+@router.put("/orders/{order_id}/payment-method")
+async def update_payment_method(order_id: int, data: PaymentMethodUpdate, session: AsyncSessionDep):
+    await session.run_sync(payments.switch_to_postpayment, order_id, data.payment_method)
+    await session.commit()
+
+    return {"message": f"Payment method changed to {data.payment_method}"}
@@ -0,0 +1,176 @@
+from datetime import datetime
+
+from fastapi import APIRouter
+from pydantic import BaseModel
+from sqlalchemy import exists, select
+from sqlalchemy.orm import selectinload
+
+from models import MenuItemIngredient, Product, ProductSupply
+from services.availability import availability_index
+from services.errors import NotFound, ServiceError
+from services.recipe_costs import recipe_costs
+from services.stock import apply_stock_delta
+from services.transaction import on_commit
+from vsm_restaurant.dependencies import AsyncSessionDep, ReadSessionDep
+
+router = APIRouter(prefix="/api")
+
+
+class ProductCreate(BaseModel):
+    name: str
+    unit: str
+    current_stock: float = 0
+    min_stock: float = 0
+    cost_per_unit: float = 0
+
+
+class ProductUpdate(BaseModel):
+    name: str | None = None
+    unit: str | None = None
+    min_stock: float | None = None
+    cost_per_unit: float | None = None
+
+
+class SupplyCreate(BaseModel):
+    quantity: float
+    supplier_name: str | None = None
+    cost: float | None = None
+    batch_number: str | None = None
+
+
+@router.get("/products")
+async def get_products(session: AsyncSessionDep):
+    products = (await session.scalars(select(Product))).all()
+    return [{
+        "id": p.id,
+        "name": p.name,
+        "unit": p.unit,
+        "current_stock": p.current_stock,
+        "min_stock": p.min_stock,
+        "cost_per_unit": p.cost_per_unit,
+        "created_at": p.created_at.isoformat(),
+        "is_low_stock": p.current_stock <= p.min_stock
+    } for p in products]
+
+
+@router.post("/products", status_code=201)
+async def create_product(data: ProductCreate, session: AsyncSessionDep):
+    product = Product(**data.model_dump())
+    session.add(product)
+    await session.flush()
+    on_commit(session, availability_index.set_product,
+              product.id, product.name, product.unit, product.current_stock)
+    on_commit(session, recipe_costs.set_product_cost, product.id, product.cost_per_unit)
+    await session.commit()
+
+    return {"message": "Product created", "id": product.id}
+
+
+@router.get("/products/low-stock")
+async def get_low_stock_products(session: AsyncSessionDep):
+    products = (await session.scalars(
+        select(Product).where(Product.current_stock <= Product.min_stock)
+    )).all()
+    return [{
+        "id": p.id,
+        "name": p.name,
+        "unit": p.unit,
+        "current_stock": p.current_stock,
+        "min_stock": p.min_stock,
+        "needed": p.min_stock - p.current_stock
+    } for p in products]
+
+
+@router.get("/products/stock-report")
+async def get_stock_report(session: ReadSessionDep):
+    products = (await session.scalars(select(Product))).all()
+
+    return {
+        "total_products": len(products),
+        "low_stock_count": sum(1 for p in products if p.current_stock <= p.min_stock),
+        "total_inventory_value": sum(p.current_stock * p.cost_per_unit for p in products),
+        "products": [{
+            "id": p.id,
+            "name": p.name,
+            "current_stock": p.current_stock,
+            "min_stock": p.min_stock,
+            "unit": p.unit,
+            "value": p.current_stock * p.cost_per_unit,
+            "status": "low" if p.current_stock <= p.min_stock else "normal"
+        } for p in products]
+    }
+
+
+@router.get("/products/{product_id}")
+async def get_product(product_id: int, session: AsyncSessionDep):
+    product = await session.get(Product, product_id, options=[selectinload(Product.supplies)])
+    if product is None:
+        raise NotFound(f"Product {product_id} not found")
+
+    return {
+        "id": product.id,
+        "name": product.name,
+        "unit": product.unit,
+        "current_stock": product.current_stock,
+        "min_stock": product.min_stock,
+        "cost_per_unit": product.cost_per_unit,
+        "created_at": product.created_at.isoformat(),
+        "supplies": [{
+            "id": s.id,
+            "quantity": s.quantity,
+            "supply_date": s.supply_date.isoformat(),
+            "supplier_name": s.supplier_name,
+            "cost": s.cost,
+            "batch_number": s.batch_number
+        } for s in product.supplies]
+    }
+
+
+@router.put("/products/{product_id}")
+async def update_product(product_id: int, data: ProductUpdate, session: AsyncSessionDep):
+    product = await session.get(Product, product_id)
+    if product is None:
+        raise NotFound(f"Product {product_id} not found")
+
+    for name, value in data.model_dump(exclude_none=True).items():
+        setattr(product, name, value)
+    product.updated_at = datetime.utcnow()
+    on_commit(session, availability_index.set_product,
+              product.id, product.name, product.unit, product.current_stock)
+    on_commit(session, recipe_costs.set_product_cost, product.id, product.cost_per_unit)
+    await session.commit()
+
+    return {"message": "Product updated"}
+
+
+@router.delete("/products/{product_id}")
+async def delete_product(product_id: int, session: AsyncSessionDep):
+    product = await session.get(Product, product_id)
+    if product is None:
+        raise NotFound(f"Product {product_id} not found")
+
+    if await session.scalar(select(exists().where(MenuItemIngredient.product_id == product_id))):
+        raise ServiceError("Cannot delete product that is used in menu items")
+
+    on_commit(session, availability_index.remove_product, product.id)
+    on_commit(session, recipe_costs.remove_product, product.id)
+    await session.delete(product)
+    await session.commit()
+
+    return {"message": "Product deleted"}
+
+
+@router.post("/products/{product_id}/supply")
+async def add_product_supply(product_id: int, data: SupplyCreate, session: AsyncSessionDep):
+    product = await session.get(Product, product_id)
+    if product is None:
+        raise NotFound(f"Product {product_id} not found")
+
+    session.add(ProductSupply(product_id=product_id, supply_date=datetime.utcnow(), **data.model_dump()))
+    # Atomic increment instead of read-modify-write on the loaded row
+    new_stock = await session.run_sync(apply_stock_delta, {product_id: data.quantity})
+    on_commit(session, availability_index.update_stock, new_stock)
+    await session.commit()
+
+    # A zero quantity updates nothing
+    return {"message": "Supply added", "new_stock": new_stock.get(product_id, product.current_stock)}
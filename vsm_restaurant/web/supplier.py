@@ -0,0 +1,263 @@
+import codecs
+import csv
+import io
+import tempfile
+from datetime import datetime, timedelta
+from itertools import islice
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Engine, exc, select
+from sqlalchemy.orm import Session, joinedload
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import Product, ProductSupply
+from services.errors import ServiceError
+from services.supplier_report import month_start, next_month_start, supplier_product_breakdown, supplier_totals
+from services.supplies import ingest_supplies, parse_csv, parse_ndjson
+from vsm_restaurant.blocking import run_blocking
+from vsm_restaurant.dependencies import AsyncSessionDep, ReadSessionDep, get_engine
+from vsm_restaurant.journal import is_disconnect, journal
+
+router = APIRouter(prefix="/api")
+
+TOTALS_CSV_FIELDS = ["supplier_name", "total_quantity", "total_cost", "supply_count", "products"]
+BREAKDOWN_CSV_FIELDS = [
+    "supplier_name", "product_id", "product_name", "unit",
+    "total_quantity", "total_cost", "supply_count"
+]
+# Uploads larger than this are spooled to a temporary file
+IMPORT_SPOOL_SIZE = 1024 * 1024
+# Report rows pulled from the database per step while a CSV report is streamed
+REPORT_CHUNK_ROWS = 1000
+
+
+class SupplyBatch(BaseModel):
+    # Rows are validated one by one by the ingestion service, so a bad row doesn't reject the batch
+    supplies: list
+
+
+@router.get("/supplier/supplies")
+async def get_supplies(session: AsyncSessionDep, days: int = 30, supplier_name: str | None = None):
+    query = (
+        select(ProductSupply)
+        .options(joinedload(ProductSupply.product))
+        .where(ProductSupply.supply_date >= datetime.utcnow() - timedelta(days=days))
+    )
+    if supplier_name:
+        query = query.where(ProductSupply.supplier_name.ilike(f"%{supplier_name}%"))
+
+    supplies = (await session.scalars(query.order_by(ProductSupply.supply_date.desc()))).all()
+
+    return [{
+        "id": s.id,
+        "product_id": s.product_id,
+        "product_name": s.product.name,
+        "quantity": s.quantity,
+        "unit": s.product.unit,
+        "supply_date": s.supply_date.isoformat(),
+        "supplier_name": s.supplier_name,
+        "cost": s.cost,
+        "batch_number": s.batch_number,
+        "total_cost": s.quantity * (s.cost or 0)
+    } for s in supplies]
+
+
+@router.post("/supplier/supplies", status_code=201)
+async def create_supply_bulk(data: SupplyBatch, engine: Engine = Depends(get_engine)):
+    if not journal.offline:
+        try:
+            # Validating every row is CPU-bound, so a large batch is ingested off the event loop like an import
+            report = await run_blocking(_ingest_rows, engine, data.supplies)
+        except exc.DBAPIError as e:
+            if not is_disconnect(e):
+                raise
+            journal.go_offline()
+        else:
+            # Plain values only, so skip the response encoder: for thousands of rows it takes longer than the ingest
+            return JSONResponse({
+                "message": f"{report['accepted']} supplies added",
+                "supplies": report["supplies"],
+                "rejected": report["errors"]
+            }, status_code=201)
+
+    # Rows are validated when the batch is replayed; the report is available by the journal key
+    key = await journal.append("supplies", data.model_dump())
+    return JSONResponse({
+        "message": "Supplies accepted offline",
+        "journal_key": key,
+        "status": "queued"
+    }, status_code=202)
+
+
+@router.post("/supplier/supplies/import", status_code=201)
+async def import_supplies(request: Request, engine: Engine = Depends(get_engine)):
+    """Streaming upload of a supplier invoice (CSV or JSON Lines)."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "text/csv":
+        parse = parse_csv
+    elif content_type in ("application/x-ndjson", "application/jsonl"):
+        parse = parse_ndjson
+    else:
+        raise ServiceError("Content-Type must be text/csv or application/x-ndjson", status_code=415)
+
+    # The body is received first, in memory for small uploads and in a temporary file for large ones
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+
+        # Parsing and validating a large invoice is CPU-bound, so the whole import
+        # runs off the event loop, on the sync engine (which also allows COPY)
+        return await run_blocking(_ingest_file, engine, spool, parse)
+
+
+@router.get("/supplier/products-to-order")
+async def get_products_to_order(session: AsyncSessionDep):
+    products = (await session.scalars(
+        select(Product).where(Product.current_stock <= Product.min_stock)
+    )).all()
+
+    return [{
+        "product_id": p.id,
+        "product_name": p.name,
+        "current_stock": p.current_stock,
+        "min_stock": p.min_stock,
+        "unit": p.unit,
+        "quantity_to_order": max(p.min_stock - p.current_stock, 0),
+        "cost_per_unit": p.cost_per_unit,
+        "estimated_cost": max(p.min_stock - p.current_stock, 0) * p.cost_per_unit
+    } for p in products]
+
+
+@router.get("/supplier/forecast")
+async def get_stock_forecast(
+    session: ReadSessionDep,
+    history_days: int = 56,
+    lead_time: float = 3,
+    cover_days: float = 7,
+    reorder_only: bool = False,
+):
+    """When each product runs out at the recent rate of sales, and how much to order ahead of it."""
+    # NumPy stays out of the app import until the forecast is first asked for
+    from services.forecast import depletion_forecast
+
+    products = await session.run_sync(depletion_forecast, history_days, lead_time, cover_days)
+    if reorder_only:
+        products = [p for p in products if p["quantity_to_order"] > 0]
+    return products
+
+
+@router.get("/supplier/monthly-report")
+async def get_monthly_supplier_report(
+    request: Request,
+    session: ReadSessionDep,
+    month: int | None = None,
+    year: int | None = None,
+    breakdown: str | None = None,
+    format: str | None = None,
+):
+    """Supplies report for a month or a range of months (from/to as YYYY-MM)."""
+    if not month or not year:
+        # Current month by default
+        now = datetime.utcnow()
+        month, year = now.month, now.year
+
+    from_year, from_month = _parse_month_arg(request, "from", (year, month))
+    to_year, to_month = _parse_month_arg(request, "to", (from_year, from_month))
+
+    start_date = month_start(from_year, from_month)
+    end_date = next_month_start(to_year, to_month)
+    if start_date >= end_date:
+        raise ServiceError("'from' must not be later than 'to'")
+
+    by_product = breakdown == "product"
+
+    if format == "csv":
+        if by_product:
+            report, fieldnames = supplier_product_breakdown, BREAKDOWN_CSV_FIELDS
+        else:
+            report, fieldnames = supplier_totals, TOTALS_CSV_FIELDS
+        rows = _report_rows(session.bind, report, start_date, end_date)
+        filename = f"supplies_{from_year}-{from_month:02d}_{to_year}-{to_month:02d}.csv"
+        return _csv_response(rows, fieldnames, filename)
+
+    supplier_stats = await session.run_sync(lambda s: list(supplier_totals(s, start_date, end_date)))
+
+    if by_product:
+        by_supplier = {}
+        rows = await session.run_sync(lambda s: list(supplier_product_breakdown(s, start_date, end_date)))
+        for row in rows:
+            by_supplier.setdefault(row.pop("supplier_name"), []).append(row)
+        for stat in supplier_stats:
+            stat["products_breakdown"] = by_supplier.get(stat["supplier_name"], [])
+
+    return {
+        "month": from_month,
+        "year": from_year,
+        "from": f"{from_year}-{from_month:02d}",
+        "to": f"{to_year}-{to_month:02d}",
+        "total_supplies": sum(stat["supply_count"] for stat in supplier_stats),
+        "supplier_stats": supplier_stats
+    }
+
+
+def _ingest_rows(engine, rows):
+    with Session(engine) as session:
+        report = ingest_supplies(session, enumerate(rows, start=1), True)
+        session.commit()
+    return report
+
+
+def _ingest_file(engine, file, parse):
+    with Session(engine) as session:
+        report = ingest_supplies(session, parse(codecs.iterdecode(file, "utf-8-sig")))
+        session.commit()
+    return report
+
+
+def _parse_month_arg(request, name, default):
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    try:
+        parsed = datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        raise ServiceError(f"Invalid '{name}' month, expected YYYY-MM: {value}")
+    return parsed.year, parsed.month
+
+
+async def _report_rows(engine, report, *args):
+    """Rows of a sync report generator, pulled from the database chunk by chunk as the response goes out.
+
+    The request's session may already be closed while a streamed body is
+    written, so the report runs in a session of its own on the same engine.
+    """
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        rows = await session.run_sync(report, *args)
+        while chunk := await session.run_sync(lambda _: list(islice(rows, REPORT_CHUNK_ROWS))):
+            for row in chunk:
+                yield row
+
+
+def _csv_response(rows, fieldnames, filename):
+    """Send report rows, an async iterable, as a CSV file, line by line."""
+    async def generate():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+        writer.writeheader()
+        async for row in rows:
+            if isinstance(row.get("products"), list):
+                row["products"] = "; ".join(row["products"])
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )